@@ -0,0 +1,242 @@
+"""
+Conversion throughput and latency benchmark for the Azure backend.
+
+Synthetic rule collections of different shapes and sizes are generated deterministically and converted with
+AzureBackend.convert_rule, with and without the azure_windows_pipeline. For each run the throughput (rules/sec), the
+p50/p99 latency per rule and the peak memory consumption are measured. Results are written as JSON and compared
+against a stored baseline:
+
+    python -m benchmarks.benchmark_conversion --output bench.json --baseline benchmarks/baseline.json
+
+Absolute numbers depend on the machine, a baseline should therefore be recorded on the same machine type as the
+runs it is compared against (--update-baseline).
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+from sigma.collection import SigmaCollection
+from sigma.rule import SigmaRule
+
+from sigma.backends.azure import AzureBackend
+from sigma.backends.azure.cache import package_version
+from sigma.pipelines.azure import azure_windows_pipeline
+from sigma.pipelines.azure.azure import azure_windows_service_map
+
+DEFAULT_SIZES = (10, 50, 200)
+DEFAULT_BASELINE = Path(__file__).parent / "baseline.json"
+WORDS = ("cmd", "powershell", "rundll32", "regsvr32", "mshta", "wscript", "certutil", "bitsadmin", "schtasks", "wmic")
+
+
+def _value(rnd: random.Random) -> str:
+    return "\\\\".join(rnd.choice(WORDS) for _ in range(rnd.randint(1, 3))) + rnd.choice(("", ".exe", ".dll"))
+
+
+def _rule(i: int, logsource: str, detection: str, condition: str) -> str:
+    return f"""
+title: Benchmark rule {i}
+status: test
+logsource:
+{logsource}
+detection:
+{detection}
+    condition: {condition}
+"""
+
+
+def generate_wide_or(i: int, rnd: random.Random) -> str:
+    """Single selection with long value lists, which are converted into in-expressions or OR chains."""
+    values = "\n".join(f"            - '{_value(rnd)}{j}'" for j in range(rnd.randint(20, 60)))
+    wildcards = "\n".join(f"            - '*{_value(rnd)}*'" for _ in range(rnd.randint(5, 20)))
+    return _rule(
+        i,
+        "    category: test_category\n    product: test_product",
+        f"    sel:\n        Image:\n{values}\n        CommandLine:\n{wildcards}",
+        "sel",
+    )
+
+
+def generate_deep_nested(i: int, rnd: random.Random) -> str:
+    """Many selections combined into a nested condition."""
+    count = rnd.randint(3, 5)
+    detection = "\n".join(
+        f"    sel{j}:\n        field{j}: '{_value(rnd)}'\n        other{j}|endswith: '{_value(rnd)}'"
+        for j in range(count)
+    )
+
+    # Balanced nesting keeps the depth at three levels. The condition parser of pySigma slows down exponentially with
+    # the nesting depth, which would dominate the measurement otherwise.
+    def nest(selections: List[str]) -> str:
+        if len(selections) == 1:
+            return selections[0]
+        middle = len(selections) // 2
+        return f"({nest(selections[:middle])} {rnd.choice(('and', 'or', 'and not'))} {nest(selections[middle:])})"
+
+    return _rule(i, "    category: test_category\n    product: test_product", detection, nest([f"sel{j}" for j in range(count)]))
+
+
+def generate_regex(i: int, rnd: random.Random) -> str:
+    """Selections with many regular expressions."""
+    regexes = "\n".join(
+        f"            - '{rnd.choice(('^', ''))}{_value(rnd).replace(chr(92), '.')}{rnd.choice(('.*', '[0-9]+', ''))}{rnd.choice(('$', ''))}'"
+        for _ in range(rnd.randint(5, 25))
+    )
+    return _rule(
+        i,
+        "    category: test_category\n    product: test_product",
+        f"    sel:\n        CommandLine|re:\n{regexes}\n        User: '{rnd.choice(WORDS)}'",
+        "sel",
+    )
+
+
+def generate_windows(i: int, rnd: random.Random) -> str:
+    """Windows rules with log sources that are mapped by the azure_windows_pipeline."""
+    logsource = rnd.choice(
+        ["    product: windows\n    category: process_creation"]
+        + [f"    product: windows\n    service: {service}" for service in azure_windows_service_map]
+    )
+    return _rule(
+        i,
+        logsource,
+        f"    sel:\n        Image|endswith: '{_value(rnd)}'\n        CommandLine|contains:\n"
+        + "\n".join(f"            - '{_value(rnd)}'" for _ in range(rnd.randint(1, 8)))
+        + f"\n    filter:\n        User: '{rnd.choice(WORDS)}'",
+        "sel and not filter",
+    )
+
+
+GENERATORS: Dict[str, Callable[[int, random.Random], str]] = {
+    "wide_or": generate_wide_or,
+    "deep_nested": generate_deep_nested,
+    "regex": generate_regex,
+    "windows": generate_windows,
+}
+
+
+def generate_collection(shape: str, size: int, seed: int = 0) -> SigmaCollection:
+    """Generate a synthetic rule collection. The same shape, size and seed always result in the same rules."""
+    rnd = random.Random(f"{shape}-{size}-{seed}")
+    return SigmaCollection.from_yaml("\n---\n".join(GENERATORS[shape](i, rnd) for i in range(size)))
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(q * (len(ordered) - 1)))]
+
+
+def measure(shape: str, size: int, pipeline: bool, seed: int = 0) -> dict:
+    def backend() -> AzureBackend:
+        return AzureBackend(processing_pipeline=azure_windows_pipeline() if pipeline else None)
+
+    # Latency and throughput. Rules are modified by the processing pipeline, therefore each pass converts a freshly
+    # generated collection.
+    rules: List[SigmaRule] = generate_collection(shape, size, seed).rules
+    converter = backend()
+    latencies = []
+    start = time.perf_counter()
+    for rule in rules:
+        rule_start = time.perf_counter()
+        converter.convert_rule(rule)
+        latencies.append(time.perf_counter() - rule_start)
+    elapsed = time.perf_counter() - start
+
+    # Peak memory is measured in a separate pass because tracing slows down the conversion.
+    rules = generate_collection(shape, size, seed).rules
+    converter = backend()
+    tracemalloc.start()
+    try:
+        for rule in rules:
+            converter.convert_rule(rule)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "shape": shape,
+        "size": size,
+        "pipeline": pipeline,
+        "rules_per_second": size / elapsed,
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "peak_memory_bytes": peak,
+    }
+
+
+def run(shapes: Iterable[str] = tuple(GENERATORS), sizes: Iterable[int] = DEFAULT_SIZES, seed: int = 0) -> dict:
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "pysigma": package_version("pySigma"),
+            "backend": package_version("pySigma-backend-azure"),
+        },
+        "results": [
+            measure(shape, size, pipeline, seed)
+            for shape in shapes
+            for size in sizes
+            for pipeline in (False, True)
+        ],
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float = 0.5) -> List[str]:
+    """
+    Compare benchmark results against a baseline. Return a description for each measurement that is worse than the
+    baseline by more than the relative tolerance.
+    """
+    def key(result: dict):
+        return result["shape"], result["size"], result["pipeline"]
+
+    baseline_results = {key(result): result for result in baseline["results"]}
+    regressions = []
+    for result in results["results"]:
+        reference = baseline_results.get(key(result))
+        if reference is None:
+            continue
+        name = "{}/{}/{}".format(result["shape"], result["size"], "pipeline" if result["pipeline"] else "plain")
+        if result["rules_per_second"] < reference["rules_per_second"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {result['rules_per_second']:.1f} rules/s, baseline {reference['rules_per_second']:.1f} rules/s")
+        for metric in ("p50_ms", "p99_ms", "peak_memory_bytes"):
+            if result[metric] > reference[metric] * (1 + tolerance):
+                regressions.append(f"{name}: {metric} {result[metric]:.3f}, baseline {reference[metric]:.3f}")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the conversion performance of the Azure backend.")
+    parser.add_argument("--shape", action="append", choices=sorted(GENERATORS), help="Rule collection shape (default: all)")
+    parser.add_argument("--size", action="append", type=int, help=f"Rule collection size (default: {', '.join(map(str, DEFAULT_SIZES))})")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the rule generator")
+    parser.add_argument("--output", type=Path, help="Write results as JSON into this file (default: stdout)")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="Baseline to compare results against")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Allowed relative deviation from baseline")
+    parser.add_argument("--update-baseline", action="store_true", help="Store results as new baseline")
+    args = parser.parse_args(argv)
+
+    results = run(args.shape or tuple(GENERATORS), args.size or DEFAULT_SIZES, args.seed)
+    output = json.dumps(results, indent=2)
+    if args.output:
+        args.output.write_text(output + "\n")
+    else:
+        print(output)
+
+    if args.update_baseline:
+        args.baseline.write_text(output + "\n")
+        return 0
+
+    if args.baseline.exists():
+        regressions = compare(results, json.loads(args.baseline.read_text()), args.tolerance)
+        for regression in regressions:
+            print("Regression: " + regression, file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+"""
+Query evaluation benchmark for the Azure backend.
+
+Synthetic SecurityEvent process creation events and Windows process creation rules are generated deterministically.
+The rules are converted with the azure_windows_pipeline and the queries are evaluated on the events with the local
+query evaluator (sigma.backends.azure.evaluator). For each run the number of matched events, the throughput
+(evaluated rows/sec) and the selectivity and evaluation time of each predicate are reported:
+
+    python -m benchmarks.benchmark_evaluation --rows 1000000 --rules 20 --output evaluation.json
+"""
+import argparse
+import json
+import random
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from sigma.collection import SigmaCollection
+
+from sigma.backends.azure import AzureBackend
+from sigma.backends.azure.evaluator import AzureEventTable, AzurePredicateStatistics, AzureQueryEvaluator
+from sigma.pipelines.azure import azure_windows_pipeline
+
+from benchmarks.benchmark_conversion import WORDS
+
+START = datetime(2024, 1, 1)
+DIRECTORIES = ("C:\\Windows\\System32", "C:\\Windows\\SysWOW64", "C:\\Program Files\\App", "C:\\Users\\Public")
+EVENT_IDS = (4688, 4688, 4688, 4624, 4625, 4672)
+USERS = ("SYSTEM", "alice", "bob", "svc_backup", "Administrator")
+
+
+def generate_security_events(rows: int, seed: int = 0) -> AzureEventTable:
+    """Generate a SecurityEvent table. The same number of rows and seed always result in the same events."""
+    rnd = random.Random(f"events-{rows}-{seed}")
+    images = [f"{directory}\\{word}.exe" for directory in DIRECTORIES for word in WORDS]
+    columns: Dict[str, List] = {
+        "TimeGenerated": [],
+        "Computer": [],
+        "EventID": [],
+        "Account": [],
+        "NewProcessName": [],
+        "ParentProcessName": [],
+        "CommandLine": [],
+        "IpAddress": [],
+    }
+    for i in range(rows):
+        image = rnd.choice(images)
+        columns["TimeGenerated"].append(START + timedelta(seconds=i))
+        columns["Computer"].append(f"host{rnd.randrange(100)}.contoso.com")
+        columns["EventID"].append(rnd.choice(EVENT_IDS))
+        columns["Account"].append(rnd.choice(USERS))
+        columns["NewProcessName"].append(image)
+        columns["ParentProcessName"].append(rnd.choice(images))
+        columns["CommandLine"].append(f"\"{image}\" " + " ".join(f"-{rnd.choice(WORDS)}" for _ in range(rnd.randint(0, 4))))
+        columns["IpAddress"].append(f"10.{rnd.randrange(4)}.{rnd.randrange(256)}.{rnd.randrange(256)}" if rnd.random() < 0.8 else "-")
+    return AzureEventTable("SecurityEvent", columns)
+
+
+def generate_rules(count: int, seed: int = 0) -> SigmaCollection:
+    """Generate Windows process creation rules that are converted into SecurityEvent queries."""
+    rnd = random.Random(f"rules-{count}-{seed}")
+    rules = []
+    for i in range(count):
+        arguments = "\n".join(f"            - '-{word}'" for word in rnd.sample(WORDS, rnd.randint(1, 3)))
+        rules.append(f"""
+title: Evaluation rule {i}
+status: test
+logsource:
+    product: windows
+    category: process_creation
+detection:
+    sel:
+        Image|endswith: '\\{rnd.choice(WORDS)}.exe'
+        CommandLine|contains:
+{arguments}
+    filter:
+        User: '{rnd.choice(USERS)}'
+        ParentImage|startswith: '{rnd.choice(DIRECTORIES)}'
+    condition: sel and not filter
+""")
+    return SigmaCollection.from_yaml("\n---\n".join(rules))
+
+
+def measure(rows: int, rules: int, seed: int = 0) -> dict:
+    table = generate_security_events(rows, seed)
+    evaluator = AzureQueryEvaluator([table])
+    backend = AzureBackend(processing_pipeline=azure_windows_pipeline())
+
+    predicates: Dict[str, AzurePredicateStatistics] = dict()
+    rows_scanned = matched = 0
+    seconds = 0.0
+    for rule in generate_rules(rules, seed).rules:
+        for query in backend.convert_rule(rule):
+            result = evaluator.evaluate(query)
+            rows_scanned += result.rows_scanned
+            matched += result.count
+            seconds += result.seconds
+            for statistics in result.predicates:
+                total = predicates.setdefault(statistics.predicate, AzurePredicateStatistics(statistics.predicate))
+                total.evaluated += statistics.evaluated
+                total.matched += statistics.matched
+                total.seconds += statistics.seconds
+
+    return {
+        "rows": rows,
+        "rules": rules,
+        "matched": matched,
+        "rows_per_second": rows_scanned / seconds if seconds else None,
+        "predicates": [
+            {
+                "predicate": statistics.predicate,
+                "evaluated": statistics.evaluated,
+                "matched": statistics.matched,
+                "selectivity": statistics.selectivity,
+                "seconds": statistics.seconds,
+            }
+            for statistics in sorted(predicates.values(), key=lambda statistics: statistics.seconds, reverse=True)
+        ],
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the local evaluation of queries generated by the Azure backend.")
+    parser.add_argument("--rows", type=int, default=1000000, help="Number of generated SecurityEvent rows")
+    parser.add_argument("--rules", type=int, default=20, help="Number of generated rules")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the event and rule generators")
+    parser.add_argument("--output", type=Path, help="Write results as JSON into this file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    output = json.dumps(measure(args.rows, args.rules, args.seed), indent=2)
+    if args.output:
+        args.output.write_text(output + "\n")
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+"""
+Aggregation conditions of Sigma rules (condition | count() by field > 10). pySigma doesn't parse the pipe syntax,
+so the aggregation is split from the condition before the rule is processed. The backend converts the search part
+into filters as usual and the aggregation into summarize with time bins and a filter of the aggregated value, so
+only the aggregated rows are returned by the query.
+"""
+import re
+from dataclasses import dataclass
+from typing import List, Optional, Tuple, Union
+
+from sigma.exceptions import SigmaFeatureNotSupportedByBackendError
+from sigma.rule import SigmaRule
+
+_aggregation_pattern = re.compile(r"""
+    ^(?P<search>.+?)\s*\|\s*
+    (?P<function>\w+)\(\s*(?P<field>[^\s(),]*)\s*\)
+    (?:\s+by\s+(?P<group_by>[^\s(),]+(?:\s*,\s*[^\s(),]+)*))?
+    \s*(?P<operator><=|>=|==|=|<|>)\s*(?P<value>\d+(?:\.\d+)?)\s*$
+""", re.VERBOSE | re.DOTALL)
+
+aggregation_functions = frozenset({"count", "min", "max", "avg", "sum"})
+timeframe_detection = "timeframe"       # Detection that contains the timeframe of the aggregation in rules parsed by pySigma
+
+
+@dataclass(frozen=True)
+class SigmaAggregation:
+    """Aggregation of a condition: function of the field (None for count()) by the group fields compared with value."""
+    function: str
+    field: Optional[str]
+    group_by: Tuple[str, ...]
+    operator: str
+    value: Union[int, float]
+
+    @property
+    def fields(self) -> List[str]:
+        return ([] if self.field is None else [self.field]) + list(self.group_by)
+
+
+def split_aggregation(condition: str, rule: Optional[SigmaRule] = None) -> Tuple[str, Optional[SigmaAggregation]]:
+    """Split a condition into the search condition and the aggregation, None for conditions without aggregation."""
+    if "|" not in condition:
+        return condition, None
+    match = _aggregation_pattern.match(condition)
+    if match is None or match.group("function") not in aggregation_functions:
+        raise SigmaFeatureNotSupportedByBackendError(
+            f"Aggregation in condition '{condition}' isn't supported, only {', '.join(sorted(aggregation_functions))}"
+            " with optional field, group field and comparison with a number",
+            source=rule.source if rule is not None else None,
+        )
+    function, field = match.group("function"), match.group("field") or None
+    if field is None and function != "count":
+        raise SigmaFeatureNotSupportedByBackendError(
+            f"Aggregation function {function}() requires a field",
+            source=rule.source if rule is not None else None,
+        )
+    value = match.group("value")
+    return match.group("search"), SigmaAggregation(
+        function=function,
+        field=field,
+        group_by=tuple(name.strip() for name in match.group("group_by").split(",")) if match.group("group_by") else (),
+        operator="==" if match.group("operator") == "=" else match.group("operator"),
+        value=float(value) if "." in value else int(value),
+    )
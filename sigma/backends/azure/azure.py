@@ -1,21 +1,118 @@
+from sigma.backends.azure.aggregation import SigmaAggregation, split_aggregation, timeframe_detection
+from sigma.backends.azure.cache import AzureConversionCache
+from sigma.backends.azure.cost import AzureCostModel, AzureQueryCost
+from sigma.backends.azure.dedup import AzureDeduplicationResult, deduplicate_queries
+from sigma.backends.azure.incremental import AzureBuildDiff, AzureIncrementalBuild
+from sigma.backends.azure.optimizer import optimize_condition
+from sigma.backends.azure.ordering import AzureFieldSelectivity, order_predicates, pipeline_conditions
+from sigma.backends.azure.parallel import AzureBulkConversionResult, convert_bulk
+from sigma.backends.azure.profiling import AzureConversionProfile
+from sigma.backends.azure.regex import analyze_regex
+from sigma.backends.azure.stream import convert_stream
+from sigma.backends.azure.templates import compile_templates
+from sigma.backends.azure.wildcards import compile_wildcards
+from sigma.collection import SigmaCollection
 from sigma.conversion.deferred import DeferredQueryExpression, DeferredTextQueryExpression
 from sigma.conversion.state import ConversionState
+from sigma.exceptions import SigmaConfigurationError, SigmaError, SigmaFeatureNotSupportedByBackendError
+from sigma.processing.pipeline import ProcessingPipeline
+from sigma.pipelines.azure.dispatch import AzureDispatchPipeline
+from sigma.pipelines.azure.schema import column_types_state_key, columns_state_key, payload_state_key, unknown_fields_state_key
 from sigma.rule import SigmaRule
 from sigma.conversion.base import TextQueryBackend
-from sigma.conditions import ConditionItem, ConditionAND, ConditionOR, ConditionNOT, ConditionType
-from sigma.types import SigmaCompareExpression, SigmaRegularExpression, SigmaRegularExpressionFlag
+from sigma.conditions import SigmaCondition, ConditionItem, ConditionAND, ConditionOR, ConditionNOT, ConditionType, ConditionFieldEqualsValueExpression
+from sigma.types import SigmaBool, SigmaCasedString, SigmaCompareExpression, SigmaFieldReference, SigmaNumber, SigmaRegularExpression, SigmaRegularExpressionFlag, SigmaString, SpecialChars
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from functools import partial
+from pathlib import Path
 import re
-from typing import ClassVar, Dict, Tuple, Pattern, List, Any, Optional, Union
+from time import perf_counter
+from typing import ClassVar, Dict, FrozenSet, Iterable, Iterator, Tuple, Pattern, List, Any, Optional, Union
 
 
-class AzureDeferredWhereExpression(DeferredTextQueryExpression):
+class AzureDeferredPredicateExpression(DeferredTextQueryExpression):
+    """
+    Deferred where expression. The predicate without where is used to combine the filters of multiple rules in the
+    batch output format.
+    """
+    stage: ClassVar[int] = 0    # Deferred query parts are ordered by stage: filters, joins, other query parts, projection
     template = 'where {op}{value}'
+    predicate_template = '{op}{value}'
     operators = {
         True: "not",
         False: "",
     }
     default_field = None
 
+    def finalize_predicate(self) -> str:
+        return self.predicate_template.format(op=self.operators[self.negated], value=self.value)
+
+
+class AzureDeferredWhereExpression(AzureDeferredPredicateExpression):
+    pass
+
+
+class AzureTimeWindowDeferredExpression(AzureDeferredPredicateExpression):
+    template = 'where {value}'
+    predicate_template = '{value}'
+
+
+class AzurePayloadPrefilterDeferredExpression(AzureDeferredPredicateExpression):
+    template = 'where {value}'
+    predicate_template = '{value}'
+
+
+class AzurePayloadExtendDeferredExpression(DeferredTextQueryExpression):
+    """Extraction of the payload fields, placed between the payload prefilter and the filter of the rule."""
+    stage: ClassVar[int] = 0
+    template = 'extend {value}'
+    operators = {
+        True: "not",
+        False: "",
+    }
+    default_field = None
+
+
+class AzureJoinDeferredExpression(DeferredTextQueryExpression):
+    stage: ClassVar[int] = 1
+    template = '{value}'
+    operators = {
+        True: "not",
+        False: "",
+    }
+    default_field = None
+
+
+class AzureSummarizeDeferredExpression(DeferredTextQueryExpression):
+    """Aggregation of the filtered rows, followed by the filter of the aggregated value."""
+    stage: ClassVar[int] = 2
+    template = 'summarize {value}'
+    operators = {
+        True: "not",
+        False: "",
+    }
+    default_field = None
+
+
+class AzureAggregationFilterDeferredExpression(AzureSummarizeDeferredExpression):
+    template = 'where {value}'
+
+
+class AzureProjectDeferredExpression(DeferredTextQueryExpression):
+    stage: ClassVar[int] = 3
+    template = 'project {value}'
+    operators = {
+        True: "not",
+        False: "",
+    }
+    default_field = None
+
+
+class AzureProjectExtendDeferredExpression(AzureProjectDeferredExpression):
+    """Extraction of payload fields only listed in the fields of the rule, placed after the filters before the projection."""
+    template = 'extend {value}'
+
 
 class AzureLogsourceDeferredExpression(DeferredTextQueryExpression):
     template = '{value}'
@@ -26,6 +123,47 @@ class AzureLogsourceDeferredExpression(DeferredTextQueryExpression):
     default_field = None
 
 
+@dataclass
+class AzureConversionState(ConversionState):
+    """
+    Conversion state that additionally collects statistics about the generated query, e.g. the number of
+    predicates that were converted into term index operators, and the fields referenced by the query. The
+    statistics of each query are recorded in the query_statistics list of the backend.
+    """
+    statistics: Dict[str, Any] = field(default_factory=dict)
+    fields: Dict[str, None] = field(default_factory=dict)     # Referenced fields in order of appearance
+    root: Optional[ConditionType] = None      # Root of the converted condition tree
+
+    def increment(self, key: str, count: int = 1) -> None:
+        self.statistics[key] = self.statistics.get(key, 0) + count
+
+
+@dataclass
+class AzureBatchQuery:
+    """
+    Rule converted with the batch output format. The queries of all rules with the same tables and time window are
+    combined into one query by AzureBackend.finalize_output_batch.
+    """
+    rule: SigmaRule
+    tables: Tuple[str, ...]
+    time_window: Optional[str]
+    predicate: str
+
+    @property
+    def rule_id(self) -> str:
+        return str(self.rule.id) if self.rule.id is not None else self.rule.title
+
+
+def _condition_fields(cond: ConditionType) -> Iterator[str]:
+    if isinstance(cond, ConditionItem):
+        for arg in cond.args:
+            yield from _condition_fields(arg)
+    elif isinstance(cond, ConditionFieldEqualsValueExpression):
+        yield cond.field
+        if isinstance(cond.value, SigmaFieldReference):
+            yield cond.value.field
+
+
 class AzureBackend(TextQueryBackend):
     """azure backend."""
     # See the pySigma documentation for further infromation:
@@ -36,6 +174,8 @@ class AzureBackend(TextQueryBackend):
     name: ClassVar[str] = "Azure Backend"
     formats: Dict[str, str] = {
         "default": "Plain Azure queries",
+        "batch": "Rules combined into one query per table, matching rules are returned in the RuleId column",
+        "metadata": "Queries with rule id, title and static cost estimate",
     }
     requires_pipeline: bool = False
 
@@ -49,6 +189,7 @@ class AzureBackend(TextQueryBackend):
     and_token: ClassVar[str] = "and"
     not_token: ClassVar[str] = "not"
     eq_token: ClassVar[str] = token_separator + "=~" + token_separator  # Token inserted between field and value (without separator)
+    typed_eq_token: ClassVar[str] = token_separator + "==" + token_separator    # Token inserted between numeric or boolean columns of the schema (azure_column_types pipeline state) and their value
 
     # String output
     ## Fields
@@ -86,7 +227,7 @@ class AzureBackend(TextQueryBackend):
     # token stored in the class variable re_flags.
     re_expression: ClassVar[str] = '{field} matches regex "{regex}"'
     re_escape_char: ClassVar[str] = "\\"               # Character used for escaping in regular expressions
-    re_escape: ClassVar[Tuple[str]] = ()               # List of strings that are escaped
+    re_escape: ClassVar[Tuple[str]] = (str_quote,)     # List of strings that are escaped, the string quote ends the regular expression literal otherwise
     re_escape_escape_char: bool = True                 # If True, the escape character is also escaped
     re_flag_prefix: bool = True                        # If True, the flags are prepended as (?x) group at the beginning of the regular expression, e.g. (?i). If this is not supported by the target, it should be set to False.
     # Mapping from SigmaRegularExpressionFlag values to static string templates that are used in
@@ -153,40 +294,1095 @@ class AzureBackend(TextQueryBackend):
     deferred_separator: ClassVar[str] = "\n| "           # String used to join multiple deferred query parts
     deferred_only_query: ClassVar[str] = "union *"            # String used as query if final query only contains deferred expression
 
+    # Backend options: defaults of the following attributes can be overridden per backend instance by passing them
+    # as keyword arguments to the constructor.
+    option_names: ClassVar[FrozenSet[str]] = frozenset({
+        "cache",
+        "term_index_operators",
+        "min_term_length",
+        "strict_logsource",
+        "strict_schema",
+        "multi_table_output",
+        "time_window",
+        "batch_size",
+        "project_fields",
+        "project_keep_columns",
+        "regex_lowering",
+        "wildcard_compilation",
+        "value_list_optimization",
+        "value_list_chunk_size",
+        "value_list_datatable_threshold",
+        "profile",
+        "cost_model",
+        "cost_budget",
+        "condition_optimization",
+        "predicate_ordering",
+        "field_selectivity",
+        "aggregation_window",
+    })
+    cache: Optional[AzureConversionCache] = None    # Persistent conversion cache. Rules with a cache hit are neither processed nor converted.
+    term_index_operators: bool = False              # Pre-filter startswith/endswith matches of term-aligned values with hasprefix/hassuffix. The exact operator is kept, because the term operators match the start/end of any term of the value. Contains isn't changed, has only matches whole terms.
+    min_term_length: int = 3                        # Minimum length of values looked up in the term index
+    strict_logsource: bool = False                  # Raise an error instead of generating queries that scan all tables of the workspace (deferred_only_query) for rules without table mapping.
+    strict_schema: bool = False                     # Raise an error instead of generating queries with fields that aren't columns of the tables of the rule in the schema of the processing pipeline.
+    multi_table_output: str = "union"               # Output of rules mapped to multiple tables: "union" of all tables with filters pushed down into each table or "split" into one query per table.
+    time_window: Optional[Union[str, Tuple[Any, Any]]] = None     # Time window filter put first after the table: a timespan (e.g. "1d") for events since then or a (start, end) tuple. Can be overridden by the pipeline state or the rule custom attribute azure_time_window.
+    batch_size: int = 50                            # Maximum number of rules combined into one query by the batch output format
+    project_fields: bool = False                    # Only return the columns referenced by the rule, the fields listed in the rule and project_keep_columns
+    project_keep_columns: Tuple[str, ...] = ("TimeGenerated", "Computer")     # Columns always returned if project_fields is set
+    regex_lowering: bool = False                    # Convert regular expressions that only match literals into string operators
+    value_list_optimization: bool = False           # Deduplicate and sort value lists, use in~ for strings and in for numbers, booleans and case-sensitive strings and split large lists
+    value_list_chunk_size: int = 1000               # Maximum number of values of one in-expression, larger lists are split into OR'ed chunks
+    value_list_datatable_threshold: Optional[int] = None    # Lists with more values are joined as datatable with the table instead of an in-expression, if the list is not part of an OR or NOT condition
+    wildcard_compilation: bool = True               # Convert values with wildcards inside of the value into string operator pre-filters and a regular expression check if required instead of wildcard_match_expression
+    profile: Optional[AzureConversionProfile] = None    # Record wall time and calls of conversion stages, processing items and rules. Conversion isn't instrumented if not set.
+    cost_model: Optional[AzureCostModel] = None    # Weights of the static query cost estimate (default: AzureCostModel())
+    cost_budget: Optional[float] = None             # Conversion of rules with a query whose cost score exceeds the budget fails
+    condition_optimization: bool = False            # Simplify condition trees before conversion: flatten nested groups, remove duplicate and subsumed items, factor out common items of OR branches and group equality items of the same field into value lists (with value_list_optimization)
+    predicate_ordering: bool = False                # Order the items of AND conditions by cost class (equality, term and prefix, substring, regular expression) and field selectivity, conditions added by the processing pipeline are kept first
+    field_selectivity: Optional[Union[str, Path, AzureFieldSelectivity]] = None   # Field selectivity statistics or path of a statistics file used by predicate_ordering
+    aggregation_window: str = "1h"                  # Time bin of aggregation conditions (condition | count() by field > 10) of rules without timeframe
+
+    # Multi-table queries: union with the deferred query parts pushed down into each branch
+    union_expression: ClassVar[str] = "union withsource={source_column} {tables}"   # Union of multiple tables with placeholders {source_column} and {tables}
+    union_branch_expression: ClassVar[str] = "({query})"     # Table with pushed down query parts
+    union_separator: ClassVar[str] = ", "
+    union_source_column: ClassVar[str] = "SourceTable"      # Column containing the table name of each result
+
+    # Time window filter
+    time_window_state_key: ClassVar[str] = "azure_time_window"     # Key of time window in pipeline state and rule custom attributes
+    time_column: ClassVar[str] = "TimeGenerated"
+    time_window_timespan_pattern: ClassVar[Pattern] = re.compile(r"^\d+(\.\d+)?(d|h|m|s|ms|microsecond|tick)$")
+    time_window_ago_expression: ClassVar[str] = "{column} > ago({timespan})"
+    time_window_between_expression: ClassVar[str] = "{column} between (datetime({start}) .. datetime({end}))"
+
+    # Batch output format: the predicate of each rule is evaluated into a flag column, rows matching at least one
+    # rule are kept and expanded into one row per matching rule.
+    batch_flag_column: ClassVar[str] = "RuleMatch{index}"     # Name of flag column with placeholder {index} of the rule in the batch
+    batch_rule_id_column: ClassVar[str] = "RuleId"
+    batch_flag_expression: ClassVar[str] = "{column} = ({predicate})"
+    batch_extend_expression: ClassVar[str] = "extend {flags}"
+    batch_filter_expression: ClassVar[str] = "where {flags}"      # Rows matching at least one rule, {flags} are joined with or_token
+    batch_rule_id_expression: ClassVar[str] = 'extend {column} = pack_array({rule_ids})'
+    batch_rule_id_item_expression: ClassVar[str] = 'iff({flag}, "{rule_id}", "")'
+    batch_expand_expression: ClassVar[str] = "mv-expand {column} to typeof(string)"
+    batch_expand_filter_expression: ClassVar[str] = "where isnotempty({column})"
+    batch_project_away_expression: ClassVar[str] = "project-away {columns}"
+
+    # Term index operators added as pre-filter of startswith and endswith matches if term_index_operators is set and
+    # the value is term-aligned (see term_pattern and min_term_length). A value starting (ending) with a term-aligned
+    # value has a term with this prefix (suffix), the exact operator is kept because the term index operators also
+    # match terms inside of the value. Contains matches aren't pre-filtered, has only matches whole terms.
+    term_pattern: ClassVar[Pattern] = re.compile("^[A-Za-z0-9]+$")     # Values matching this pattern are a single term
+    term_startswith_expression: ClassVar[str] = "{field} hasprefix {value}"
+    term_endswith_expression: ClassVar[str] = "{field} hassuffix {value}"
+    case_sensitive_term_startswith_expression: ClassVar[str] = "{field} hasprefix_cs {value}"
+    case_sensitive_term_endswith_expression: ClassVar[str] = "{field} hassuffix_cs {value}"
+
+    # Value lists if value_list_optimization is set
+    value_list_in_operators: ClassVar[Dict[bool, str]] = {      # In operator for case-insensitive and case-sensitive or typed values
+        False: "in~",
+        True: "in",
+    }
+    value_list_join_column: ClassVar[str] = "Value"      # Column of the datatable
+    value_list_join_key: ClassVar[str] = "ValueListKey{index}"   # Column with lowercase field value joined with case-insensitive lists
+    value_list_join_expression: ClassVar[str] = "join kind=leftsemi (datatable({column}:string) [{list}]) on $left.{field} == $right.{column}"
+    value_list_join_key_expression: ClassVar[str] = "extend {key} = tolower({field})"
+    value_list_join_key_remove_expression: ClassVar[str] = "project-away {key}"
+
+    # Values with wildcards that can't be matched with startswith, endswith or contains are compiled into a conjunction
+    # of these operators for the literal parts, a length check and a regular expression check if the pattern can't be
+    # fully expressed by the other checks.
+    wildcard_length_expression: ClassVar[str] = "strlen({field}) {operator} {length}"
+
+    # Regular expressions lowered into string operators if regex_lowering is set. Regular expressions are case-sensitive
+    # unless the i flag is set.
+    lowered_re_expressions: ClassVar[Dict[Tuple[str, bool], str]] = {     # (operator, ignore case) to expression with placeholders {field} and {value}
+        ("equals", False): "{field} == {value}",
+        ("startswith", False): "{field} startswith_cs {value}",
+        ("endswith", False): "{field} endswith_cs {value}",
+        ("contains", False): "{field} contains_cs {value}",
+        ("equals", True): "{field} =~ {value}",
+        ("startswith", True): "{field} startswith {value}",
+        ("endswith", True): "{field} endswith {value}",
+        ("contains", True): "{field} contains {value}",
+    }
+    lowered_re_in_expressions: ClassVar[Dict[bool, str]] = {       # Alternation of anchored literals with placeholders {field} and {list}
+        False: "{field} in ({list})",
+        True: "{field} in~ ({list})",
+    }
+
+    # Payload tables: fields contained in the XML or JSON payload column (azure_payload pipeline state) are extracted
+    # once with extend. Before, the raw payload is filtered by the literals of the rule, so only rows that can match
+    # are parsed: whole values with has, parts of values with contains.
+    payload_prefilter_expressions: ClassVar[Dict[Tuple[bool, bool], str]] = {     # (whole value, case-sensitive) to expression with placeholders {column} and {value}
+        (True, False): "{column} has {value}",
+        (True, True): "{column} has_cs {value}",
+        (False, False): "{column} contains {value}",
+        (False, True): "{column} contains_cs {value}",
+    }
+    payload_escaped_characters: ClassVar[Dict[str, str]] = {     # Characters escaped in the raw payload by format, literals containing them aren't used as prefilter
+        "xml": "<>&\"'",
+        "json": "\"\\",
+    }
+    payload_assignment_expression: ClassVar[str] = "{field} = {value}"
+    payload_xml_field_expression: ClassVar[str] = "extract({regex}, 1, {column})"
+    payload_xml_field_regex: ClassVar[str] = '<Data Name="{name}">([^<]*)<'
+    payload_json_column: ClassVar[str] = "AzurePayload"     # Column with the parsed JSON payload
+    payload_json_parse_expression: ClassVar[str] = "parse_json({column})"
+    payload_json_field_expression: ClassVar[str] = "tostring({payload}[{name}])"
+
+    # Aggregation conditions: summarize of the filtered rows by the group fields and time bins of the rule timeframe,
+    # followed by the filter of the aggregated value.
+    aggregation_expression: ClassVar[str] = "{column} = {function} by {groups}"
+    aggregation_function_expressions: ClassVar[Dict[Tuple[str, bool], str]] = {     # (function, with field) to expression with placeholder {field}
+        ("count", False): "count()",
+        ("count", True): "dcount({field})",
+        ("min", True): "min({field})",
+        ("max", True): "max({field})",
+        ("avg", True): "avg({field})",
+        ("sum", True): "sum({field})",
+    }
+    aggregation_column_names: ClassVar[Dict[Tuple[str, bool], str]] = {     # Column of the aggregated value with placeholder {field}
+        ("count", False): "count_",
+        ("count", True): "dcount_{field}",
+    }
+    aggregation_bin_expression: ClassVar[str] = "bin({column}, {window})"
+    aggregation_filter_expression: ClassVar[str] = "{column} {operator} {value}"
+    aggregation_fields_marker: ClassVar[str] = "__azure_aggregation"    # Separates the aggregation fields mapped by the pipeline in the field list of the rule
+
+    # Hot path: escaped and quoted field names are memoized per backend, the memo is cleared when it's full.
+    # Templates of the class and its subclasses are compiled into renderers, see sigma.backends.azure.templates.
+    field_name_cache_size: ClassVar[int] = 4096
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        compile_templates(cls)
+
+    def __init__(self, processing_pipeline: Optional[ProcessingPipeline] = None, collect_errors: bool = False, **backend_options):
+        super().__init__(processing_pipeline, collect_errors)
+        for name, value in backend_options.items():
+            if name not in self.option_names:
+                raise SigmaConfigurationError(f"Unknown Azure backend option '{name}'")
+            setattr(self, name, value)
+        if isinstance(self.field_selectivity, (str, Path)):
+            self.field_selectivity = AzureFieldSelectivity.from_file(self.field_selectivity)
+        self.cache_contexts: Dict[Tuple[Any, ...], str] = dict()
+        self.conversion_pipelines: Dict[str, Tuple[Optional[ProcessingPipeline], ProcessingPipeline]] = dict()     # Output format to configured and concatenated pipeline
+        self.query_statistics: List[Tuple[SigmaRule, Dict[str, Any]]] = list()     # Statistics of each generated query, see AzureConversionState
+        self.union_fallback_rules: List[SigmaRule] = list()     # Rules without table mapping that were converted into queries scanning all tables
+        self.unknown_field_rules: List[Tuple[SigmaRule, Dict[str, List[str]]]] = list()     # Rules with fields missing in the schema of their tables by table
+        self.field_names: Dict[str, str] = dict()     # Field name to escaped and quoted field name
+
     # TODO: implement custom methods for query elements not covered by the default backend base.
     # Documentation: https://sigmahq-pysigma.readthedocs.io/en/latest/Backends.html
 
+    def convert_bulk(self, rule_collection: SigmaCollection, output_format: Optional[str] = None, processes: Optional[int] = None, chunk_size: Optional[int] = None) -> List[AzureBulkConversionResult]:
+        """
+        Convert a large rule collection in parallel with a process pool. The backend including its processing
+        pipeline is passed once to each worker, rules are distributed in contiguous chunks. Returns one result per
+        rule in input order, errors are reported per rule instead of aborting the conversion.
+        """
+        return convert_bulk(self, rule_collection.rules, output_format or self.default_format, processes, chunk_size)
+
+    def convert_stream(self, paths: Iterable[Union[str, Path]], output_format: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Convert rule files and directories lazily one rule at a time. Yields one record per rule with the queries or
+        the error, see sigma.backends.azure.stream.
+        """
+        return convert_stream(self, paths, output_format)
+
+    def convert_incremental(self, paths: Iterable[Union[str, Path]], manifest: Union[str, Path], output_format: Optional[str] = None) -> AzureBuildDiff:
+        """
+        Convert only the rules that are new, changed or affected by a change of the processing pipeline since the
+        build recorded in the manifest file. Returns the added, changed and removed queries.
+        """
+        return AzureIncrementalBuild(self, manifest, output_format).run(paths)
+
+    def convert_deduplicated(self, rule_collection: SigmaCollection, output_format: Optional[str] = None) -> AzureDeduplicationResult:
+        """
+        Convert the rules and group equivalent queries by their canonical form, so each group is deployed once with
+        the ids of all its rules (the title for rules without id). See sigma.backends.azure.dedup.
+        """
+        output_format = output_format or self.default_format
+        if output_format == "batch":
+            raise SigmaConfigurationError("The batch output format combines multiple rules and can't be deduplicated")
+        return deduplicate_queries(
+            (str(rule.id) if rule.id is not None else rule.title, query)
+            for rule in rule_collection.rules
+            for query in self.convert_rule(rule, output_format)
+        )
+
+    def conversion_pipeline(self, output_format: str) -> ProcessingPipeline:
+        """
+        Concatenation of backend, configured and output format processing pipelines. The pipeline is built once per
+        configured pipeline and output format, which keeps the dispatch index of AzureDispatchPipeline for all
+        converted rules.
+        """
+        configured, pipeline = self.conversion_pipelines.get(output_format, (None, None))
+        if pipeline is None or configured is not self.processing_pipeline:
+            pipeline = (
+                self.backend_processing_pipeline
+                + self.processing_pipeline
+                + self.output_format_processing_pipeline[output_format]
+            )
+            self.conversion_pipelines[output_format] = (self.processing_pipeline, pipeline)
+        if isinstance(pipeline, AzureDispatchPipeline):
+            pipeline.profile = self.profile
+        return pipeline
+
+    def convert_rule(self, rule: SigmaRule, output_format: Optional[str] = None) -> List[Any]:
+        """
+        Convert a single rule like the pySigma base backend, but with AzureConversionState objects that collect
+        statistics about the generated queries. If a cache is configured, the conversion result is looked up first.
+        The cache key is computed from the unprocessed rule, because the processing pipeline modifies the rule.
+        """
+        if self.profile is None:
+            return self.convert_rule_queries(rule, output_format)
+        start = perf_counter()
+        try:
+            return self.convert_rule_queries(rule, output_format)
+        finally:
+            self.profile.record_rule(rule, perf_counter() - start)
+
+    def convert_rule_queries(self, rule: SigmaRule, output_format: Optional[str] = None) -> List[Any]:
+        output_format = output_format or self.default_format
+        pipeline = self.conversion_pipeline(output_format)
+
+        key = None
+        if self.cache is not None:
+            # The context fingerprint only changes with the configured pipeline or output format and is computed once.
+            context_key = (id(self.processing_pipeline), output_format)
+            if context_key not in self.cache_contexts:
+                self.cache_contexts[context_key] = self.cache.context(self, pipeline, output_format)
+            key = self.cache.key(rule, self.cache_contexts[context_key])
+
+            entry = self.cache.get(key) if self.profile is None else self.profile.call("cache", self.cache.get, key)
+            if entry is not None:     # replay the bookkeeping of the conversion
+                self.last_processing_pipeline = pipeline
+                self.query_statistics.extend((rule, statistics) for statistics in entry["statistics"])
+                if entry["union_fallback"]:
+                    self.union_fallback_rules.append(rule)
+                if entry["unknown_fields"]:
+                    self.unknown_field_rules.append((rule, entry["unknown_fields"]))
+                return entry["queries"]
+            bookkeeping = (len(self.query_statistics), len(self.union_fallback_rules), len(self.unknown_field_rules))
+
+        error_state = "applying processing pipeline on"
+        try:
+            self.last_processing_pipeline = pipeline
+            aggregations = self.split_aggregations(rule)
+            if self.profile is None:    # 1. Apply transformations
+                pipeline.apply(rule)
+            else:
+                self.profile.call("pipeline", pipeline.apply, rule)
+            aggregation_columns = self.aggregation_columns(rule, aggregations)
+
+            # 2. Convert conditions
+            error_state = "converting"
+            states = [
+                AzureConversionState(processing_state=dict(pipeline.state))
+                for _ in rule.detection.parsed_condition
+            ]
+            conditions = [cond.parsed for cond in rule.detection.parsed_condition]
+            for index, cond in enumerate(conditions):
+                pinned = pipeline_conditions(cond) if self.predicate_ordering else None    # before the tree is rewritten
+                if self.condition_optimization:
+                    cond, rewrites = optimize_condition(cond, group_values=self.value_list_optimization)
+                    for kind, count in rewrites.items():
+                        states[index].increment(f"condition_{kind}", count)
+                if self.predicate_ordering:
+                    cond, reordered = order_predicates(cond, self, self.field_selectivity, pinned)
+                    if reordered:
+                        states[index].increment("reordered_conditions", reordered)
+                conditions[index] = cond
+            for index, cond in enumerate(conditions):
+                states[index].root = cond
+            convert_condition = self.convert_condition if self.profile is None else partial(self.profile.call, "convert_condition", self.convert_condition)
+            queries = [
+                convert_condition(cond, states[index])
+                for index, cond in enumerate(conditions)
+            ]
+            for index, aggregation in enumerate(aggregations):
+                if aggregation is not None:
+                    self.convert_aggregation(*aggregation, aggregation_columns, states[index])
+
+            # 3. Postprocess generated query
+            error_state = "finalizing query for"
+            finalized = list()
+            for index, query in enumerate(queries):
+                if self.profile is None:
+                    query = self.finalize_query(rule, query, index, states[index], output_format)
+                else:
+                    query = self.profile.call("finalize_query", self.finalize_query, rule, query, index, states[index], output_format)
+                query = query if isinstance(query, list) else [query]   # queries split up into one query per table
+                if all(isinstance(item, str) for item in query):
+                    states[index].statistics["query_size_bytes"] = sum(len(item.encode("utf-8")) for item in query)
+                finalized.extend(query)
+            queries = finalized
+        except SigmaError as e:
+            if self.collect_errors:
+                self.errors.append((rule, e))
+                return []
+            else:
+                raise e
+        except Exception as e:  # enrich all other exceptions with Sigma-specific context information
+            msg = f" (while {error_state} rule {str(rule.source)})"
+            if len(e.args) > 1:
+                e.args = (e.args[0] + msg,) + e.args[1:]
+            else:
+                e.args = (e.args[0] + msg,)
+            raise
+
+        if key is not None:
+            statistics, union_fallback, unknown_fields = bookkeeping
+            self.cache.put(
+                key,
+                queries,
+                [statistics for _, statistics in self.query_statistics[statistics:]],
+                len(self.union_fallback_rules) > union_fallback,
+                {table: fields for _, unknown in self.unknown_field_rules[unknown_fields:] for table, fields in unknown.items()},
+            )
+        return queries
+
+    def split_aggregations(self, rule: SigmaRule) -> List[Optional[Tuple[SigmaAggregation, str]]]:
+        """
+        Split the aggregations from the conditions of the rule before it is processed, because pySigma doesn't parse
+        them. Returns the aggregation and time bin of each condition. The timeframe detection is removed from rules
+        with aggregations and the aggregation fields are appended to the field list of the rule, each after a marker,
+        so the processing pipeline maps them like the fields of the rule.
+        """
+        split = [split_aggregation(condition, rule) for condition in rule.detection.condition]
+        if all(aggregation is None for _, aggregation in split):
+            return [None] * len(split)
+
+        timeframe = rule.custom_attributes.get("timeframe", self.aggregation_window)
+        detection = rule.detection.detections.pop(timeframe_detection, None)
+        if detection is not None and len(detection.detection_items) == 1 and len(detection.detection_items[0].value) == 1:
+            timeframe = str(detection.detection_items[0].value[0])
+        if not self.time_window_timespan_pattern.match(str(timeframe)):
+            raise SigmaFeatureNotSupportedByBackendError(f"Invalid timeframe '{timeframe}', must be a timespan like 5m", source=rule.source)
+
+        rule.detection.condition = [condition for condition, _ in split]
+        rule.detection.parsed_condition = [SigmaCondition(condition, rule.detection, rule.detection.source) for condition in rule.detection.condition]
+        fields = dict.fromkeys(name for _, aggregation in split if aggregation is not None for name in aggregation.fields)
+        rule.fields = rule.fields + [item for name in fields for item in (self.aggregation_fields_marker, name)]
+        return [None if aggregation is None else (aggregation, str(timeframe)) for _, aggregation in split]
+
+    def aggregation_columns(self, rule: SigmaRule, aggregations: List[Optional[Tuple[SigmaAggregation, str]]]) -> Dict[str, List[str]]:
+        """Columns of the aggregation fields mapped by the processing pipeline, the markers are removed from the field list."""
+        fields = list(dict.fromkeys(name for aggregation in aggregations if aggregation is not None for name in aggregation[0].fields))
+        if not fields:
+            return dict()
+        start = rule.fields.index(self.aggregation_fields_marker)
+        columns: List[List[str]] = list()
+        for name in rule.fields[start:]:
+            if name == self.aggregation_fields_marker:
+                columns.append(list())
+            else:
+                columns[-1].append(name)
+        rule.fields = rule.fields[:start]
+        return dict(zip(fields, columns))
+
+    def convert_aggregation(self, aggregation: SigmaAggregation, window: str, columns: Dict[str, List[str]], state: ConversionState) -> None:
+        """Add the summarize of the filtered rows and the filter of the aggregated value as deferred query parts."""
+        column = None
+        if aggregation.field is not None:
+            if len(columns[aggregation.field]) != 1:
+                raise SigmaFeatureNotSupportedByBackendError(f"Aggregated field '{aggregation.field}' must be mapped to exactly one column")
+            column = columns[aggregation.field][0]
+        key = (aggregation.function, column is not None)
+        value_column = self.aggregation_column_names.get(key, aggregation.function + "_{field}").format(field=re.sub(r"\W", "_", column or ""))
+        groups = [self.escape_and_quote_field(group) for name in aggregation.group_by for group in columns[name]]
+        groups.append(self.aggregation_bin_expression.format(column=self.time_column, window=window))
+        AzureSummarizeDeferredExpression(state, field=None, value=self.aggregation_expression.format(
+            column=value_column,
+            function=self.aggregation_function_expressions[key].format(field=self.escape_and_quote_field(column) if column else ""),
+            groups=self.list_separator.join(groups),
+        ))
+        AzureAggregationFilterDeferredExpression(state, field=None, value=self.aggregation_filter_expression.format(
+            column=value_column,
+            operator=aggregation.operator,
+            value=aggregation.value,
+        ))
+
     def convert_condition(self, cond: ConditionType, state: ConversionState) -> Any:
         """
         Start with a deferred where expression
         """
-        if getattr(cond, 'field', '') == '__azure_logsource':
-            return AzureLogsourceDeferredExpression(state, field=None, value=str(cond.value))
+        if isinstance(cond, ConditionFieldEqualsValueExpression):
+            if cond.field == "__azure_logsource":
+                return AzureLogsourceDeferredExpression(state, field=None, value=str(cond.value))
+            if isinstance(state, AzureConversionState):
+                state.fields[cond.field] = None
+                if isinstance(cond.value, SigmaFieldReference):
+                    state.fields[cond.value.field] = None
 
-        if len(cond.parent_chain_condition_classes()) == 0:
-            return AzureDeferredWhereExpression(state, field=None, value=super().convert_condition(cond, state))
+        if isinstance(cond, ConditionOR) and all(
+            isinstance(arg, ConditionFieldEqualsValueExpression) and arg.field == "__azure_logsource"
+            for arg in cond.args
+        ):
+            # multiple tables resolved for the log source, each one is added as deferred expression
+            for arg in cond.args:
+                expression = self.convert_condition(arg, state)
+            return expression
+
+        if isinstance(state, AzureConversionState) and state.root is not None:
+            root = cond is state.root
+        else:       # state without root, e.g. of conditions converted outside of convert_rule
+            root = len(cond.parent_chain_condition_classes()) == 0
+        if root:
+            self.convert_payload(cond, state)
+            value = super().convert_condition(cond, state)
+            if isinstance(value, DeferredQueryExpression) or not value:   # condition completely converted into deferred query parts
+                return value
+            return AzureDeferredWhereExpression(state, field=None, value=value)
 
         return super().convert_condition(cond, state)
 
+    def convert_payload(self, cond: ConditionType, state: ConversionState) -> None:
+        """
+        Add the prefilter on the raw payload column and the extraction of the payload fields referenced by the
+        condition as deferred query parts, which are placed before the filter of the rule.
+        """
+        payload = state.processing_state.get(payload_state_key)
+        if not payload:
+            return
+        referenced = set(_condition_fields(cond))
+        fields = [name for name in payload["fields"] if name in referenced]
+        if not fields:
+            return
+
+        column = self.escape_and_quote_field(payload["column"])
+        prefilter = self.convert_payload_prefilter(cond, fields, payload["format"], column, state)
+        if prefilter is not None:
+            AzurePayloadPrefilterDeferredExpression(state, field=None, value=prefilter)
+
+        AzurePayloadExtendDeferredExpression(state, field=None, value=self.convert_payload_fields(fields, payload, parse=True))
+        if isinstance(state, AzureConversionState):
+            state.increment("payload_fields", len(fields))
+
+    def convert_payload_fields(self, fields: List[str], payload: Dict[str, Any], parse: bool) -> str:
+        """Assignments extracting the fields from the payload, JSON payloads are parsed first if parse is set."""
+        column = self.escape_and_quote_field(payload["column"])
+        assignments = []
+        if payload["format"] == "json" and parse:
+            assignments.append(self.payload_assignment_expression.format(
+                field=self.payload_json_column,
+                value=self.payload_json_parse_expression.format(column=column),
+            ))
+        for name in fields:
+            if payload["format"] == "json":
+                value = self.payload_json_field_expression.format(payload=self.payload_json_column, name=self.quote_payload_string(name))
+            else:
+                regex = self.payload_xml_field_regex.format(name=re.escape(name))
+                value = self.payload_xml_field_expression.format(regex=self.quote_payload_string(regex), column=column)
+            assignments.append(self.payload_assignment_expression.format(field=self.escape_and_quote_field(name), value=value))
+        return self.list_separator.join(assignments)
+
+    def convert_payload_prefilter(self, cond: ConditionType, fields: List[str], payload_format: str, column: str, state: ConversionState) -> Optional[str]:
+        """
+        Prefilter implied by the condition: AND and OR conditions of the literals of payload field values. None if
+        the condition doesn't require any literal in the payload.
+        """
+        if isinstance(cond, (ConditionAND, ConditionOR)):
+            parts = [self.convert_payload_prefilter(arg, fields, payload_format, column, state) for arg in cond.args]
+            if isinstance(cond, ConditionOR) and None in parts:
+                return None
+            parts = list(dict.fromkeys(part for part in parts if part is not None))
+            if not parts:
+                return None
+            if len(parts) == 1:
+                return parts[0]
+            if isinstance(cond, ConditionAND):
+                return f" {self.and_token} ".join(parts)
+            return self.group_expression.format(expr=f" {self.or_token} ".join(parts))
+        if not isinstance(cond, ConditionFieldEqualsValueExpression) or cond.field not in fields:
+            return None
+
+        if isinstance(cond.value, SigmaNumber):
+            literals = [str(cond.value)]
+            whole = True
+        elif isinstance(cond.value, SigmaString):
+            literals = [""]
+            for part in cond.value.s:
+                if isinstance(part, str):
+                    literals[-1] += part
+                else:
+                    literals.append("")
+            whole = len(literals) == 1
+        else:
+            return None
+        escaped = self.payload_escaped_characters[payload_format]
+        literals = [
+            literal for literal in literals
+            if len(literal) >= self.min_term_length and not any(character in escaped for character in literal)
+        ]
+        if not literals:
+            return None
+        literal = max(literals, key=len)
+        whole = whole and literal[0].isalnum() and literal[-1].isalnum()     # value is bounded by the payload markup
+        if isinstance(state, AzureConversionState):
+            state.increment("payload_prefilters")
+        return self.payload_prefilter_expressions[whole, isinstance(cond.value, SigmaCasedString)].format(
+            column=column,
+            value=self.convert_value_literal(literal, state),
+        )
+
+    def quote_payload_string(self, value: str) -> str:
+        """Single-quoted string literal used for field names and regular expressions of the payload extraction."""
+        return "'" + value.replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+    def value_list_operator(self, cond: Union[ConditionOR, ConditionAND], state: ConversionState) -> Optional[str]:
+        """
+        Determine the operator for a value list: in for numbers and booleans and case-sensitive strings, in~ for
+        other plain strings, else None. Lists of exact-typed columns (azure_column_types pipeline state) must only
+        contain numbers and booleans, the case-insensitive string operator would convert every value of the column.
+        """
+        values = [arg.value for arg in cond.args]
+        if all(isinstance(value, (SigmaNumber, SigmaBool)) for value in values):
+            return self.value_list_in_operators[True]
+        if self.is_exact_typed(cond.args[0], state):
+            return None
+        if any(isinstance(value, SigmaString) and value.contains_special() for value in values):
+            return None
+        cased = [isinstance(value, SigmaCasedString) for value in values]
+        if any(cased) and not all(cased):
+            return None
+        return self.value_list_in_operators[all(cased)]
+
+    def decide_convert_condition_as_in_expression(self, cond: Union[ConditionOR, ConditionAND], state: ConversionState) -> bool:
+        if (
+            self.value_list_optimization
+            and isinstance(cond, ConditionOR)
+            and all(isinstance(arg, ConditionFieldEqualsValueExpression) for arg in cond.args)
+            and self.value_list_operator(cond, state) is None
+        ):
+            return False
+        return super().decide_convert_condition_as_in_expression(cond, state)
+
+    def convert_condition_as_in_expression(self, cond: Union[ConditionOR, ConditionAND], state: ConversionState) -> Union[str, DeferredQueryExpression]:
+        """
+        Convert value lists into in-expressions. With value_list_optimization, values are deduplicated and sorted
+        (numbers numerically before strings) and large lists are split into chunks or, if they only contain strings,
+        joined as datatable.
+        """
+        field_name = cond.args[0].field
+        if isinstance(state, AzureConversionState):
+            state.fields[field_name] = None
+        if not self.value_list_optimization or not isinstance(cond, ConditionOR):
+            return super().convert_condition_as_in_expression(cond, state)
+
+        operator = self.value_list_operator(cond, state)
+        case_sensitive = operator == self.value_list_in_operators[True]
+        values = dict()     # normalized value to converted value
+        for arg in cond.args:
+            value = arg.value
+            if isinstance(value, SigmaNumber):
+                normalized = (0, value.number, "")
+            elif isinstance(value, SigmaBool):
+                normalized = (1, value.boolean, "")
+            else:
+                normalized = (2, 0, str(value) if case_sensitive else str(value).lower())
+            if normalized not in values:
+                values[normalized] = (
+                    self.convert_value_str(value, state) if isinstance(value, SigmaString)
+                    else self.bool_values[value.boolean] if isinstance(value, SigmaBool)
+                    else str(value)
+                )
+        converted = [values[normalized] for normalized in sorted(values)]
+        if isinstance(state, AzureConversionState):
+            state.increment("value_list_duplicates", len(cond.args) - len(converted))
+
+        field = self.escape_and_quote_field(field_name)
+        if (
+            self.value_list_datatable_threshold is not None
+            and len(converted) > self.value_list_datatable_threshold
+            and all(kind == 2 for kind, _, _ in values)
+            and all(condition_class is ConditionAND for condition_class in cond.parent_chain_condition_classes())
+        ):
+            return self.convert_value_list_join(field, [
+                self.convert_value_literal(normalized, state) for _, _, normalized in sorted(values)
+            ], case_sensitive, state)
+
+        if self.value_list_chunk_size < 1:
+            raise SigmaConfigurationError("Value list chunk size must be at least 1")
+        chunks = [
+            self.field_in_list_expression.format(
+                field=field,
+                op=operator,
+                list=self.list_separator.join(converted[start:start + self.value_list_chunk_size]),
+            )
+            for start in range(0, len(converted), self.value_list_chunk_size)
+        ]
+        if len(chunks) == 1:
+            return chunks[0]
+        return self.group_expression.format(expr=f" {self.or_token} ".join(chunks))
+
+    def convert_value_list_join(self, field: str, values: List[str], case_sensitive: bool, state: ConversionState) -> AzureJoinDeferredExpression:
+        """
+        Join the table with a datatable of the values. Case-insensitive lists contain lowercase values and are joined
+        with a temporary column of the lowercase field value.
+        """
+        if isinstance(state, AzureConversionState):
+            state.increment("value_list_joins")
+        if case_sensitive:
+            return AzureJoinDeferredExpression(state, field=None, value=self.value_list_join_expression.format(
+                column=self.value_list_join_column,
+                list=self.list_separator.join(values),
+                field=field,
+            ))
+
+        key = self.value_list_join_key.format(index=sum(isinstance(deferred, AzureJoinDeferredExpression) for deferred in state.deferred))
+        return AzureJoinDeferredExpression(state, field=None, value=self.deferred_separator.join((
+            self.value_list_join_key_expression.format(key=key, field=field),
+            self.value_list_join_expression.format(column=self.value_list_join_column, list=self.list_separator.join(values), field=key),
+            self.value_list_join_key_remove_expression.format(key=key),
+        )))
+
+    def is_term_aligned(self, value: SigmaString) -> bool:
+        """
+        Check if a plain string value is a single term of the Log Analytics term index: it must not contain
+        wildcards or punctuation and must be at least min_term_length characters long.
+        """
+        if value.contains_special():
+            return False
+        plain = str(value)
+        return len(plain) >= self.min_term_length and self.term_pattern.match(plain) is not None
+
+    def convert_condition_field_eq_val_str_term(self, cond: ConditionFieldEqualsValueExpression, state: AzureConversionState, case_sensitive: bool) -> Optional[str]:
+        """
+        Convert startswith and endswith matches of term-aligned values into the exact match with the term index
+        operator as pre-filter. Returns None if the value can't be matched with the term index.
+        """
+        if cond.value.startswith(SpecialChars.WILDCARD_MULTI) == cond.value.endswith(SpecialChars.WILDCARD_MULTI):
+            return None     # equality and contains matches, has only matches whole terms
+        elif cond.value.endswith(SpecialChars.WILDCARD_MULTI):
+            value = cond.value[:-1]
+            term = self.case_sensitive_term_startswith_expression if case_sensitive else self.term_startswith_expression
+            exact = self.case_sensitive_startswith_expression if case_sensitive else self.startswith_expression
+        else:
+            value = cond.value[1:]
+            term = self.case_sensitive_term_endswith_expression if case_sensitive else self.term_endswith_expression
+            exact = self.case_sensitive_endswith_expression if case_sensitive else self.endswith_expression
+
+        if not self.is_term_aligned(value):
+            return None
+
+        state.increment("term_index_predicates")
+        field = self.escape_and_quote_field(cond.field)
+        value = self.convert_value_str(value, state)
+        return self.group_expression.format(expr=f" {self.and_token} ".join((
+            term.format(field=field, value=value),
+            exact.format(field=field, value=value),
+        )))
+
+    def convert_value_literal(self, value: str, state: ConversionState) -> str:
+        """Escape and quote a plain string like a Sigma string without wildcards."""
+        return self.convert_value_str(SigmaString(value.replace("\\", "\\\\").replace("*", "\\*").replace("?", "\\?")), state)
+
+    def is_simple_wildcard(self, value: SigmaString) -> bool:
+        """Value can be matched with the equal, startswith, endswith or contains operators."""
+        if value.startswith(SpecialChars.WILDCARD_MULTI):
+            value = value[1:]
+        if value.endswith(SpecialChars.WILDCARD_MULTI):
+            value = value[:-1]
+        return not value.contains_special()
+
+    def convert_condition_field_eq_val_str_wildcards(self, cond: ConditionFieldEqualsValueExpression, state: ConversionState, case_sensitive: bool) -> Optional[str]:
+        """
+        Convert values with wildcards inside of the value into a conjunction of startswith, contains and endswith
+        pre-filters for the literal parts, which are cheap to evaluate, followed by a length check or a regular
+        expression check that matches the exact pattern.
+        """
+        pattern = compile_wildcards(cond.value)
+        if pattern is None:
+            return None
+
+        field = self.escape_and_quote_field(cond.field)
+
+        checks = []
+        if pattern.prefix:
+            expression = self.case_sensitive_startswith_expression if case_sensitive else self.startswith_expression
+            checks.append(expression.format(field=field, value=self.convert_value_literal(pattern.prefix, state)))
+        for infix in pattern.infixes:
+            expression = self.case_sensitive_contains_expression if case_sensitive else self.contains_expression
+            checks.append(expression.format(field=field, value=self.convert_value_literal(infix, state)))
+        if pattern.suffix:
+            expression = self.case_sensitive_endswith_expression if case_sensitive else self.endswith_expression
+            checks.append(expression.format(field=field, value=self.convert_value_literal(pattern.suffix, state)))
+
+        if pattern.exact:
+            if pattern.length_check:
+                checks.append(self.wildcard_length_expression.format(
+                    field=field,
+                    operator=self.compare_operators[SigmaCompareExpression.CompareOperators.GTE] if pattern.variable_length else "==",
+                    length=pattern.length,
+                ))
+        else:
+            regex = SigmaRegularExpression(pattern.regex, {SigmaRegularExpressionFlag.DOTALL} | (set() if case_sensitive else {SigmaRegularExpressionFlag.IGNORECASE}))
+            checks.append(self.re_expression.format(
+                field=field,
+                regex=self.convert_value_re(regex, state),
+                **self.get_flag_template(regex),
+            ))
+            if isinstance(state, AzureConversionState):
+                state.increment("wildcard_regex_checks")
+
+        if isinstance(state, AzureConversionState):
+            state.increment("wildcards_compiled")
+        if len(checks) == 1:
+            return checks[0]
+        return self.group_expression.format(expr=f" {self.and_token} ".join(checks))
+
+    def convert_condition_field_eq_val_str(self, cond: ConditionFieldEqualsValueExpression, state: ConversionState) -> Union[str, DeferredQueryExpression]:
+        if self.term_index_operators:
+            expression = self.convert_condition_field_eq_val_str_term(cond, state, case_sensitive=False)
+            if expression is not None:
+                return expression
+        if self.wildcard_compilation and not self.is_simple_wildcard(cond.value):
+            expression = self.convert_condition_field_eq_val_str_wildcards(cond, state, case_sensitive=False)
+            if expression is not None:
+                return expression
+        return super().convert_condition_field_eq_val_str(cond, state)
+
+    def is_exact_typed(self, cond: ConditionFieldEqualsValueExpression, state: ConversionState) -> bool:
+        """Field is a numeric or boolean column in the schema applied by the processing pipeline."""
+        return cond.field in state.processing_state.get(column_types_state_key, ())
+
+    def convert_condition_field_eq_val_num(self, cond: ConditionFieldEqualsValueExpression, state: ConversionState) -> Union[str, DeferredQueryExpression]:
+        if self.is_exact_typed(cond, state):
+            return self.escape_and_quote_field(cond.field) + self.typed_eq_token + str(cond.value)
+        return super().convert_condition_field_eq_val_num(cond, state)
+
+    def convert_condition_field_eq_val_bool(self, cond: ConditionFieldEqualsValueExpression, state: ConversionState) -> Union[str, DeferredQueryExpression]:
+        if self.is_exact_typed(cond, state):
+            return self.escape_and_quote_field(cond.field) + self.typed_eq_token + self.bool_values[cond.value.boolean]
+        return super().convert_condition_field_eq_val_bool(cond, state)
+
+    def convert_condition_field_eq_val_str_case_sensitive(self, cond: ConditionFieldEqualsValueExpression, state: ConversionState) -> Union[str, DeferredQueryExpression]:
+        if self.term_index_operators:
+            expression = self.convert_condition_field_eq_val_str_term(cond, state, case_sensitive=True)
+            if expression is not None:
+                return expression
+        if self.wildcard_compilation and not self.is_simple_wildcard(cond.value):
+            expression = self.convert_condition_field_eq_val_str_wildcards(cond, state, case_sensitive=True)
+            if expression is not None:
+                return expression
+        return super().convert_condition_field_eq_val_str_case_sensitive(cond, state)
+
+    def convert_lowered_regex(self, cond: ConditionFieldEqualsValueExpression, state: ConversionState) -> Optional[str]:
+        """
+        Convert regular expressions that only match literal strings into the equivalent string operators, which are
+        much cheaper than regular expression matching. Returns None if the regular expression can't be lowered.
+        """
+        regex: SigmaRegularExpression = cond.value
+        lowered = analyze_regex(regex.regexp, SigmaRegularExpressionFlag.MULTILINE in regex.flags)
+        if lowered is None:
+            return None
+
+        ignore_case = SigmaRegularExpressionFlag.IGNORECASE in regex.flags
+        field = self.escape_and_quote_field(cond.field)
+        values = [self.convert_value_literal(literal, state) for literal in lowered.literals]
+        if len(values) == 1:
+            return self.lowered_re_expressions[lowered.operator, ignore_case].format(field=field, value=values[0])
+        elif lowered.operator == "equals":
+            return self.lowered_re_in_expressions[ignore_case].format(field=field, list=self.list_separator.join(values))
+        else:
+            expression = self.lowered_re_expressions[lowered.operator, ignore_case]
+            return self.group_expression.format(expr=f" {self.or_token} ".join(
+                expression.format(field=field, value=value)
+                for value in values
+            ))
+
+    def convert_condition_field_eq_val_re(self, cond: ConditionFieldEqualsValueExpression, state: ConversionState) -> Union[str, DeferredQueryExpression]:
+        if self.regex_lowering:
+            expression = self.convert_lowered_regex(cond, state)
+            if isinstance(state, AzureConversionState):
+                state.increment("regex_lowered" if expression is not None else "regex_not_lowered")
+            if expression is not None:
+                return expression
+        return super().convert_condition_field_eq_val_re(cond, state)
+
+    def convert_time_window(self, rule: SigmaRule, state: ConversionState) -> Optional[str]:
+        """
+        Convert the time window that applies to the rule into a filter expression. The time window is taken from the
+        custom attribute of the rule, the pipeline state or the time_window backend option, in this order.
+        """
+        time_window = rule.custom_attributes.get(
+            self.time_window_state_key,
+            state.processing_state.get(self.time_window_state_key, self.time_window),
+        )
+        if time_window is None:
+            return None
+        elif isinstance(time_window, str) and self.time_window_timespan_pattern.match(time_window):
+            return self.time_window_ago_expression.format(column=self.time_column, timespan=time_window)
+        elif isinstance(time_window, dict) and set(time_window) == {"start", "end"}:
+            time_window = (time_window["start"], time_window["end"])
+
+        if isinstance(time_window, (tuple, list)) and len(time_window) == 2:
+            start, end = (value.isoformat() if isinstance(value, (date, datetime)) else str(value) for value in time_window)
+            return self.time_window_between_expression.format(column=self.time_column, start=start, end=end)
+        raise SigmaConfigurationError(
+            f"Invalid time window '{time_window}', must be a timespan like 1d or a start and end time",
+            source=rule.source,
+        )
+
     def escape_and_quote_field(self, field_name: str) -> str:
         """
-        Wrap raw field names with brackets if they have spaces.
+        Wrap raw field names with brackets if they have spaces. Field names are only escaped once per backend.
         """
-        field = super().escape_and_quote_field(field_name)
+        field = self.field_names.get(field_name)
+        if field is not None:
+            return field
+
+        if self.profile is None:
+            field = super().escape_and_quote_field(field_name)
+        else:
+            field = self.profile.call("escape_and_quote_field", super().escape_and_quote_field, field_name)
 
         if field.startswith(self.field_quote) and field.endswith(self.field_quote):
             field = "[" + field + "]"
 
+        if len(self.field_names) >= self.field_name_cache_size:
+            self.field_names.clear()
+        self.field_names[field_name] = field
         return field
 
-    def finalize_query(self, rule: SigmaRule, query: Union[str, DeferredQueryExpression], index: int, state: ConversionState, output_format: str) -> Union[str, DeferredQueryExpression]:
+    def finalize_query(self, rule: SigmaRule, query: Union[str, DeferredQueryExpression], index: int, state: ConversionState, output_format: str) -> Union[str, DeferredQueryExpression, List[Union[str, DeferredQueryExpression]]]:
+        """
+        Converting our "AzureLogsourceDeferredExpression" into an Azure Table Prefix. If the log source is mapped to
+        multiple tables, the deferred query parts are pushed down into each table. Depending on multi_table_output,
+        the tables are combined with an union or a separate query is generated for each table.
+        """
+
+        # Tables in order of appearance without duplicates
+        tables = list(dict.fromkeys(
+            deferred.value for deferred in state.deferred if isinstance(deferred, AzureLogsourceDeferredExpression)
+        ))
+        state.deferred = [deferred for deferred in state.deferred if not isinstance(deferred, AzureLogsourceDeferredExpression)]
+
+        # Time window filter as first query part after the table
+        time_window = self.convert_time_window(rule, state)
+        if time_window is not None:
+            time_window_expression = AzureTimeWindowDeferredExpression(state, field=None, value=time_window)
+            state.deferred.remove(time_window_expression)
+            state.deferred.insert(0, time_window_expression)
+
+        # Projection of the columns used by the rule as last query part, aggregated rows only contain the group columns
+        if self.project_fields and not any(isinstance(deferred, AzureSummarizeDeferredExpression) for deferred in state.deferred):
+            self.convert_projection(rule, state)
+
+        state.deferred.sort(key=lambda deferred: getattr(deferred, "stage", 2))
+
+        if isinstance(state, AzureConversionState):
+            self.query_statistics.append((rule, state.statistics))
+
+        if len(tables) == 0:
+            if self.strict_logsource:
+                raise SigmaFeatureNotSupportedByBackendError(
+                    f"No Azure table is mapped to the log source of the rule and the query would scan all tables with '{self.deferred_only_query}'",
+                    source=rule.source,
+                )
+            self.union_fallback_rules.append(rule)
+
+        unknown_fields = {table: fields for table, fields in state.processing_state.get(unknown_fields_state_key, dict()).items() if fields}
+        if unknown_fields:
+            if self.strict_schema:
+                raise SigmaFeatureNotSupportedByBackendError(
+                    "Fields of the rule aren't columns of its tables: " + ", ".join(
+                        f"{', '.join(fields)} ({table})" for table, fields in unknown_fields.items()
+                    ),
+                    source=rule.source,
+                )
+            self.unknown_field_rules.append((rule, unknown_fields))
+
+        # Rules that only consist of filters are combined in the batch output format, all other rules are converted
+        # into separate queries. Batched rules are finalized like separate queries first, so the cost budget applies
+        # to them. Queries changed by postprocessing items of the processing pipeline are never batched.
+        if output_format == "batch" and all(isinstance(deferred, AzureDeferredPredicateExpression) for deferred in state.deferred):
+            predicates = [
+                deferred.finalize_predicate()
+                for deferred in state.deferred
+                if not isinstance(deferred, AzureTimeWindowDeferredExpression)
+            ]
+            batch_query = AzureBatchQuery(
+                rule=rule,
+                tables=tuple(tables),
+                time_window=time_window,
+                predicate=predicates[0] if len(predicates) == 1 else f" {self.and_token} ".join(
+                    self.group_expression.format(expr=predicate) for predicate in predicates
+                ) or "true",
+            )
+            finalized = self.finalize_tables(rule, query, tables, index, state, output_format)
+            if self.last_processing_pipeline.postprocessing_items:
+                return finalized
+            return batch_query
+
+        return self.finalize_tables(rule, query, tables, index, state, output_format)
+
+    def finalize_tables(self, rule: SigmaRule, query: Union[str, DeferredQueryExpression], tables: List[str], index: int, state: ConversionState, output_format: str) -> Union[str, DeferredQueryExpression, List[Union[str, DeferredQueryExpression]]]:
+        """Prepend the tables to the query and finalize it with the output format and the processing pipeline."""
+        if len(tables) == 0:
+            return super().finalize_query(rule, query or self.deferred_only_query, index, state, output_format)
+        elif len(tables) == 1:
+            return super().finalize_query(rule, tables[0], index, state, output_format)
+        elif self.multi_table_output == "split":
+            return [
+                super(AzureBackend, self).finalize_query(rule, table, index, state, output_format)
+                for table in tables
+            ]
+        elif self.multi_table_output == "union":
+            # aggregations are applied to the rows of all tables after the union
+            pushed = [deferred for deferred in state.deferred if not isinstance(deferred, AzureSummarizeDeferredExpression)]
+            if pushed:
+                pushed_down = self.deferred_start + self.deferred_separator.join(
+                    deferred_expression.finalize_expression()
+                    for deferred_expression in pushed
+                )
+                branches = [self.union_branch_expression.format(query=table + pushed_down) for table in tables]
+                state.deferred = [deferred for deferred in state.deferred if isinstance(deferred, AzureSummarizeDeferredExpression)]
+            else:
+                branches = tables
+            return super().finalize_query(
+                rule,
+                self.union_expression.format(
+                    source_column=self.union_source_column,
+                    tables=self.union_separator.join(branches),
+                ),
+                index,
+                state,
+                output_format,
+            )
+        else:
+            raise SigmaConfigurationError(f"Unknown multi-table output '{self.multi_table_output}', must be 'union' or 'split'")
+
+    def convert_projection(self, rule: SigmaRule, state: ConversionState) -> None:
         """
-        Converting our "AzureLogsourceDeferredExpression" into an Azure Table Prefix
+        Add the projection of the keep columns, the fields referenced by the condition and the fields listed in the
+        rule. If the processing pipeline resolved the columns of the tables of the rule (azure_columns pipeline state),
+        keep columns and listed fields that aren't columns are left out, except listed fields of tables with payload,
+        which are extracted from the payload before the projection if the condition doesn't reference them.
         """
+        referenced = state.fields if isinstance(state, AzureConversionState) else dict()
+        columns = dict.fromkeys(self.project_keep_columns)
+        columns.update(referenced)
+        columns.update(dict.fromkeys(rule.fields))
+
+        table_columns = state.processing_state.get(columns_state_key)
+        if table_columns is not None:
+            table_columns = set(table_columns)
+            payload = state.processing_state.get(payload_state_key)
+            listed = set(rule.fields) if payload else set()
+            skipped = [column for column in columns if column not in table_columns and column not in referenced and column not in listed]
+            extracted = [column for column in columns if column not in table_columns and column not in referenced and column in listed]
+            columns = {column: None for column in columns if column not in skipped}
+            if extracted:
+                parse = not any(isinstance(deferred, AzurePayloadExtendDeferredExpression) for deferred in state.deferred)
+                AzureProjectExtendDeferredExpression(state, field=None, value=self.convert_payload_fields(extracted, payload, parse))
+            if isinstance(state, AzureConversionState) and skipped:
+                state.increment("projection_skipped_columns", len(skipped))
+
+        AzureProjectDeferredExpression(
+            state,
+            field=None,
+            value=self.list_separator.join(self.escape_and_quote_field(column) for column in columns),
+        )
+
+    def estimate_cost(self, rule: SigmaRule, query: str) -> AzureQueryCost:
+        """Estimate the cost of a finalized query and raise an error if it exceeds the cost budget."""
+        cost = (self.cost_model or AzureCostModel()).estimate(query)
+        if self.cost_budget is not None and cost.score > self.cost_budget:
+            raise SigmaFeatureNotSupportedByBackendError(
+                f"Estimated query cost {cost.score:.1f} exceeds the cost budget {self.cost_budget}",
+                source=rule.source,
+            )
+        return cost
+
+    def finalize_query_default(self, rule: SigmaRule, query: str, index: int, state: ConversionState) -> str:
+        if self.cost_budget is not None:
+            self.estimate_cost(rule, query)
+        return query
+
+    def finalize_query_metadata(self, rule: SigmaRule, query: str, index: int, state: ConversionState) -> Dict[str, Any]:
+        return {
+            "rule_id": str(rule.id) if rule.id is not None else None,
+            "title": rule.title,
+            "query": query,
+            "cost": self.estimate_cost(rule, query).to_dict(),
+        }
+
+    def finalize_output_metadata(self, queries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return queries
+
+    def finalize_query_batch(self, rule: SigmaRule, query: str, index: int, state: ConversionState) -> str:
+        if self.cost_budget is not None:
+            self.estimate_cost(rule, query)
+        return query
+
+    def finalize_batch(self, queries: List[AzureBatchQuery]) -> str:
+        """
+        Combine rules with the same tables and time window into one query that scans the tables only once.
+        """
+        tables = queries[0].tables
+        if len(tables) == 0:
+            prefix = self.deferred_only_query
+        elif len(tables) == 1:
+            prefix = tables[0]
+        else:
+            prefix = self.union_expression.format(source_column=self.union_source_column, tables=self.union_separator.join(tables))
+
+        flags = [self.batch_flag_column.format(index=index) for index in range(len(queries))]
+        parts = [prefix]
+        if queries[0].time_window is not None:
+            parts.append(AzureTimeWindowDeferredExpression.template.format(value=queries[0].time_window))
+        parts += [
+            self.batch_extend_expression.format(flags=self.list_separator.join(
+                self.batch_flag_expression.format(column=flag, predicate=query.predicate)
+                for flag, query in zip(flags, queries)
+            )),
+            self.batch_filter_expression.format(flags=f" {self.or_token} ".join(flags)),
+            self.batch_rule_id_expression.format(column=self.batch_rule_id_column, rule_ids=self.list_separator.join(
+                self.batch_rule_id_item_expression.format(
+                    flag=flag,
+                    rule_id=query.rule_id.replace("\\", "\\\\").replace('"', '\\"'),
+                )
+                for flag, query in zip(flags, queries)
+            )),
+            self.batch_expand_expression.format(column=self.batch_rule_id_column),
+            self.batch_expand_filter_expression.format(column=self.batch_rule_id_column),
+            self.batch_project_away_expression.format(columns=self.list_separator.join(flags)),
+        ]
+        return self.deferred_separator.join(parts)
+
+    def finalize_output_batch(self, queries: List[Union[str, AzureBatchQuery]]) -> List[str]:
+        """
+        Group the converted rules by tables and time window in order of first appearance and combine each group
+        into queries of at most batch_size rules. Rules that couldn't be batched are passed through.
+        """
+        if self.batch_size < 1:
+            raise SigmaConfigurationError("Batch size must be at least 1")
+
+        groups: Dict[Tuple[Tuple[str, ...], Optional[str]], List[AzureBatchQuery]] = dict()
+        output: List[Union[str, List[AzureBatchQuery]]] = list()
+        for query in queries:
+            if isinstance(query, AzureBatchQuery):
+                key = (query.tables, query.time_window)
+                if key not in groups:
+                    groups[key] = list()
+                    output.append(groups[key])
+                groups[key].append(query)
+            else:
+                output.append(query)
+
+        return [
+            batch
+            for item in output
+            for batch in (
+                [self.finalize_batch(item[start:start + self.batch_size]) for start in range(0, len(item), self.batch_size)]
+                if isinstance(item, list) else [item]
+            )
+        ]
 
-        logsource_expressions = [deferred for deferred in state.deferred if isinstance(deferred, AzureLogsourceDeferredExpression)]
-        if len(logsource_expressions):
-            query = logsource_expressions[0].value  # TODO Might be more than one table
-            state.deferred = list(filter(lambda d: not isinstance(d, AzureLogsourceDeferredExpression), state.deferred))
 
-        return super().finalize_query(rule, query, index, state, output_format)
+compile_templates(AzureBackend, inherited=True)
@@ -0,0 +1,207 @@
+import dataclasses
+import hashlib
+import json
+import os
+import re
+from collections import OrderedDict
+from importlib import metadata
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+import yaml
+from sigma.processing.pipeline import ProcessingPipeline
+from sigma.rule import SigmaRule
+
+import sigma
+
+
+def package_version(name: str) -> str:
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def _canonical(value: Any) -> Any:
+    """
+    Convert processing pipeline objects into a JSON-serializable structure that only contains the parts relevant
+    for conversion. Dataclass fields that are excluded from comparison (back references to processing items or
+    the randomly generated condition names of AddConditionTransformation) are skipped.
+    """
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return {
+            "class": value.__class__.__module__ + "." + value.__class__.__qualname__,
+            **{
+                f.name: _canonical(getattr(value, f.name))
+                for f in dataclasses.fields(value)
+                if f.compare
+            },
+        }
+    elif isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in sorted(value.items(), key=lambda item: str(item[0]))}
+    elif isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    elif isinstance(value, (set, frozenset)):
+        return sorted((_canonical(v) for v in value), key=str)
+    elif isinstance(value, re.Pattern):
+        return value.pattern
+    elif isinstance(value, type) or callable(value):
+        return getattr(value, "__qualname__", repr(value))
+    elif value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    else:
+        return repr(value)
+
+
+def _hash(value: Any) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def rule_fingerprint(rule: SigmaRule) -> str:
+    """Hash of the normalized YAML representation of an unprocessed rule."""
+    return hashlib.sha256(
+        yaml.safe_dump(rule.to_dict(), sort_keys=True, default_flow_style=False).encode("utf-8")
+    ).hexdigest()
+
+
+def pipeline_fingerprint(pipeline: Optional[ProcessingPipeline]) -> str:
+    """Hash of all processing, postprocessing and finalization items of a processing pipeline."""
+    if pipeline is None:
+        return _hash(None)
+    return _hash({
+        "items": _canonical(pipeline.items),
+        "postprocessing_items": _canonical(pipeline.postprocessing_items),
+        "finalizers": _canonical(pipeline.finalizers),
+        "vars": _canonical(pipeline.vars),
+    })
+
+
+def backend_fingerprint(backend: "sigma.backends.azure.AzureBackend") -> str:
+    """
+    Hash of the backend class and all of its settings (tokens, expression templates and backend options) that
+    influence the generated queries. Dataclass options like the cost model are included, except the profile, which
+    only records measurements.
+    """
+    settings = {}
+    for name in dir(type(backend)):
+        if name.startswith("_") or name == "profile":
+            continue
+        value = getattr(backend, name)
+        if (
+            isinstance(value, (str, int, float, bool, tuple, list, dict, frozenset, re.Pattern))
+            or value is None
+            or dataclasses.is_dataclass(value) and not isinstance(value, type)
+        ):
+            settings[name] = _canonical(value)
+    return _hash({
+        "class": type(backend).__module__ + "." + type(backend).__qualname__,
+        "settings": settings,
+    })
+
+
+class AzureConversionCache:
+    """
+    Persistent content-addressed cache of conversion results. Each entry is stored as JSON file in the cache
+    directory, the file name is the cache key. The number of entries is bounded by max_entries, the least
+    recently used entries are evicted first.
+    """
+
+    def __init__(self, directory: Union[str, Path], max_entries: int = 10000):
+        if max_entries < 1:
+            raise ValueError("Conversion cache must be able to hold at least one entry")
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # Index of existing entries in least recently used order. The file modification time is used as access
+        # time, which keeps the order persistent over multiple runs.
+        entries = sorted(self.directory.glob("*.json"), key=lambda path: path.stat().st_mtime)
+        self.entries: "OrderedDict[str, Path]" = OrderedDict((path.stem, path) for path in entries)
+        self.evict()
+
+    @staticmethod
+    def key(rule: SigmaRule, context: str) -> str:
+        """
+        Derive cache key from the rule content and the conversion context fingerprint (processing pipeline,
+        backend settings, output format and package versions).
+        """
+        return hashlib.sha256((rule_fingerprint(rule) + context).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def context(backend: "sigma.backends.azure.AzureBackend", pipeline: ProcessingPipeline, output_format: str) -> str:
+        return _hash({
+            "pipeline": pipeline_fingerprint(pipeline),
+            "backend": backend_fingerprint(backend),
+            "output_format": output_format,
+            "version": package_version("pySigma-backend-azure"),
+            "pysigma_version": package_version("pySigma"),
+        })
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Cache entry with the queries and the bookkeeping of the rule (see put), None if the key isn't cached."""
+        path = self.entries.get(key)
+        if path is not None:
+            try:
+                entry = json.loads(path.read_text(encoding="utf-8"))
+                if not isinstance(entry, dict) or "queries" not in entry:
+                    raise ValueError("Cache entry without queries")
+                os.utime(path)
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            except (OSError, ValueError):  # entry was removed, is corrupted or of an older version, treat as miss
+                del self.entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key: str, queries: List[Any], statistics: Optional[List[Dict[str, Any]]] = None, union_fallback: bool = False, unknown_fields: Optional[Dict[str, List[str]]] = None) -> None:
+        """
+        Store the queries of a rule with the bookkeeping of its conversion: the statistics of each query, whether
+        it's an union fallback and its unknown fields by table, which are replayed on a cache hit.
+        """
+        try:
+            content = json.dumps({
+                "queries": queries,
+                "statistics": statistics or [],
+                "union_fallback": union_fallback,
+                "unknown_fields": unknown_fields or {},
+            })
+        except TypeError:  # output format with results that can't be cached
+            return
+        path = self.directory / (key + ".json")
+        path.write_text(content, encoding="utf-8")
+        self.entries[key] = path
+        self.entries.move_to_end(key)
+        self.evict()
+
+    def evict(self) -> None:
+        while len(self.entries) > self.max_entries:
+            _, path = self.entries.popitem(last=False)
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            self.evictions += 1
+
+    def clear(self) -> None:
+        for path in self.entries.values():
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+        self.entries.clear()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @property
+    def statistics(self) -> Dict[str, int]:
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
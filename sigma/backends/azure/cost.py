@@ -0,0 +1,173 @@
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+# Tokens of generated queries: strings, quoted fields, unbound value lists, words (including operators like in~ or
+# project-away), comparison operators and single characters.
+_token_pattern = re.compile(r"""
+    "(?:[^"\\]|\\.)*"
+  | \['(?:[^'\\]|\\.)*'\]
+  | \["\*"\]
+  | [A-Za-z_]\w*(?:-[A-Za-z_]\w*)*~?
+  | =~|==|!=|!~|<=|>=
+  | \S
+""", re.VERBOSE)
+
+# Predicate category of each query operator
+predicate_categories: Dict[str, str] = {
+    "matches": "regex",
+    "match": "match",
+    **{
+        operator: "substring"
+        for operator in (
+            "contains", "startswith", "endswith", "contains_cs", "startswith_cs", "endswith_cs",
+            "casematch_contains", "casematch_startswith", "casematch_endswith",
+        )
+    },
+    **{
+        operator: "term"
+        for operator in ("has", "hasprefix", "hassuffix", "has_cs", "hasprefix_cs", "hassuffix_cs", "has_any")
+    },
+    "=~": "equality",
+    "==": "equality",
+    "casematch": "equality",
+    "in": "list",
+    "in~": "list",
+    "ipv4_is_in_range": "cidr",
+    "join": "join",
+}
+list_operators = frozenset({"in", "in~", "has_any", "datatable"})
+
+
+@dataclass
+class AzureQueryCost:
+    """
+    Static cost estimate of a query: the query features the score is computed from and the contribution of each
+    component (tables, predicates, lists, nesting, length) to the score.
+    """
+    tables: int                     # Number of scanned tables, union * is counted as AzureCostModel.all_tables
+    all_tables: bool                # Query scans all tables of the workspace
+    predicates: Dict[str, int]      # Number of predicates by category, see predicate_categories
+    list_values: int                # Values of all in-lists and datatables
+    max_list_size: int
+    nesting_depth: int              # Maximum nesting depth of parentheses
+    length: int                     # Query size in bytes
+    breakdown: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def score(self) -> float:
+        return sum(self.breakdown.values())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "score": self.score,
+            "breakdown": self.breakdown,
+            "tables": self.tables,
+            "all_tables": self.all_tables,
+            "predicates": self.predicates,
+            "list_values": self.list_values,
+            "max_list_size": self.max_list_size,
+            "nesting_depth": self.nesting_depth,
+            "length": self.length,
+        }
+
+
+def _tokens(query: str) -> List[str]:
+    return _token_pattern.findall(query)
+
+
+def _scanned_tables(tokens: List[str]) -> Optional[int]:
+    """Number of tables scanned by the query, None if it scans all tables."""
+    if not tokens or tokens[0] != "union":
+        return 1
+    position = 1
+    if position < len(tokens) and tokens[position] == "withsource":
+        position += 3       # withsource = column
+    if position < len(tokens) and tokens[position] == "*":
+        return None
+    branches, depth = 1, 0
+    for token in tokens[position:]:
+        if token == "(":
+            depth += 1
+        elif token == ")":
+            depth -= 1
+        elif depth == 0 and token == ",":
+            branches += 1
+        elif depth == 0 and token == "|":
+            break
+    return branches
+
+
+@dataclass
+class AzureCostModel:
+    """
+    Weights of the static query cost model. Each predicate and list value is evaluated on the rows of all scanned
+    tables, therefore their cost is multiplied with the number of tables:
+
+        score = tables * (table_weight + predicate weights + list_value_weight * list values)
+                + nesting_weight * nesting depth + length_weight * length
+    """
+    table_weight: float = 10.0
+    all_tables: int = 50            # Number of tables assumed for queries scanning all tables (union *)
+    predicate_weights: Dict[str, float] = field(default_factory=lambda: {
+        "regex": 20.0,
+        "match": 15.0,
+        "substring": 4.0,
+        "cidr": 3.0,
+        "join": 10.0,
+        "term": 1.0,
+        "equality": 1.0,
+        "list": 1.0,
+    })
+    list_value_weight: float = 0.05
+    nesting_weight: float = 1.0
+    length_weight: float = 0.01
+
+    def estimate(self, query: str) -> AzureQueryCost:
+        tokens = _tokens(query)
+        scanned = _scanned_tables(tokens)
+
+        predicates: Dict[str, int] = dict()
+        list_sizes = []
+        depth = nesting_depth = 0
+        for position, token in enumerate(tokens):
+            if token in ("(", "["):
+                depth += 1
+                nesting_depth = max(nesting_depth, depth)
+            elif token in (")", "]"):
+                depth -= 1
+            category = predicate_categories.get(token)
+            if category is not None:
+                predicates[category] = predicates.get(category, 0) + 1
+            if token in list_operators:     # values up to the closing parenthesis or bracket of the list
+                size, list_depth = 0, 0
+                for value in tokens[position + 1:]:
+                    if value in ("(", "["):
+                        list_depth += 1
+                    elif value in (")", "]"):
+                        list_depth -= 1
+                        if list_depth == 0 and value == ("]" if token == "datatable" else ")"):
+                            break
+                    elif value.startswith('"') or value[0].isdigit():
+                        size += 1
+                list_sizes.append(size)
+
+        tables = self.all_tables if scanned is None else scanned
+        predicate_cost = sum(self.predicate_weights.get(category, 1.0) * count for category, count in predicates.items())
+        length = len(query.encode("utf-8"))
+        return AzureQueryCost(
+            tables=tables,
+            all_tables=scanned is None,
+            predicates=predicates,
+            list_values=sum(list_sizes),
+            max_list_size=max(list_sizes, default=0),
+            nesting_depth=nesting_depth,
+            length=length,
+            breakdown={
+                "tables": tables * self.table_weight,
+                "predicates": tables * predicate_cost,
+                "lists": tables * self.list_value_weight * sum(list_sizes),
+                "nesting": self.nesting_weight * nesting_depth,
+                "length": self.length_weight * length,
+            },
+        )
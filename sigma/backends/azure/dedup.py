@@ -0,0 +1,243 @@
+"""
+Canonical form of generated queries and deduplication of equivalent queries across rules. Forks of rules and rules
+that only differ in the order of their conditions or values compile to equivalent queries, which would be deployed
+as separate analytics. The canonical form normalizes the parts of a query that don't change its result:
+
+* whitespace between tokens
+* the order of the items of AND and OR conditions, which are flattened and deduplicated
+* adjacent where stages, which are combined into one AND condition
+* the order of values in in, in~ and has_any lists, which are deduplicated
+* the case of string literals compared with case-insensitive operators (=~, contains, has, in~, ...)
+* the order of the tables of an union
+
+Queries with the same canonical form are grouped under the first query with the ids of all rules:
+
+    result = deduplicate_queries((rule_id, query) for rule_id, query in converted)
+    print(f"{result.unique} of {result.queries} queries are unique ({result.ratio:.0%} removed)")
+"""
+import hashlib
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+_token_pattern = re.compile(r"""
+    (?P<space>\s+)
+  | (?P<string>@?"(?:[^"\\]|\\.)*"|@?'(?:[^'\\]|\\.)*')
+  | (?P<word>!?\w+(?:-\w+)*~?)
+  | (?P<operator>==|=~|!=|!~|<=|>=|\.\.|.)
+""", re.VERBOSE | re.DOTALL)
+
+# Operators whose string operands are compared case-insensitively
+case_insensitive_operators = frozenset({
+    "=~", "!~", "in~", "!in~", "has_any", "has_all",
+    "contains", "!contains", "startswith", "!startswith", "endswith", "!endswith",
+    "has", "!has", "hasprefix", "!hasprefix", "hassuffix", "!hassuffix",
+})
+list_operators = frozenset({"in", "!in", "in~", "!in~", "has_any", "has_all"})     # Operators with unordered value lists
+
+Token = Tuple[str, str]     # (kind, text)
+
+
+def tokenize(query: str) -> List[Token]:
+    return [(match.lastgroup, match.group()) for match in _token_pattern.finditer(query) if match.lastgroup != "space"]
+
+
+def split_tokens(tokens: List[Token], separator: str) -> List[List[Token]]:
+    """Split tokens at separator tokens outside of parentheses and brackets."""
+    parts: List[List[Token]] = [[]]
+    depth = 0
+    for token in tokens:
+        if token[0] == "operator" and token[1] in "([":
+            depth += 1
+        elif token[0] == "operator" and token[1] in ")]":
+            depth -= 1
+        if depth == 0 and token == ("operator", separator):
+            parts.append([])
+        else:
+            parts[-1].append(token)
+    return parts
+
+
+def join_tokens(tokens: Iterable[Token]) -> str:
+    return " ".join(text for _, text in tokens)
+
+
+class _ExpressionParser:
+    """Parser of where conditions into ("and"/"or", items), ("not", item) and predicate token lists."""
+
+    def __init__(self, tokens: List[Token]):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self) -> Optional[Token]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def accept(self, kind: str, text: str) -> bool:
+        if self.peek() == (kind, text):
+            self.position += 1
+            return True
+        return False
+
+    def parse(self) -> Any:
+        expression = self.parse_junction("or")
+        if self.peek() is not None:     # unbalanced query, kept as predicate
+            return list(self.tokens)
+        return expression
+
+    def parse_junction(self, operator: str) -> Any:
+        parse_item = (lambda: self.parse_junction("and")) if operator == "or" else self.parse_unary
+        items = [parse_item()]
+        while self.accept("word", operator):
+            items.append(parse_item())
+        return items[0] if len(items) == 1 else (operator, items)
+
+    def parse_unary(self) -> Any:
+        if self.accept("word", "not"):
+            return ("not", self.parse_unary())
+        if self.accept("operator", "("):
+            expression = self.parse_junction("or")
+            self.accept("operator", ")")
+            return expression
+        predicate: List[Token] = []
+        depth = 0
+        while (token := self.peek()) is not None:
+            if depth == 0 and (token in (("word", "and"), ("word", "or")) or token == ("operator", ")")):
+                break
+            if token[0] == "operator" and token[1] in "([":
+                depth += 1
+            elif token[0] == "operator" and token[1] in ")]":
+                depth -= 1
+            predicate.append(token)
+            self.position += 1
+        return predicate
+
+
+def canonical_predicate(tokens: List[Token]) -> str:
+    """Predicate with lowercase operands of case-insensitive operators and sorted value lists."""
+    for index, (kind, text) in enumerate(tokens):
+        if kind == "string" or text not in case_insensitive_operators | list_operators:
+            continue
+        operand = tokens[index + 1:]
+        if text in case_insensitive_operators:
+            operand = [(kind, value.lower() if kind == "string" else value) for kind, value in operand]
+        if text in list_operators and operand and operand[0] == ("operator", "(") and operand[-1] == ("operator", ")"):
+            values = sorted({join_tokens(value) for value in split_tokens(operand[1:-1], ",")})
+            return join_tokens(tokens[:index + 1]) + " ( " + " , ".join(values) + " )"
+        return join_tokens(tokens[:index + 1] + operand)
+    return join_tokens(tokens)
+
+
+def canonical_expression(expression: Any) -> str:
+    if isinstance(expression, list):
+        return canonical_predicate(expression)
+    if expression[0] == "not":
+        return "not ( " + canonical_expression(expression[1]) + " )"
+    operator, items = expression
+    flattened: List[Any] = []
+    for item in items:
+        if isinstance(item, tuple) and item[0] == operator:
+            flattened.extend(item[1])
+        else:
+            flattened.append(item)
+    rendered = sorted(set(canonical_expression(item) for item in flattened))
+    if len(rendered) == 1:
+        return rendered[0]
+    return "( " + f" {operator} ".join(rendered) + " )"
+
+
+def canonical_source(tokens: List[Token]) -> str:
+    """Table or union with sorted tables and canonical branch queries."""
+    if not tokens or tokens[0] != ("word", "union"):
+        return join_tokens(tokens)
+    position = 1
+    while position + 2 < len(tokens) and tokens[position + 1] == ("operator", "="):     # union options
+        position += 3
+    items = []
+    for item in split_tokens(tokens[position:], ","):
+        if item and item[0] == ("operator", "(") and item[-1] == ("operator", ")"):
+            items.append("( " + canonical_tokens(item[1:-1]) + " )")
+        else:
+            items.append(join_tokens(item))
+    return join_tokens(tokens[:position]) + " " + " , ".join(sorted(items))
+
+
+def canonical_tokens(tokens: List[Token]) -> str:
+    stages = split_tokens(tokens, "|")
+    parts = [canonical_source(stages[0])]
+    conditions: List[Any] = []
+    for stage in stages[1:] + [None]:
+        if stage and stage[0] == ("word", "where"):
+            conditions.append(_ExpressionParser(stage[1:]).parse())
+            continue
+        if conditions:      # adjacent where stages are one AND condition
+            parts.append("where " + canonical_expression(("and", conditions) if len(conditions) > 1 else conditions[0]))
+            conditions = []
+        if stage is not None:
+            parts.append(join_tokens(stage))
+    return " | ".join(parts)
+
+
+def canonicalize_query(query: str) -> str:
+    """Canonical form of a query, equivalent queries that only differ in the normalized parts have the same form."""
+    return canonical_tokens(tokenize(query))
+
+
+def query_fingerprint(query: str) -> str:
+    """SHA-256 hash of the canonical form of a query."""
+    return hashlib.sha256(canonicalize_query(query).encode("utf-8")).hexdigest()
+
+
+@dataclass
+class AzureQueryGroup:
+    """Equivalent queries: the first query and the ids of all rules that were converted into an equivalent query."""
+    fingerprint: str
+    query: str
+    rule_ids: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"fingerprint": self.fingerprint, "query": self.query, "rule_ids": self.rule_ids}
+
+
+@dataclass
+class AzureDeduplicationResult:
+    """Groups of equivalent queries in order of first appearance and the number of deduplicated queries."""
+    groups: List[AzureQueryGroup] = field(default_factory=list)
+    queries: int = 0
+
+    @property
+    def unique(self) -> int:
+        return len(self.groups)
+
+    @property
+    def ratio(self) -> float:
+        """Fraction of the queries that were removed as duplicates."""
+        return 1 - self.unique / self.queries if self.queries else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "queries": self.queries,
+            "unique": self.unique,
+            "ratio": self.ratio,
+            "groups": [group.to_dict() for group in self.groups],
+        }
+
+
+def deduplicate_queries(queries: Iterable[Tuple[str, Union[str, Dict[str, Any]]]]) -> AzureDeduplicationResult:
+    """
+    Group (rule id, query) pairs by the canonical form of the query. Queries of the metadata output format are
+    grouped by their query.
+    """
+    result = AzureDeduplicationResult()
+    groups: Dict[str, AzureQueryGroup] = dict()
+    for rule_id, query in queries:
+        if isinstance(query, dict):
+            query = query["query"]
+        fingerprint = query_fingerprint(query)
+        group = groups.get(fingerprint)
+        if group is None:
+            group = groups[fingerprint] = AzureQueryGroup(fingerprint, query)
+            result.groups.append(group)
+        if rule_id not in group.rule_ids:
+            group.rule_ids.append(rule_id)
+        result.queries += 1
+    return result
@@ -0,0 +1,730 @@
+"""
+Local evaluation of the KQL subset generated by the Azure backend. Queries are parsed into an expression tree and
+evaluated column-wise on in-memory tables: each predicate is applied to one column for a whole batch of selected rows
+and conjunctions only pass the rows matched so far to the next predicate. The rows evaluated and matched by each
+predicate are recorded, which allows to measure the selectivity of predicates and the throughput of queries without
+a workspace. Columns added by extend are computed only for the rows selected by the preceding operations:
+
+    evaluator = AzureQueryEvaluator([AzureEventTable.from_events("SecurityEvent", events)])
+    result = evaluator.evaluate(backend.convert_rule(rule)[0])
+"""
+import ipaddress
+import json
+import re
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+Selection = Union[range, List[int]]     # Row indices, a range selects the whole table
+
+
+class AzureQueryEvaluationError(ValueError):
+    """Query can't be parsed or uses KQL features that are not supported by the evaluator."""
+
+
+class AzureEventTable:
+    """
+    Columnar in-memory table. Columns that don't exist in the table contain only null values. Derived columns used
+    by the case-insensitive and string operators are computed once per table and column.
+    """
+
+    def __init__(self, name: str, columns: Dict[str, Sequence[Any]]):
+        lengths = {len(values) for values in columns.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"Columns of table '{name}' differ in length")
+        self.name = name
+        self.columns = columns
+        self.length = lengths.pop() if lengths else 0
+        self.derived: Dict[Tuple[str, str], List[Any]] = dict()
+
+    @classmethod
+    def from_events(cls, name: str, events: Iterable[Dict[str, Any]]) -> "AzureEventTable":
+        """Build table from row-oriented events, fields missing in an event are null."""
+        events = list(events)
+        names = dict.fromkeys(name for event in events for name in event)
+        return cls(name, {column: [event.get(column) for event in events] for column in names})
+
+    def __len__(self) -> int:
+        return self.length
+
+    def column(self, name: str) -> Sequence[Any]:
+        values = self.columns.get(name)
+        if values is None:
+            return self.derive("null", name, lambda values: [None] * self.length)
+        return values
+
+    def derive(self, kind: str, name: str, function: Callable[[Sequence[Any]], List[Any]]) -> List[Any]:
+        key = (kind, name)
+        if key not in self.derived:
+            self.derived[key] = function(self.columns.get(name, [None] * self.length))
+        return self.derived[key]
+
+    def text(self, name: str) -> List[Optional[str]]:
+        """Column values as strings, null values stay null."""
+        return self.derive("text", name, lambda values: [None if value is None else _text(value) for value in values])
+
+    def lowercase(self, name: str) -> List[Optional[str]]:
+        return self.derive("lowercase", name, lambda values: [None if value is None else value.lower() for value in self.text(name)])
+
+
+def _text(value: Any) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def _utc(value: datetime) -> datetime:
+    """Naive UTC datetime, naive datetimes are assumed to be UTC."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _comparable(value: Any, reference: Any) -> Any:
+    """Convert a column value into the type of the literal it is compared with, None if that's not possible."""
+    if isinstance(reference, datetime):
+        if isinstance(value, str):
+            try:
+                value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+            except ValueError:
+                return None
+        return _utc(value) if isinstance(value, datetime) else None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+timespan_units = {
+    "d": timedelta(days=1),
+    "h": timedelta(hours=1),
+    "m": timedelta(minutes=1),
+    "s": timedelta(seconds=1),
+    "ms": timedelta(milliseconds=1),
+    "microsecond": timedelta(microseconds=1),
+    "tick": timedelta(microseconds=0.1),
+}
+timespan_pattern = re.compile(r"^(\d+(?:\.\d+)?)(d|h|ms|m|s|microsecond|tick)$")
+
+
+def parse_timespan(timespan: str) -> timedelta:
+    match = timespan_pattern.match(timespan.strip())
+    if match is None:
+        raise AzureQueryEvaluationError(f"Invalid timespan '{timespan}'")
+    return float(match.group(1)) * timespan_units[match.group(2)]
+
+
+@dataclass
+class AzurePredicateStatistics:
+    """Rows a predicate was evaluated on and rows that matched, summed over all evaluated tables."""
+    predicate: str
+    evaluated: int = 0
+    matched: int = 0
+    seconds: float = 0.0
+
+    @property
+    def selectivity(self) -> Optional[float]:
+        """Fraction of the evaluated rows that matched, None if the predicate was never evaluated."""
+        return self.matched / self.evaluated if self.evaluated else None
+
+
+class AzurePredicate:
+    """
+    Leaf of a filter expression: test applied to the values of a column (or all columns) of the selected rows.
+    The values are taken from the column representation selected by kind: raw values, text or lowercase text.
+    """
+
+    def __init__(self, text: str, column: Optional[str], kind: str, test: Callable[[Any], bool]):
+        self.text = text
+        self.column = column    # None for predicates on values not bound to a column
+        self.kind = kind        # "value", "text" or "lowercase"
+        self.test = test
+
+    def values(self, table: AzureEventTable, column: str) -> Sequence[Any]:
+        if self.kind == "text":
+            return table.text(column)
+        if self.kind == "lowercase":
+            return table.lowercase(column)
+        return table.column(column)
+
+    def match(self, table: AzureEventTable, selection: Selection) -> List[int]:
+        test = self.test
+        if self.column is None:     # any column
+            columns = [self.values(table, column) for column in table.columns]
+            return [i for i in selection if any(test(values[i]) for values in columns)]
+        values = self.values(table, self.column)
+        if isinstance(selection, range):
+            return [i for i, value in enumerate(values) if test(value)]
+        return [i for i in selection if test(values[i])]
+
+    def evaluate(self, table: AzureEventTable, selection: Selection, statistics: Dict[int, AzurePredicateStatistics]) -> List[int]:
+        start = time.perf_counter()
+        matched = self.match(table, selection)
+        entry = statistics.setdefault(id(self), AzurePredicateStatistics(self.text))
+        entry.evaluated += len(selection)
+        entry.matched += len(matched)
+        entry.seconds += time.perf_counter() - start
+        return matched
+
+    def predicates(self) -> Iterator["AzurePredicate"]:
+        yield self
+
+
+class AzureAnd:
+    def __init__(self, args: List[Any]):
+        self.args = args
+
+    def evaluate(self, table: AzureEventTable, selection: Selection, statistics: Dict[int, AzurePredicateStatistics]) -> Selection:
+        for arg in self.args:
+            if not selection:
+                break
+            selection = arg.evaluate(table, selection, statistics)
+        return selection
+
+    def predicates(self) -> Iterator[AzurePredicate]:
+        for arg in self.args:
+            yield from arg.predicates()
+
+
+class AzureOr:
+    def __init__(self, args: List[Any]):
+        self.args = args
+
+    def evaluate(self, table: AzureEventTable, selection: Selection, statistics: Dict[int, AzurePredicateStatistics]) -> List[int]:
+        matched = set()
+        remaining = selection
+        for arg in self.args:
+            if not remaining:
+                break
+            current = arg.evaluate(table, remaining, statistics)
+            if current:
+                matched.update(current)
+                remaining = [i for i in remaining if i not in matched]
+        return [i for i in selection if i in matched]
+
+    def predicates(self) -> Iterator[AzurePredicate]:
+        for arg in self.args:
+            yield from arg.predicates()
+
+
+class AzureNot:
+    def __init__(self, arg: Any):
+        self.arg = arg
+
+    def evaluate(self, table: AzureEventTable, selection: Selection, statistics: Dict[int, AzurePredicateStatistics]) -> List[int]:
+        matched = set(self.arg.evaluate(table, selection, statistics))
+        return [i for i in selection if i not in matched]
+
+    def predicates(self) -> Iterator[AzurePredicate]:
+        yield from self.arg.predicates()
+
+
+@dataclass
+class AzureQuery:
+    """
+    Parsed query: tables (None for all tables) or union branches with their own operations, followed by the
+    operations applied to all rows. Operations are ("where", expression), ("project", columns) and ("extend",
+    assignments) tuples.
+    """
+    tables: Optional[Tuple[str, ...]] = None
+    branches: Tuple["AzureQuery", ...] = ()
+    source_column: Optional[str] = None     # Column with table name of union results
+    operations: List[Tuple[str, Any]] = field(default_factory=list)
+
+    def predicates(self) -> Iterator[AzurePredicate]:
+        for branch in self.branches:
+            yield from branch.predicates()
+        for operation, argument in self.operations:
+            if operation == "where":
+                yield from argument.predicates()
+
+
+_token_pattern = re.compile(r"""
+    (?P<space>\s+)
+  | (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+  | (?P<field>\['(?:[^'\\]|\\.)*'\])
+  | (?P<unbound>\["\*"\])
+  | (?P<call>(?:ago|datetime)\([^)]*\))
+  | (?P<number>-?\d+(?:\.\d+)?(?![\w.]))
+  | (?P<operator>=~|==|!=|!~|<=|>=|<|>|\.\.|[(),|=*])
+  | (?P<word>[A-Za-z_]\w*(?:-[A-Za-z_]\w*)*~?)
+""", re.VERBOSE)
+
+_string_escapes = {"n": "\n", "t": "\t", "r": "\r"}
+
+# Binary string operators: (case-insensitive, text test factory). The factory gets the literal value and returns a
+# test for the column text (lowercase text for case-insensitive operators).
+_string_operators: Dict[str, Tuple[bool, Callable[[str], Callable[[Optional[str]], bool]]]] = {
+    "=~": (True, lambda literal: lambda value: value == literal),
+    "==": (False, lambda literal: lambda value: value == literal),
+    "!~": (True, lambda literal: lambda value: value != literal),
+    "!=": (False, lambda literal: lambda value: value != literal),
+    "casematch": (False, lambda literal: lambda value: value == literal),
+    "contains": (True, lambda literal: lambda value: value is not None and literal in value),
+    "startswith": (True, lambda literal: lambda value: value is not None and value.startswith(literal)),
+    "endswith": (True, lambda literal: lambda value: value is not None and value.endswith(literal)),
+    "contains_cs": (False, lambda literal: lambda value: value is not None and literal in value),
+    "startswith_cs": (False, lambda literal: lambda value: value is not None and value.startswith(literal)),
+    "endswith_cs": (False, lambda literal: lambda value: value is not None and value.endswith(literal)),
+    "casematch_contains": (False, lambda literal: lambda value: value is not None and literal in value),
+    "casematch_startswith": (False, lambda literal: lambda value: value is not None and value.startswith(literal)),
+    "casematch_endswith": (False, lambda literal: lambda value: value is not None and value.endswith(literal)),
+}
+
+# Term operators as regular expressions around the escaped term with (case-insensitive, template)
+_term_operators: Dict[str, Tuple[bool, str]] = {
+    "has": (True, r"(?<![0-9A-Za-z]){term}(?![0-9A-Za-z])"),
+    "hasprefix": (True, r"(?<![0-9A-Za-z]){term}"),
+    "hassuffix": (True, r"{term}(?![0-9A-Za-z])"),
+    "has_cs": (False, r"(?<![0-9A-Za-z]){term}(?![0-9A-Za-z])"),
+    "hasprefix_cs": (False, r"(?<![0-9A-Za-z]){term}"),
+    "hassuffix_cs": (False, r"{term}(?![0-9A-Za-z])"),
+}
+
+_compare_operators: Dict[str, Callable[[Any, Any], bool]] = {
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+    "==": lambda a, b: a == b,
+    "=~": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+}
+
+
+class AzureQueryParser:
+    """Recursive descent parser for queries generated by the Azure backend."""
+
+    def __init__(self, query: str, now: Optional[datetime] = None):
+        self.query = query
+        self.now = _utc(now or datetime.now(timezone.utc))
+        self.tokens: List[Tuple[str, str, int, int]] = []     # (kind, text, start, end)
+        position = 0
+        while position < len(query):
+            match = _token_pattern.match(query, position)
+            if match is None:
+                raise AzureQueryEvaluationError(f"Unexpected character '{query[position]}' at position {position}")
+            if match.lastgroup != "space":
+                self.tokens.append((match.lastgroup, match.group(), match.start(), match.end()))
+            position = match.end()
+        self.position = 0
+
+    def peek(self, offset: int = 0) -> Optional[Tuple[str, str, int, int]]:
+        position = self.position + offset
+        return self.tokens[position] if position < len(self.tokens) else None
+
+    def next(self) -> Tuple[str, str, int, int]:
+        token = self.peek()
+        if token is None:
+            raise AzureQueryEvaluationError("Unexpected end of query")
+        self.position += 1
+        return token
+
+    def accept(self, text: str) -> bool:
+        token = self.peek()
+        if token is not None and token[1] == text and token[0] in ("operator", "word"):
+            self.position += 1
+            return True
+        return False
+
+    def expect(self, text: str) -> None:
+        if not self.accept(text):
+            token = self.peek()
+            raise AzureQueryEvaluationError(f"Expected '{text}' but found '{token[1] if token else 'end of query'}'")
+
+    def parse(self) -> AzureQuery:
+        query = self.parse_query()
+        if self.peek() is not None:
+            raise AzureQueryEvaluationError(f"Unexpected '{self.peek()[1]}' at position {self.peek()[2]}")
+        return query
+
+    def parse_query(self) -> AzureQuery:
+        query = self.parse_source()
+        while self.accept("|"):
+            operation = self.next()[1]
+            if operation == "where":
+                query.operations.append(("where", self.parse_or()))
+            elif operation == "extend":
+                assignments = [self.parse_assignment()]
+                while self.accept(","):
+                    assignments.append(self.parse_assignment())
+                query.operations.append(("extend", tuple(assignments)))
+            elif operation in ("project", "project-away"):
+                columns = [self.parse_column()]
+                while self.accept(","):
+                    columns.append(self.parse_column())
+                query.operations.append((operation, tuple(columns)))
+            else:
+                raise AzureQueryEvaluationError(f"Query operator '{operation}' is not supported by the evaluator")
+        return query
+
+    def parse_source(self) -> AzureQuery:
+        if not self.accept("union"):
+            return AzureQuery(tables=(self.parse_column(),))
+        source_column = None
+        if self.accept("withsource"):
+            self.expect("=")
+            source_column = self.parse_column()
+        if self.accept("*"):
+            return AzureQuery(source_column=source_column)
+        branches = [self.parse_branch()]
+        while self.accept(","):
+            branches.append(self.parse_branch())
+        return AzureQuery(tables=(), branches=tuple(branches), source_column=source_column)
+
+    def parse_branch(self) -> AzureQuery:
+        if self.accept("("):
+            branch = self.parse_query()
+            self.expect(")")
+            return branch
+        return AzureQuery(tables=(self.parse_column(),))
+
+    def parse_column(self) -> str:
+        kind, text, _, _ = self.next()
+        if kind == "word":
+            return text
+        if kind == "field":
+            return re.sub(r"\\(.)", r"\1", text[2:-2])
+        raise AzureQueryEvaluationError(f"Expected column name but found '{text}'")
+
+    def parse_assignment(self) -> Tuple[str, Callable[[AzureEventTable, Selection], List[Any]]]:
+        """Parse column = function(...) of extend into the column and a function computing the values of the selected rows."""
+        column = self.parse_column()
+        self.expect("=")
+        function = self.next()[1]
+        self.expect("(")
+        if function == "extract":
+            try:
+                regex = re.compile(self.parse_literal())
+            except re.error as e:
+                raise AzureQueryEvaluationError(f"Invalid regular expression: {e}")
+            self.expect(",")
+            group = self.parse_literal()
+            self.expect(",")
+            source = self.parse_column()
+            self.expect(")")
+
+            def extract(table: AzureEventTable, selection: Selection) -> List[Any]:
+                values = table.text(source)
+                return [
+                    match.group(group) if value is not None and (match := regex.search(value)) else None
+                    for value in (values[i] for i in selection)
+                ]
+            return column, extract
+        if function == "parse_json":
+            source = self.parse_column()
+            self.expect(")")
+
+            def parse_json(table: AzureEventTable, selection: Selection) -> List[Any]:
+                values = table.column(source)
+                return [_json(values[i]) for i in selection]
+            return column, parse_json
+        if function == "tostring":
+            source = self.parse_column()
+            kind, text, _, _ = self.next()
+            if kind != "field":
+                raise AzureQueryEvaluationError(f"Expected property access but found '{text}'")
+            key = re.sub(r"\\(.)", r"\1", text[2:-2])
+            self.expect(")")
+
+            def tostring(table: AzureEventTable, selection: Selection) -> List[Any]:
+                values = table.column(source)
+                return [_property(values[i], key) for i in selection]
+            return column, tostring
+        raise AzureQueryEvaluationError(f"Function '{function}' is not supported by the evaluator")
+
+    def parse_or(self) -> Any:
+        args = [self.parse_and()]
+        while self.accept("or"):
+            args.append(self.parse_and())
+        return args[0] if len(args) == 1 else AzureOr(args)
+
+    def parse_and(self) -> Any:
+        args = [self.parse_unary()]
+        while self.accept("and"):
+            args.append(self.parse_unary())
+        return args[0] if len(args) == 1 else AzureAnd(args)
+
+    def parse_unary(self) -> Any:
+        if self.accept("not"):
+            return AzureNot(self.parse_unary())
+        if self.accept("("):
+            expression = self.parse_or()
+            self.expect(")")
+            return expression
+        start = self.peek()[2] if self.peek() is not None else len(self.query)
+        test = self.parse_predicate()
+        column, kind, function = test
+        return AzurePredicate(self.query[start:self.tokens[self.position - 1][3]], column, kind, function)
+
+    def parse_literal(self) -> Any:
+        kind, text, _, _ = self.next()
+        if kind == "string" and text[0] == "'":
+            return re.sub(r"\\(.)", r"\1", text[1:-1])
+        if kind == "string":
+            return re.sub(r"\\(.)", lambda m: _string_escapes.get(m.group(1), m.group(1)), text[1:-1])
+        if kind == "number":
+            return float(text) if "." in text else int(text)
+        if kind == "call":
+            function, argument = text[:-1].split("(", 1)
+            if function == "ago":
+                return self.now - parse_timespan(argument)
+            try:
+                return _utc(datetime.fromisoformat(argument.strip().replace("Z", "+00:00")))
+            except ValueError:
+                raise AzureQueryEvaluationError(f"Invalid datetime '{argument}'")
+        raise AzureQueryEvaluationError(f"Expected literal but found '{text}'")
+
+    def parse_list(self) -> List[Any]:
+        self.expect("(")
+        values = [self.parse_literal()]
+        while self.accept(","):
+            values.append(self.parse_literal())
+        self.expect(")")
+        return values
+
+    def parse_predicate(self) -> Tuple[Optional[str], str, Callable[[Any], bool]]:
+        """Parse a predicate into column, column representation and test of the column values."""
+        token = self.peek()
+        if token is None:
+            raise AzureQueryEvaluationError("Unexpected end of query")
+        if token[0] == "unbound":
+            self.next()
+            self.expect("contains")
+            literal = _text(self.parse_literal()).lower()
+            return None, "lowercase", lambda value: value is not None and literal in value
+        next_token = self.peek(1)
+        if token[0] == "word" and next_token is not None and next_token[1] == "(":
+            return self.parse_function()
+
+        column = self.parse_column()
+        operator = self.next()[1]
+        if operator == "is":
+            negated = self.accept("not")
+            self.expect("null")
+            return column, "value", (lambda value: value is not None) if negated else (lambda value: value is None)
+        if operator == "matches":
+            self.expect("regex")
+            try:
+                regex = re.compile(self.parse_literal())
+            except re.error as e:
+                raise AzureQueryEvaluationError(f"Invalid regular expression: {e}")
+            return column, "text", lambda value: value is not None and regex.search(value) is not None
+        if operator == "match":     # wildcard match with * as wildcard and \ as escape character
+            kind, pattern, _, _ = self.next()
+            if kind != "string":
+                raise AzureQueryEvaluationError(f"Expected wildcard pattern but found '{pattern}'")
+            regex = re.compile("^" + "".join(
+                ".*" if part == "*" else re.escape(part[-1])
+                for part in re.findall(r"\\.|.", pattern[1:-1], re.DOTALL)
+            ) + "$", re.IGNORECASE | re.DOTALL)
+            return column, "text", lambda value: value is not None and regex.match(value) is not None
+        if operator in ("in", "in~"):
+            case_insensitive = operator == "in~"
+            values = {_text(value).lower() if case_insensitive else _text(value) for value in self.parse_list()}
+            return column, "lowercase" if case_insensitive else "text", lambda value: value in values
+        if operator == "has_any":
+            terms = "|".join(re.escape(_text(value)) for value in self.parse_list())
+            regex = re.compile(r"(?<![0-9A-Za-z])(?:" + terms + r")(?![0-9A-Za-z])", re.IGNORECASE)
+            return column, "text", lambda value: value is not None and regex.search(value) is not None
+        if operator == "between":
+            self.expect("(")
+            low = self.parse_literal()
+            self.expect("..")
+            high = self.parse_literal()
+            self.expect(")")
+
+            def between(value: Any) -> bool:
+                value = _comparable(value, low)
+                return value is not None and low <= value <= high
+            return column, "value", between
+        if operator in _term_operators:
+            case_insensitive, template = _term_operators[operator]
+            regex = re.compile(template.format(term=re.escape(_text(self.parse_literal()))), re.IGNORECASE if case_insensitive else 0)
+            return column, "text", lambda value: value is not None and regex.search(value) is not None
+
+        literal = self.parse_literal()
+        if operator in _compare_operators and not isinstance(literal, str):
+            compare = _compare_operators[operator]
+
+            def compare_values(value: Any) -> bool:
+                value = _comparable(value, literal)
+                return value is not None and compare(value, literal)
+            return column, "value", compare_values
+        if operator in _string_operators:
+            case_insensitive, factory = _string_operators[operator]
+            return column, "lowercase" if case_insensitive else "text", factory(literal.lower() if case_insensitive else literal)
+        raise AzureQueryEvaluationError(f"Operator '{operator}' is not supported by the evaluator")
+
+    def parse_function(self) -> Tuple[Optional[str], str, Callable[[Any], bool]]:
+        function = self.next()[1]
+        self.expect("(")
+        column = self.parse_column()
+        if function == "ipv4_is_in_range":
+            self.expect(",")
+            try:
+                network = ipaddress.ip_network(self.parse_literal(), strict=False)
+            except ValueError as e:
+                raise AzureQueryEvaluationError(str(e))
+            self.expect(")")
+
+            def in_range(value: Optional[str]) -> bool:
+                try:
+                    return value is not None and ipaddress.ip_address(value) in network
+                except ValueError:
+                    return False
+            return column, "text", in_range
+        self.expect(")")
+        if function == "strlen":
+            operator = self.next()[1]
+            if operator not in _compare_operators:
+                raise AzureQueryEvaluationError(f"Operator '{operator}' is not supported by the evaluator")
+            compare, length = _compare_operators[operator], self.parse_literal()
+            return column, "text", lambda value: compare(len(value) if value is not None else 0, length)
+        if function in ("exists", "isnotnull"):
+            return column, "value", lambda value: value is not None
+        if function in ("notexists", "isnull"):
+            return column, "value", lambda value: value is None
+        if function == "isnotempty":
+            return column, "text", lambda value: bool(value)
+        if function == "isempty":
+            return column, "text", lambda value: not value
+        raise AzureQueryEvaluationError(f"Function '{function}' is not supported by the evaluator")
+
+
+def _json(value: Any) -> Any:
+    """Parsed JSON of strings, None for invalid JSON. Other values are already parsed."""
+    if not isinstance(value, str):
+        return value
+    try:
+        return json.loads(value)
+    except ValueError:
+        return None
+
+
+def _property(value: Any, key: str) -> Optional[str]:
+    if not isinstance(value, dict) or value.get(key) is None:
+        return None
+    value = value[key]
+    return value if isinstance(value, str) else json.dumps(value)
+
+
+def parse_query(query: str, now: Optional[datetime] = None) -> AzureQuery:
+    """Parse a query, ago() is evaluated relative to now (default: current time)."""
+    return AzureQueryParser(query, now).parse()
+
+
+@dataclass
+class AzureEvaluationResult:
+    """
+    Rows matched by a query by table, statistics of each predicate in order of appearance in the query, the number
+    of scanned rows and the evaluation time.
+    """
+    matches: Dict[str, List[int]]
+    predicates: List[AzurePredicateStatistics]
+    rows_scanned: int
+    seconds: float
+    tables: Dict[str, AzureEventTable] = field(repr=False, default_factory=dict)
+    projections: Dict[str, Tuple[str, ...]] = field(default_factory=dict)      # Returned columns by table if the query projects columns
+    source_column: Optional[str] = None
+
+    @property
+    def count(self) -> int:
+        return sum(len(rows) for rows in self.matches.values())
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows_scanned / self.seconds if self.seconds else float("inf")
+
+    def events(self) -> Iterator[Dict[str, Any]]:
+        """Matched rows with the returned columns."""
+        for name, rows in self.matches.items():
+            table = self.tables[name]
+            columns = self.projections.get(name, tuple(table.columns))
+            for row in rows:
+                event = {column: table.column(column)[row] for column in columns}
+                if self.source_column is not None:
+                    event[self.source_column] = name
+                yield event
+
+
+class AzureQueryEvaluator:
+    """Evaluates queries on a set of in-memory tables."""
+
+    def __init__(self, tables: Iterable[AzureEventTable], now: Optional[datetime] = None):
+        self.tables = {table.name: table for table in tables}
+        self.now = now
+
+    def evaluate(self, query: Union[str, AzureQuery]) -> AzureEvaluationResult:
+        if isinstance(query, str):
+            query = parse_query(query, self.now)
+        statistics: Dict[int, AzurePredicateStatistics] = dict()
+        start = time.perf_counter()
+        matches: Dict[str, List[int]] = dict()
+        projections: Dict[str, Tuple[str, ...]] = dict()
+        tables = dict(self.tables)
+        rows_scanned = self.evaluate_query(query, tables, matches, projections, statistics)
+        seconds = time.perf_counter() - start
+        return AzureEvaluationResult(
+            matches=matches,
+            predicates=[
+                statistics.get(id(predicate), AzurePredicateStatistics(predicate.text))
+                for predicate in query.predicates()
+            ],
+            rows_scanned=rows_scanned,
+            seconds=seconds,
+            tables=tables,
+            projections=projections,
+            source_column=query.source_column,
+        )
+
+    def evaluate_query(self, query: AzureQuery, tables: Dict[str, AzureEventTable], matches: Dict[str, List[int]], projections: Dict[str, Tuple[str, ...]], statistics: Dict[int, AzurePredicateStatistics]) -> int:
+        """
+        Evaluate the query and store the matched rows and projections by table. Tables extended by the query are
+        replaced in tables. Returns the number of scanned rows.
+        """
+        selections: Dict[str, Selection] = dict()
+        columns: Dict[str, Tuple[str, ...]] = dict()
+        rows_scanned = 0
+        if query.tables is None:
+            names = list(self.tables)
+        else:
+            names = list(query.tables)
+            for name in names:
+                if name not in self.tables:
+                    raise AzureQueryEvaluationError(f"Table '{name}' doesn't exist")
+        for name in names:
+            selections[name] = range(len(self.tables[name]))
+            rows_scanned += len(self.tables[name])
+        for branch in query.branches:
+            branch_matches: Dict[str, List[int]] = dict()
+            rows_scanned += self.evaluate_query(branch, tables, branch_matches, columns, statistics)
+            for name, rows in branch_matches.items():
+                selections[name] = sorted(set(selections.get(name, ())) | set(rows))
+
+        for operation, argument in query.operations:
+            for name in selections:
+                table = tables[name]
+                if operation == "where":
+                    selections[name] = argument.evaluate(table, selections[name], statistics)
+                elif operation == "extend":    # assignments can refer to the columns added before
+                    for column, function in argument:
+                        values = [None] * len(table)
+                        for i, value in zip(selections[name], function(table, selections[name])):
+                            values[i] = value
+                        table = AzureEventTable(name, {**table.columns, column: values})
+                    tables[name] = table
+                elif operation == "project":
+                    columns[name] = argument
+                else:   # project-away
+                    columns[name] = tuple(column for column in columns.get(name, tuple(table.columns)) if column not in argument)
+
+        for name, selection in selections.items():
+            matches[name] = list(selection)
+        projections.update(columns)
+        return rows_scanned
@@ -0,0 +1,197 @@
+import copy
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from sigma.collection import SigmaCollection
+from sigma.exceptions import SigmaConfigurationError
+from sigma.processing.pipeline import ProcessingPipeline
+from sigma.rule import SigmaLogSource
+
+from sigma.backends.azure.cache import AzureConversionCache, _canonical, _hash, rule_fingerprint
+from sigma.backends.azure.stream import iter_rule_files
+
+import sigma
+
+manifest_version = 1
+
+
+def applicable_pipeline_fingerprint(pipeline: ProcessingPipeline, logsource: SigmaLogSource) -> str:
+    """
+    Hash of the parts of a processing pipeline that can influence the conversion of rules with the log source.
+    Pipelines that dispatch items by log source (AzureDispatchPipeline) only contribute the candidate items of the
+    log source. Transformations can reduce their contribution to the part relevant for the log source with a
+    logsource_fingerprint method.
+    """
+    if hasattr(pipeline, "candidates"):
+        items = [pipeline.items[position] for position in pipeline.candidates((logsource.product, logsource.category, logsource.service))]
+    else:
+        items = pipeline.items
+
+    canonical_items = []
+    for item in items:
+        canonical = _canonical(item)
+        if hasattr(item.transformation, "logsource_fingerprint"):
+            canonical["transformation"] = item.transformation.logsource_fingerprint(logsource)
+        canonical_items.append(canonical)
+    return _hash({
+        "items": canonical_items,
+        "postprocessing_items": _canonical(pipeline.postprocessing_items),
+        "finalizers": _canonical(pipeline.finalizers),
+        "vars": _canonical(pipeline.vars),
+    })
+
+
+@dataclass
+class AzureBuildDiff:
+    """
+    Result of an incremental build: queries of new rules, queries of rules whose conversion result changed and
+    queries of removed rules, each by rule key (rule file path and rule id or position in the file). Unchanged
+    rules are only counted, errors contain the error message by rule key.
+    """
+    added: Dict[str, List[Any]] = field(default_factory=dict)
+    changed: Dict[str, List[Any]] = field(default_factory=dict)
+    removed: Dict[str, List[Any]] = field(default_factory=dict)
+    errors: Dict[str, str] = field(default_factory=dict)
+    unchanged: int = 0
+    converted: int = 0      # Number of rules that were converted in this build
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "added": self.added,
+            "changed": self.changed,
+            "removed": self.removed,
+            "errors": self.errors,
+            "unchanged": self.unchanged,
+            "converted": self.converted,
+        }
+
+
+class AzureIncrementalBuild:
+    """
+    Incremental conversion of rule files. A manifest stores for each rule file its content hash and for each rule
+    its log source, content hash, applicable pipeline fingerprint and queries. A rule is only converted again if
+    it is new, its content changed or the part of the pipeline that applies to its log source changed. Changes of
+    the backend settings, output format or package versions invalidate all rules.
+    """
+
+    def __init__(self, backend: "sigma.backends.azure.AzureBackend", manifest: Union[str, Path], output_format: Optional[str] = None):
+        self.output_format = output_format or backend.default_format
+        if self.output_format == "batch":
+            raise SigmaConfigurationError("The batch output format combines multiple rules and can't be built incrementally")
+        # Errors are recorded in the manifest and reported in the build diff, therefore the backend must raise them.
+        self.backend = copy.copy(backend)
+        self.backend.collect_errors = False
+        self.backend.errors = list()
+        self.manifest_path = Path(manifest)
+        self.pipeline = backend.conversion_pipeline(self.output_format)
+        self.context = _hash({
+            "manifest_version": manifest_version,
+            "context": AzureConversionCache.context(backend, ProcessingPipeline(), self.output_format),
+        })
+        self.pipeline_fingerprints: Dict[Tuple[Optional[str], ...], str] = dict()
+
+    def pipeline_fingerprint(self, logsource: List[Optional[str]]) -> str:
+        key = tuple(logsource)
+        if key not in self.pipeline_fingerprints:
+            product, category, service = logsource
+            self.pipeline_fingerprints[key] = applicable_pipeline_fingerprint(
+                self.pipeline, SigmaLogSource(category=category, product=product, service=service),
+            )
+        return self.pipeline_fingerprints[key]
+
+    def load_manifest(self) -> Dict[str, Any]:
+        try:
+            manifest = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return dict()
+        if manifest.get("context") != self.context:     # backend or package versions changed, rebuild everything
+            return dict()
+        return manifest.get("files", dict())
+
+    def save_manifest(self, files: Dict[str, Any]) -> None:
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = self.manifest_path.with_name(self.manifest_path.name + ".tmp")
+        temporary.write_text(json.dumps({"context": self.context, "files": files}, sort_keys=True), encoding="utf-8")
+        os.replace(temporary, self.manifest_path)
+
+    def unchanged(self, entry: Optional[Dict[str, Any]], file_hash: str) -> bool:
+        """File content and the applicable pipeline of all its rules are unchanged."""
+        return (
+            entry is not None
+            and entry["hash"] == file_hash
+            and all(rule["pipeline"] == self.pipeline_fingerprint(rule["logsource"]) for rule in entry["rules"])
+        )
+
+    def convert_file(self, path: Path, content: str, previous: Optional[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], int]:
+        """Convert all new or changed rules of a rule file. Returns the rule entries and the number of converted rules."""
+        previous_rules = {rule["key"]: rule for rule in previous["rules"]} if previous is not None else dict()
+        rules = []
+        converted = 0
+        try:
+            collection = SigmaCollection.from_yaml(content)
+        except Exception as e:
+            return [{"key": str(path), "logsource": [None, None, None], "hash": None, "pipeline": None, "error": str(e)}], 0
+
+        for index, rule in enumerate(collection.rules):
+            logsource = [rule.logsource.product, rule.logsource.category, rule.logsource.service]
+            entry = {
+                "key": f"{path}#{rule.id if rule.id is not None else index}",
+                "logsource": logsource,
+                "hash": rule_fingerprint(rule),     # before the processing pipeline modifies the rule
+                "pipeline": self.pipeline_fingerprint(logsource),
+            }
+            old = previous_rules.get(entry["key"])
+            if old is not None and "error" not in old and (old["hash"], old["pipeline"]) == (entry["hash"], entry["pipeline"]):
+                entry["queries"] = old["queries"]
+            else:
+                converted += 1
+                try:
+                    entry["queries"] = self.backend.convert_rule(rule, self.output_format)
+                except Exception as e:
+                    entry["error"] = str(e)
+            rules.append(entry)
+        return rules, converted
+
+    def run(self, paths: Iterable[Union[str, Path]]) -> AzureBuildDiff:
+        """Convert new and changed rules, update the manifest and return the differences to the previous build."""
+        previous = self.load_manifest()
+        files: Dict[str, Any] = dict()
+        diff = AzureBuildDiff()
+
+        for path in iter_rule_files(paths):
+            content = path.read_text(encoding="utf-8")
+            file_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+            entry = previous.get(str(path))
+            if self.unchanged(entry, file_hash):
+                files[str(path)] = entry
+                continue
+            rules, converted = self.convert_file(path, content, entry)
+            files[str(path)] = {"hash": file_hash, "rules": rules}
+            diff.converted += converted
+
+        old_queries = {
+            rule["key"]: rule["queries"]
+            for entry in previous.values()
+            for rule in entry["rules"]
+            if "queries" in rule
+        }
+        for entry in files.values():
+            for rule in entry["rules"]:
+                key = rule["key"]
+                if "error" in rule:
+                    diff.errors[key] = rule["error"]
+                elif key not in old_queries:
+                    diff.added[key] = rule["queries"]
+                elif old_queries[key] != rule["queries"]:
+                    diff.changed[key] = rule["queries"]
+                else:
+                    diff.unchanged += 1
+        current = {rule["key"] for entry in files.values() for rule in entry["rules"]}
+        diff.removed = {key: queries for key, queries in old_queries.items() if key not in current}
+
+        self.save_manifest(files)
+        return diff
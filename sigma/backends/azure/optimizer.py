@@ -0,0 +1,253 @@
+"""
+Boolean optimization of condition trees before conversion. All rewrites are semantically equivalent and keep the
+order of the remaining condition items, so the result is deterministic:
+
+* nested AND/OR conditions of the same type are flattened and double negations removed
+* duplicate items of AND/OR conditions are removed
+* items subsumed by other items are removed: X and (X or Y) = X, X or (X and Y) = X, also for plain string values of
+  the same field that imply each other, e.g. contains "abc" and contains "abcd" = contains "abcd"
+* items common to all branches of an OR condition are factored out: (A and B) or (A and C) = A and (B or C)
+* equality items of the same field and value kind (numbers, case-sensitive and case-insensitive strings) in an OR
+  condition are grouped, so they are converted into one in (numbers, case-sensitive strings) or in~ expression (only
+  together with value_list_optimization, see AzureConditionOptimizer)
+"""
+from dataclasses import dataclass, field
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from sigma.conditions import ConditionAND, ConditionFieldEqualsValueExpression, ConditionItem, ConditionNOT, ConditionOR, ConditionType
+from sigma.types import SigmaCasedString, SigmaNumber, SigmaString, SpecialChars
+
+internal_field_prefix = "__azure"     # Fields of condition items that are converted into query parts by the backend
+
+
+@dataclass
+class AzureConditionOptimizer:
+    """
+    Optimizes condition trees and counts the applied rewrites by kind. Equality items are only grouped with
+    group_values, because the case-sensitive in-expression of the plain backend isn't equivalent to the
+    case-insensitive equality items (value_list_optimization converts groups of strings into case-insensitive in~).
+    Numbers aren't grouped with strings, so comparisons of typed columns stay numeric.
+    """
+    group_values: bool = False
+    rewrites: Dict[str, int] = field(default_factory=dict)
+
+    def count(self, kind: str, count: int = 1) -> None:
+        if count:
+            self.rewrites[kind] = self.rewrites.get(kind, 0) + count
+
+    def optimize(self, cond: ConditionType) -> ConditionType:
+        """Return the optimized condition tree with parent links of the new tree."""
+        optimized = self.rewrite(cond)
+        _link(optimized, None)
+        return optimized
+
+    def rewrite(self, cond: ConditionType) -> ConditionType:
+        if isinstance(cond, ConditionNOT):
+            arg = self.rewrite(cond.args[0])
+            if isinstance(arg, ConditionNOT):
+                self.count("double_negations")
+                return arg.args[0]
+            return ConditionNOT([arg], cond.source)
+        if isinstance(cond, (ConditionAND, ConditionOR)):
+            args = self.flatten(type(cond), [self.rewrite(arg) for arg in cond.args])
+            args = self.deduplicate(args)
+            args = self.subsume(type(cond), args)
+            if isinstance(cond, ConditionOR):
+                factored = self.factor(args, cond.source)
+                if factored is not None:
+                    return factored
+                if self.group_values:
+                    args = self.group(args, cond.source)
+            return args[0] if len(args) == 1 else type(cond)(args, cond.source)
+        return cond
+
+    def flatten(self, cls: type, args: List[ConditionType]) -> List[ConditionType]:
+        flattened = []
+        for arg in args:
+            if type(arg) is cls:
+                self.count("flattened")
+                flattened.extend(arg.args)
+            else:
+                flattened.append(arg)
+        return flattened
+
+    def deduplicate(self, args: List[ConditionType]) -> List[ConditionType]:
+        keys = dict()
+        for arg in args:
+            keys.setdefault(condition_key(arg), arg)
+        self.count("duplicates", len(args) - len(keys))
+        return list(keys.values())
+
+    def subsume(self, cls: type, args: List[ConditionType]) -> List[ConditionType]:
+        """
+        Remove items of an OR condition that imply another item and items of an AND condition that are implied by
+        another item, e.g. X or (X and Y) = X, X and (X or Y) = X or contains "abcd" and contains "abc" = contains
+        "abcd". Of equivalent items the first one is kept.
+        """
+        def implies(first: ConditionType, second: ConditionType) -> bool:
+            if cls is ConditionOR:      # conjunction of the first implies conjunction of the second
+                return all(
+                    any(item_implies(item, other) for item in _items(first, ConditionAND))
+                    for other in _items(second, ConditionAND)
+                )
+            else:                       # disjunction of the first implies disjunction of the second
+                return all(
+                    any(item_implies(item, other) for other in _items(second, ConditionOR))
+                    for item in _items(first, ConditionOR)
+                )
+
+        result = []
+        for i, arg in enumerate(args):
+            if any(
+                (implies(arg, other) and (not implies(other, arg) or j < i)) if cls is ConditionOR
+                else (implies(other, arg) and (not implies(arg, other) or j < i))
+                for j, other in enumerate(args)
+                if j != i
+            ):
+                continue
+            result.append(arg)
+        self.count("subsumed", len(args) - len(result))
+        return result
+
+    def factor(self, args: List[ConditionType], source: Any) -> Optional[ConditionType]:
+        """(A and B) or (A and C) = A and (B or C)"""
+        if len(args) < 2:
+            return None
+        branches = [arg.args if isinstance(arg, ConditionAND) else [arg] for arg in args]
+        common = [
+            item for item in branches[0]
+            if not is_internal(item) and all(
+                condition_key(item) in {condition_key(other) for other in branch}
+                for branch in branches[1:]
+            )
+        ]
+        if not common:
+            return None
+        common_keys = {condition_key(item) for item in common}
+        self.count("factored", len(common))
+        remaining = []
+        for branch in branches:
+            rest = [item for item in branch if condition_key(item) not in common_keys]
+            if not rest:    # branch consists only of the common items and is true if they are
+                return common[0] if len(common) == 1 else ConditionAND(common, source)
+            remaining.append(rest[0] if len(rest) == 1 else ConditionAND(rest, source))
+        return self.rewrite(ConditionAND(common + [ConditionOR(remaining, source)], source))
+
+    def group(self, args: List[ConditionType], source: Any) -> List[ConditionType]:
+        """Group equality items of the same field and value kind at the position of the first item."""
+        fields: Dict[Tuple[str, str], List[ConditionType]] = dict()
+        for arg in args:
+            if is_list_value(arg):
+                fields.setdefault(list_key(arg), []).append(arg)
+        grouped = {key: items for key, items in fields.items() if len(items) > 1}
+        if not grouped or (len(grouped) == 1 and len(next(iter(grouped.values()))) == len(args)):
+            return args     # nothing to group or already a value list
+        result = []
+        for arg in args:
+            if is_list_value(arg) and list_key(arg) in grouped:
+                items = grouped[list_key(arg)]
+                if arg is items[0]:
+                    self.count("grouped", len(items))
+                    result.append(ConditionOR(items, source))
+            else:
+                result.append(arg)
+        return result
+
+
+def is_internal(cond: ConditionType) -> bool:
+    return isinstance(cond, ConditionFieldEqualsValueExpression) and cond.field is not None and cond.field.startswith(internal_field_prefix)
+
+
+def is_list_value(cond: ConditionType) -> bool:
+    """Equality item that can be part of an in-expression."""
+    return (
+        isinstance(cond, ConditionFieldEqualsValueExpression)
+        and not is_internal(cond)
+        and (
+            isinstance(cond.value, SigmaNumber)
+            or isinstance(cond.value, SigmaString) and not cond.value.contains_special()
+        )
+    )
+
+
+def list_key(cond: ConditionFieldEqualsValueExpression) -> Tuple[str, str]:
+    """Field and value kind of an equality item, only items with the same key are grouped into one list."""
+    if isinstance(cond.value, SigmaNumber):
+        return cond.field, "number"
+    return cond.field, "cased" if isinstance(cond.value, SigmaCasedString) else "string"
+
+
+def condition_key(cond: ConditionType) -> Hashable:
+    """Structural key of a condition: equal for equivalent conditions independent of the order of AND/OR items."""
+    if isinstance(cond, ConditionItem):
+        keys = [condition_key(arg) for arg in cond.args]
+        if not isinstance(cond, ConditionNOT):
+            keys.sort(key=repr)
+        return type(cond).__name__, tuple(keys)
+    value = getattr(cond, "value", None)
+    if isinstance(value, SigmaString):
+        value_key: Hashable = (type(value).__name__, value.s)
+    else:
+        value_key = repr(value)
+    return type(cond).__name__, getattr(cond, "field", None), value_key
+
+
+def string_pattern(value: Any) -> Optional[Tuple[str, str]]:
+    """
+    Case-insensitive string match of a plain string value as (operator, lowercase literal) tuple with operator equals,
+    startswith, endswith or contains. None for other values.
+    """
+    if type(value) is not SigmaString:
+        return None
+    parts = list(value.s)
+    prefix = bool(parts) and parts[0] == SpecialChars.WILDCARD_MULTI
+    suffix = len(parts) > 1 and parts[-1] == SpecialChars.WILDCARD_MULTI
+    literal = parts[int(prefix):len(parts) - int(suffix)]
+    if len(literal) != 1 or not isinstance(literal[0], str):
+        return None
+    operator = {(False, False): "equals", (False, True): "startswith", (True, False): "endswith", (True, True): "contains"}[prefix, suffix]
+    return operator, literal[0].lower()
+
+
+def pattern_implies(first: Tuple[str, str], second: Tuple[str, str]) -> bool:
+    """All values matching the first string pattern also match the second one."""
+    operator, literal = first
+    other_operator, other_literal = second
+    if other_operator == "contains":
+        return other_literal in literal
+    if other_operator == "startswith":
+        return operator in ("equals", "startswith") and literal.startswith(other_literal)
+    if other_operator == "endswith":
+        return operator in ("equals", "endswith") and literal.endswith(other_literal)
+    return operator == "equals" and literal == other_literal
+
+
+def item_implies(first: ConditionType, second: ConditionType) -> bool:
+    """The first condition item implies the second one: they are equal or string matches of the same field."""
+    if condition_key(first) == condition_key(second):
+        return True
+    if not (
+        isinstance(first, ConditionFieldEqualsValueExpression)
+        and isinstance(second, ConditionFieldEqualsValueExpression)
+        and first.field == second.field
+    ):
+        return False
+    first_pattern, second_pattern = string_pattern(first.value), string_pattern(second.value)
+    return first_pattern is not None and second_pattern is not None and pattern_implies(first_pattern, second_pattern)
+
+
+def _items(cond: ConditionType, cls: type) -> List[ConditionType]:
+    return cond.args if isinstance(cond, cls) else [cond]
+
+
+def _link(cond: ConditionType, parent: Optional[ConditionItem]) -> None:
+    cond.parent = parent
+    if isinstance(cond, ConditionItem):
+        for arg in cond.args:
+            _link(arg, cond)
+
+
+def optimize_condition(cond: ConditionType, group_values: bool = False) -> Tuple[ConditionType, Dict[str, int]]:
+    """Optimize a condition tree, returns the optimized tree and the number of rewrites by kind."""
+    optimizer = AzureConditionOptimizer(group_values)
+    return optimizer.optimize(cond), optimizer.rewrites
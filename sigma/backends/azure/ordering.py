@@ -0,0 +1,197 @@
+"""
+Cost-based ordering of the items of AND conditions. Kusto evaluates the predicates of a where clause in the given
+order, so cheap and selective predicates should come first to reduce the rows the expensive ones are evaluated on.
+Items are sorted stably by their cost class and, within the same class, by the estimated selectivity of their
+field from an optional statistics file:
+
+0. equality, numeric, null and existence checks
+1. term index operators and prefix matches
+2. substring matches (contains, endswith, compiled wildcards), CIDR checks and field comparisons
+3. regular expressions and wildcard matches
+4. values not bound to a field, which are matched against all columns
+
+Conditions added by the processing pipeline (AddConditionTransformation, e.g. the EventID condition) are kept first.
+"""
+import argparse
+import json
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Sequence, Set, Tuple, Union
+
+import yaml
+from sigma.conditions import (
+    ConditionAND,
+    ConditionFieldEqualsValueExpression,
+    ConditionIdentifier,
+    ConditionItem,
+    ConditionNOT,
+    ConditionOR,
+    ConditionType,
+    ConditionValueExpression,
+)
+from sigma.types import SigmaCIDRExpression, SigmaFieldReference, SigmaRegularExpression, SigmaString, SpecialChars
+
+import sigma
+from sigma.backends.azure.evaluator import AzureEventTable
+
+pipeline_condition_prefix = "_cond_"    # Name prefix of detections added by AddConditionTransformation
+
+
+@dataclass
+class AzureFieldSelectivity:
+    """
+    Selectivity statistics of fields: the average fraction of rows matched by an equality predicate on the field.
+    Fields without statistics are assumed to match all rows. Statistics can be computed from own data with
+    from_table() or the command line interface of this module and are stored as JSON or YAML file:
+
+        fields:
+          EventID: 0.25
+          CommandLine: 0.0001
+    """
+    fields: Dict[str, float] = field(default_factory=dict)
+
+    def get(self, name: Optional[str]) -> float:
+        return self.fields.get(name, 1.0) if name is not None else 1.0
+
+    @classmethod
+    def from_file(cls, path: Union[str, Path]) -> "AzureFieldSelectivity":
+        with open(path, "r", encoding="utf-8") as f:
+            data = yaml.safe_load(f)    # YAML is a superset of JSON
+        if not isinstance(data, dict) or not isinstance(data.get("fields"), dict):
+            raise ValueError(f"Field selectivity file '{path}' must contain a 'fields' mapping")
+        return cls({str(name): float(selectivity) for name, selectivity in data["fields"].items()})
+
+    @classmethod
+    def from_table(cls, table: AzureEventTable) -> "AzureFieldSelectivity":
+        """
+        Compute the selectivity of each column as the probability that two random rows have the same non-null value,
+        which is the expected fraction of rows matched by an equality predicate with a value drawn from the data.
+        """
+        fields = dict()
+        for name, values in table.columns.items():
+            counts: Dict[Any, int] = dict()
+            for value in values:
+                if value is not None:
+                    key = value.lower() if isinstance(value, str) else value
+                    counts[key] = counts.get(key, 0) + 1
+            fields[name] = sum(count * count for count in counts.values()) / (len(table) ** 2) if len(table) else 1.0
+        return cls(fields)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"fields": dict(sorted(self.fields.items()))}
+
+    def to_file(self, path: Union[str, Path]) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+
+@dataclass
+class AzurePredicateOrdering:
+    """Orders the items of AND conditions of a condition tree converted by the backend."""
+    backend: "sigma.backends.azure.AzureBackend"
+    selectivity: AzureFieldSelectivity = field(default_factory=AzureFieldSelectivity)
+    pinned: Set[int] = field(default_factory=set)       # Ids of condition items that are kept first
+    reordered: int = 0                                  # Number of reordered AND conditions
+
+    def order(self, cond: ConditionType) -> ConditionType:
+        """Reorder the items of all AND conditions of the tree in place."""
+        if isinstance(cond, ConditionItem):
+            for arg in cond.args:
+                self.order(arg)
+            if isinstance(cond, ConditionAND):
+                args = sorted(cond.args, key=lambda arg: (not self.is_pinned(arg), self.cost_class(arg), self.estimate(arg)))
+                if any(arg is not original for arg, original in zip(args, cond.args)):
+                    self.reordered += 1
+                    cond.args = args
+        return cond
+
+    def is_pinned(self, cond: ConditionType) -> bool:
+        if isinstance(cond, ConditionItem):
+            return all(self.is_pinned(arg) for arg in cond.args)
+        return id(cond) in self.pinned
+
+    def cost_class(self, cond: ConditionType) -> int:
+        """Cost class of a condition, subconditions are as expensive as their most expensive item."""
+        if isinstance(cond, ConditionItem):
+            return max(self.cost_class(arg) for arg in cond.args)
+        if isinstance(cond, ConditionValueExpression):
+            return 4
+        if not isinstance(cond, ConditionFieldEqualsValueExpression):
+            return 0
+        value = cond.value
+        if isinstance(value, SigmaRegularExpression):
+            return 3
+        if isinstance(value, (SigmaCIDRExpression, SigmaFieldReference)):
+            return 2
+        if not isinstance(value, SigmaString) or not value.contains_special():
+            return 0
+        if not self.backend.is_simple_wildcard(value):
+            return 2 if self.backend.wildcard_compilation else 3
+        prefix = value.startswith(SpecialChars.WILDCARD_MULTI)
+        suffix = value.endswith(SpecialChars.WILDCARD_MULTI)
+        if self.backend.term_index_operators and prefix != suffix and self.backend.is_term_aligned(value[int(prefix):len(value) - int(suffix)]):
+            return 1
+        return 1 if suffix and not prefix else 2
+
+    def estimate(self, cond: ConditionType) -> float:
+        """Estimated fraction of rows matched by a condition."""
+        if isinstance(cond, ConditionAND):
+            return min(self.estimate(arg) for arg in cond.args)
+        if isinstance(cond, ConditionOR):
+            return min(1.0, sum(self.estimate(arg) for arg in cond.args))
+        if isinstance(cond, ConditionNOT):
+            return 1.0
+        return self.selectivity.get(getattr(cond, "field", None))
+
+
+def pipeline_conditions(cond: ConditionType) -> Set[int]:
+    """Ids of the condition items that originate from detections added by the processing pipeline."""
+    if isinstance(cond, ConditionItem):
+        return set().union(*(pipeline_conditions(arg) for arg in cond.args))
+    if any(
+        isinstance(parent, ConditionIdentifier) and parent.identifier.startswith(pipeline_condition_prefix)
+        for parent in cond.parent_chain()
+    ):
+        return {id(cond)}
+    return set()
+
+
+def order_predicates(
+        cond: ConditionType,
+        backend: "sigma.backends.azure.AzureBackend",
+        selectivity: Optional[AzureFieldSelectivity] = None,
+        pinned: Optional[Set[int]] = None,
+) -> Tuple[ConditionType, int]:
+    """
+    Order the AND conditions of a condition tree, returns the tree and the number of reordered AND conditions. The
+    items kept first are determined from the tree if not given, which must be done before the tree is rewritten.
+    """
+    ordering = AzurePredicateOrdering(
+        backend,
+        selectivity or AzureFieldSelectivity(),
+        pipeline_conditions(cond) if pinned is None else pinned,
+    )
+    return ordering.order(cond), ordering.reordered
+
+
+def main(args: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Compute field selectivity statistics from events stored as JSON lines.")
+    parser.add_argument("events", nargs="+", help="JSON lines files with one event per line")
+    parser.add_argument("--output", "-o", required=True, help="Statistics file")
+    arguments = parser.parse_args(args)
+
+    def events() -> Iterable[Dict[str, Any]]:
+        for path in arguments.events:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+
+    statistics = AzureFieldSelectivity.from_table(AzureEventTable.from_events("events", events()))
+    statistics.to_file(arguments.output)
+    print(f"Computed selectivity of {len(statistics.fields)} fields", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
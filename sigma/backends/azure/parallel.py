@@ -0,0 +1,172 @@
+import copy
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sigma.exceptions import SigmaError
+
+from sigma.rule import SigmaRule
+
+from sigma.backends.azure.profiling import AzureConversionProfile
+
+import sigma
+
+# Backend instance of a worker process. It is set up once per worker by the pool initializer, so the backend and
+# its processing pipeline are only pickled once per worker and not for every converted rule.
+_worker_backend: Optional["sigma.backends.azure.AzureBackend"] = None
+
+
+@dataclass
+class AzureBulkConversionResult:
+    """
+    Conversion result of a single rule from a bulk conversion. Either queries contains the generated queries or
+    error contains the exception that was raised while converting the rule. The statistics of each query, the union
+    fallback and the unknown fields by table are the bookkeeping of the backend for the rule.
+    """
+    rule: SigmaRule
+    queries: List[Any] = field(default_factory=list)
+    error: Optional[Exception] = None
+    statistics: List[Dict[str, Any]] = field(default_factory=list)
+    union_fallback: bool = False
+    unknown_fields: Dict[str, List[str]] = field(default_factory=dict)
+
+    @property
+    def success(self) -> bool:
+        return self.error is None
+
+
+def chunk_rules(count: int, workers: int, chunk_size: Optional[int] = None) -> List[Tuple[int, int]]:
+    """
+    Split the index range of count rules into contiguous (start, end) chunks. Without explicit chunk_size, each
+    worker gets roughly four chunks to balance uneven rule conversion times. The result only depends on the
+    parameters, which keeps the distribution of rules deterministic between runs.
+    """
+    if chunk_size is None:
+        chunk_size = max(1, math.ceil(count / (max(1, workers) * 4)))
+    elif chunk_size < 1:
+        raise ValueError("Chunk size must be a positive number")
+
+    return [(start, min(start + chunk_size, count)) for start in range(0, count, chunk_size)]
+
+
+def _init_worker(backend: "sigma.backends.azure.AzureBackend") -> None:
+    global _worker_backend
+    _worker_backend = backend
+
+
+def _convert_rules(
+        backend: "sigma.backends.azure.AzureBackend",
+        rules: Sequence[SigmaRule],
+        output_format: Optional[str],
+) -> List[AzureBulkConversionResult]:
+    """
+    Convert rules one by one and catch errors per rule, so a single broken rule doesn't abort the whole chunk. The
+    bookkeeping lists of the backend are reset for each rule and returned with its result.
+    """
+    results = []
+    for rule in rules:
+        backend.query_statistics = list()
+        backend.union_fallback_rules = list()
+        backend.unknown_field_rules = list()
+        try:
+            result = AzureBulkConversionResult(rule, backend.convert_rule(rule, output_format))
+        except Exception as e:
+            result = AzureBulkConversionResult(rule, error=e)
+        result.statistics = [statistics for _, statistics in backend.query_statistics]
+        result.union_fallback = bool(backend.union_fallback_rules)
+        result.unknown_fields = {
+            table: fields for _, unknown_fields in backend.unknown_field_rules for table, fields in unknown_fields.items()
+        }
+        results.append(result)
+    return results
+
+
+def _convert_chunk(rules: Sequence[SigmaRule], output_format: Optional[str]) -> Tuple[List[AzureBulkConversionResult], Optional[AzureConversionProfile], Optional[Dict[str, Any]]]:
+    """
+    Convert a chunk in a worker process. The profile and the cache counters and new entries of the chunk are
+    returned to be merged by the parent process.
+    """
+    if _worker_backend.profile is not None:
+        _worker_backend.profile = AzureConversionProfile(_worker_backend.profile.slowest_rules_count)
+    cache = _worker_backend.cache
+    if cache is None:
+        return _convert_rules(_worker_backend, rules, output_format), _worker_backend.profile, None
+
+    counters = (cache.hits, cache.misses, cache.evictions)
+    entries = set(cache.entries)
+    results = _convert_rules(_worker_backend, rules, output_format)
+    return results, _worker_backend.profile, {
+        "hits": cache.hits - counters[0],
+        "misses": cache.misses - counters[1],
+        "evictions": cache.evictions - counters[2],
+        "entries": [(key, path) for key, path in cache.entries.items() if key not in entries],
+    }
+
+
+def _merge_result(backend: "sigma.backends.azure.AzureBackend", result: AzureBulkConversionResult) -> None:
+    """Add the bookkeeping of a rule to the backend like a conversion of the rule by the backend itself."""
+    backend.query_statistics.extend((result.rule, statistics) for statistics in result.statistics)
+    if result.union_fallback:
+        backend.union_fallback_rules.append(result.rule)
+    if result.unknown_fields:
+        backend.unknown_field_rules.append((result.rule, result.unknown_fields))
+    if backend.collect_errors and isinstance(result.error, SigmaError):
+        backend.errors.append((result.rule, result.error))
+
+
+def _merge_cache(cache: "sigma.backends.azure.cache.AzureConversionCache", chunk: Dict[str, Any]) -> None:
+    cache.hits += chunk["hits"]
+    cache.misses += chunk["misses"]
+    cache.evictions += chunk["evictions"]
+    for key, path in chunk["entries"]:
+        cache.entries[key] = path
+        cache.entries.move_to_end(key)
+    cache.evict()
+
+
+def convert_bulk(
+        backend: "sigma.backends.azure.AzureBackend",
+        rules: Sequence[SigmaRule],
+        output_format: Optional[str] = None,
+        processes: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+) -> List[AzureBulkConversionResult]:
+    """
+    Convert rules with a process pool of the given size (default: number of CPUs). Results are returned in input
+    order with one result object per rule. The query statistics, union fallback and unknown field rules, errors
+    (with collect_errors) and cache counters of all rules are added to the backend.
+    """
+    rules = list(rules)
+    # Errors are reported per rule in the results, therefore the converting backend must raise them. The converting
+    # backend gets its own bookkeeping lists, which are merged into the backend per rule.
+    converter = copy.copy(backend)
+    converter.collect_errors = False
+    converter.errors = list()
+
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = max(1, min(processes, len(rules)))
+    chunks = chunk_rules(len(rules), processes, chunk_size)
+
+    if processes == 1:  # Not worth spawning a pool, convert in this process with the same error handling.
+        results = _convert_rules(converter, rules, output_format)
+    else:
+        results = []
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=(converter,)) as executor:
+            for chunk_results, profile, cache in executor.map(
+                    _convert_chunk,
+                    [rules[start:end] for start, end in chunks],
+                    [output_format] * len(chunks),
+            ):
+                results.extend(chunk_results)
+                if profile is not None:
+                    backend.profile.merge(profile)
+                if cache is not None:
+                    _merge_cache(backend.cache, cache)
+
+    for rule, result in zip(rules, results):
+        result.rule = rule      # results of worker processes contain a copy of the rule
+        _merge_result(backend, result)
+    return results
@@ -0,0 +1,99 @@
+import heapq
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sigma.rule import SigmaRule
+
+
+@dataclass
+class AzureTiming:
+    """Number of calls and accumulated wall time."""
+    calls: int = 0
+    seconds: float = 0.0
+
+    def add(self, seconds: float, calls: int = 1) -> None:
+        self.calls += calls
+        self.seconds += seconds
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"calls": self.calls, "seconds": self.seconds}
+
+
+@dataclass
+class AzureRuleTiming:
+    """Conversion time of one rule."""
+    rule: str       # Rule id or title if the rule has no id
+    seconds: float
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"rule": self.rule, "seconds": self.seconds}
+
+
+@dataclass
+class AzureConversionProfile:
+    """
+    Profile of rule conversions, enabled by passing it as profile option to AzureBackend. Records the wall time and
+    number of calls of each conversion stage (cache, pipeline, convert_condition, escape_and_quote_field,
+    finalize_query, rule), of each processing item evaluated by AzureDispatchPipeline by identifier (unidentified items
+    by position) and the slowest rules. Stages are nested: field quoting is part of the condition conversion and
+    query finalization, all stages are part of the rule stage.
+    """
+    slowest_rules_count: int = 10       # Number of slowest rules that are kept
+    stages: Dict[str, AzureTiming] = field(default_factory=dict)
+    items: Dict[str, AzureTiming] = field(default_factory=dict)
+    rules: List[Tuple[float, int, AzureRuleTiming]] = field(default_factory=list, repr=False)     # Min-heap of slowest rules
+    sequence: int = field(default=0, repr=False, compare=False)     # Tie breaker of the rule heap
+
+    def record(self, stage: str, seconds: float) -> None:
+        self.stages.setdefault(stage, AzureTiming()).add(seconds)
+
+    def record_item(self, identifier: str, seconds: float) -> None:
+        self.items.setdefault(identifier, AzureTiming()).add(seconds)
+
+    def record_rule(self, rule: SigmaRule, seconds: float) -> None:
+        self.record("rule", seconds)
+        self.rank_rule(AzureRuleTiming(str(rule.id) if rule.id is not None else rule.title, seconds))
+
+    def rank_rule(self, rule: AzureRuleTiming) -> None:
+        self.sequence += 1
+        entry = (rule.seconds, self.sequence, rule)
+        if len(self.rules) < self.slowest_rules_count:
+            heapq.heappush(self.rules, entry)
+        elif self.rules and entry[0] > self.rules[0][0]:
+            heapq.heapreplace(self.rules, entry)
+
+    def call(self, stage: str, function: Callable[..., Any], *args: Any) -> Any:
+        """Call the function and record its wall time in the stage."""
+        start = time.perf_counter()
+        try:
+            return function(*args)
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def merge(self, other: "AzureConversionProfile") -> None:
+        """Add the measurements of another profile, e.g. from a worker process."""
+        for stage, timing in other.stages.items():
+            self.stages.setdefault(stage, AzureTiming()).add(timing.seconds, timing.calls)
+        for identifier, timing in other.items.items():
+            self.items.setdefault(identifier, AzureTiming()).add(timing.seconds, timing.calls)
+        for _, _, rule in other.rules:
+            self.rank_rule(rule)
+
+    @property
+    def slowest_rules(self) -> List[AzureRuleTiming]:
+        return [rule for _, _, rule in sorted(self.rules, key=lambda entry: (-entry[0], entry[1]))]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "stages": {stage: timing.to_dict() for stage, timing in self.stages.items()},
+            "items": {
+                identifier: timing.to_dict()
+                for identifier, timing in sorted(self.items.items(), key=lambda item: item[1].seconds, reverse=True)
+            },
+            "slowest_rules": [rule.to_dict() for rule in self.slowest_rules],
+        }
+
+    def to_json(self, indent: Optional[int] = 2) -> str:
+        return json.dumps(self.to_dict(), indent=indent)
@@ -0,0 +1,98 @@
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+metacharacters = frozenset(".^$*+?{}[]()|")
+
+
+@dataclass(frozen=True)
+class AzureRegexLiteral:
+    """
+    Regular expression that only matches literal strings: the value is equal to, starts with, ends with or contains
+    one of the literals.
+    """
+    operator: str   # "equals", "startswith", "endswith" or "contains"
+    literals: Tuple[str, ...]
+
+
+def _escaped(regexp: str, position: int) -> bool:
+    """Check if the character at the position is escaped by an odd number of backslashes."""
+    backslashes = 0
+    while position - backslashes > 0 and regexp[position - backslashes - 1] == "\\":
+        backslashes += 1
+    return backslashes % 2 == 1
+
+
+def _literal(regexp: str) -> Optional[str]:
+    """Unescape regular expression that matches a literal string, return None if it contains any regex syntax."""
+    literal = []
+    chars = iter(regexp)
+    for char in chars:
+        if char == "\\":
+            char = next(chars, None)
+            if char is None or char.isalnum() or char == "_":   # character classes like \d, \w or \b
+                return None
+        elif char in metacharacters:
+            return None
+        literal.append(char)
+    return "".join(literal)
+
+
+def _split_alternatives(regexp: str) -> List[str]:
+    alternatives = []
+    start = 0
+    for position, char in enumerate(regexp):
+        if char == "|" and not _escaped(regexp, position):
+            alternatives.append(regexp[start:position])
+            start = position + 1
+    alternatives.append(regexp[start:])
+    return alternatives
+
+
+def analyze_regex(regexp: str, multiline: bool = False) -> Optional[AzureRegexLiteral]:
+    """
+    Analyze a regular expression and return the literals and the matching operator if the regular expression only
+    consists of anchors, leading or trailing .* and a literal or an alternation of literals. Return None for all
+    other regular expressions.
+    """
+    body = regexp
+    start = body.startswith("^")
+    if start:
+        body = body[1:]
+    if body.startswith(".*"):
+        body = body[2:]
+        start = False
+
+    end = body.endswith("$") and not _escaped(body, len(body) - 1)
+    if end:
+        body = body[:-1]
+    if body.endswith(".*") and not _escaped(body, len(body) - 2):
+        body = body[:-2]
+        end = False
+
+    if multiline and (start or end):   # anchors match at line boundaries
+        return None
+
+    # Alternation of the whole expression in a group, anchors apply to all alternatives.
+    if body.startswith("(") and body.endswith(")") and not _escaped(body, len(body) - 1):
+        group = body[3:-1] if body.startswith("(?:") else body[1:-1]
+        if group.startswith("?"):
+            return None
+        alternatives = _split_alternatives(group)
+    else:
+        alternatives = _split_alternatives(body)
+        if len(alternatives) > 1 and (start or end):   # anchors only bind to the first or last alternative
+            return None
+
+    literals = [_literal(alternative) for alternative in alternatives]
+    if any(not literal for literal in literals):
+        return None
+
+    if start and end:
+        operator = "equals"
+    elif start:
+        operator = "startswith"
+    elif end:
+        operator = "endswith"
+    else:
+        operator = "contains"
+    return AzureRegexLiteral(operator, tuple(dict.fromkeys(literals)))
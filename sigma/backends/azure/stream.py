@@ -0,0 +1,203 @@
+"""
+Streaming conversion of rule directories. Rule files are discovered lazily, parsed and converted one by one and
+the results are written as one JSON record per rule, so the memory consumption doesn't depend on the number of
+converted rules:
+
+    sigma-azure-convert -p azure_windows_pipeline -o queries.jsonl rules/
+"""
+import argparse
+import copy
+import json
+import operator
+import os
+import sys
+from functools import reduce
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple, Union
+
+import yaml
+from sigma.collection import SigmaCollection
+from sigma.exceptions import SigmaConfigurationError
+
+from sigma.backends.azure.dedup import deduplicate_queries
+
+import sigma
+
+rule_file_suffixes = (".yml", ".yaml")
+
+
+def iter_rule_files(paths: Iterable[Union[str, Path]]) -> Iterator[Path]:
+    """
+    Yield rule files from files and directories. Directories are walked lazily in sorted order, so the output order
+    is stable between runs.
+    """
+    for path in map(Path, paths):
+        if path.is_dir():
+            for directory, directories, files in os.walk(path):
+                directories.sort()
+                for name in sorted(files):
+                    if name.endswith(rule_file_suffixes):
+                        yield Path(directory) / name
+        else:
+            yield path
+
+
+def _error_record(path: Path, error: Exception, rule: Optional["sigma.rule.SigmaRule"] = None) -> Dict[str, Any]:
+    return {
+        "path": str(path),
+        "id": str(rule.id) if rule is not None and rule.id is not None else None,
+        "title": rule.title if rule is not None else None,
+        "error": str(error),
+        "error_type": type(error).__name__,
+    }
+
+
+def convert_stream(
+        backend: "sigma.backends.azure.AzureBackend",
+        paths: Iterable[Union[str, Path]],
+        output_format: Optional[str] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Convert all rules of the rule files one by one and yield one record per rule. Successful conversions contain
+    the queries and the query statistics, failures contain the error message. Files that can't be parsed result in
+    one error record without rule id.
+    """
+    output_format = output_format or backend.default_format
+    if output_format == "batch":
+        raise SigmaConfigurationError("The batch output format combines multiple rules and can't be streamed")
+
+    # Errors are emitted as records and the per-rule bookkeeping of the backend is reset after each rule, therefore
+    # a separate backend instance is used.
+    backend = copy.copy(backend)
+    backend.collect_errors = False
+    backend.errors = list()
+
+    for path in iter_rule_files(paths):
+        try:
+            collection = SigmaCollection.from_yaml(path.read_text(encoding="utf-8"))
+        except Exception as e:
+            yield _error_record(path, e)
+            continue
+
+        for rule in collection.rules:
+            backend.query_statistics = list()
+            backend.union_fallback_rules = list()
+            backend.unknown_field_rules = list()
+            try:
+                queries = backend.convert_rule(rule, output_format)
+            except Exception as e:
+                yield _error_record(path, e, rule)
+                continue
+            yield {
+                "path": str(path),
+                "id": str(rule.id) if rule.id is not None else None,
+                "title": rule.title,
+                "queries": queries,
+                "statistics": [statistics for _, statistics in backend.query_statistics],
+                "union_fallback": bool(backend.union_fallback_rules),
+                "unknown_fields": {
+                    table: fields for _, unknown_fields in backend.unknown_field_rules for table, fields in unknown_fields.items()
+                },
+            }
+
+
+def write_jsonl(records: Iterable[Dict[str, Any]], sink: TextIO) -> Dict[str, int]:
+    """Write each record as one JSON line as soon as it is available. Returns the numbers of converted and failed rules."""
+    counts = {"converted": 0, "failed": 0}
+    for record in records:
+        sink.write(json.dumps(record, default=str) + "\n")
+        sink.flush()
+        counts["failed" if "error" in record else "converted"] += 1
+    return counts
+
+
+def parse_option(option: str) -> Tuple[str, Any]:
+    name, sep, value = option.partition("=")
+    if not sep:
+        raise argparse.ArgumentTypeError(f"Backend option '{option}' must be given as name=value")
+    return name, yaml.safe_load(value)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from sigma.backends.azure import AzureBackend
+    from sigma.backends.azure.cache import AzureConversionCache
+    from sigma.backends.azure.profiling import AzureConversionProfile
+    from sigma.pipelines.azure import pipelines
+
+    parser = argparse.ArgumentParser(description="Convert Sigma rule files and directories into Azure queries as JSON lines.")
+    parser.add_argument("paths", nargs="+", type=Path, help="Rule files and directories")
+    parser.add_argument("-p", "--pipeline", action="append", choices=sorted(pipelines), default=[], help="Processing pipeline")
+    parser.add_argument("-f", "--format", default=None, help="Output format")
+    parser.add_argument("-o", "--output", type=Path, help="Output file (default: stdout)")
+    parser.add_argument("-O", "--option", action="append", type=parse_option, default=[], help="Backend option as name=value, value is parsed as YAML")
+    parser.add_argument("--cache", type=Path, help="Directory of persistent conversion cache")
+    parser.add_argument("--profile", type=Path, help="Write a profile of the conversion stages, processing items and slowest rules as JSON into this file")
+    parser.add_argument("--manifest", type=Path, help="Only convert rules changed since the build recorded in this manifest and output the differences as JSON")
+    parser.add_argument("--deduplicate", action="store_true", help="Output equivalent queries once with the ids of all their rules as JSON")
+    args = parser.parse_args(argv)
+
+    pipeline = reduce(operator.add, (pipelines[name]() for name in args.pipeline)) if args.pipeline else None
+    options = dict(args.option)
+    if args.cache:
+        options["cache"] = AzureConversionCache(args.cache)
+    if args.profile:
+        options["profile"] = AzureConversionProfile()
+    backend = AzureBackend(processing_pipeline=pipeline, **options)
+    try:
+        return convert(backend, args)
+    finally:
+        if args.profile:
+            args.profile.write_text(backend.profile.to_json() + "\n", encoding="utf-8")
+
+
+def write_json(document: Dict[str, Any], path: Optional[Path]) -> None:
+    output = json.dumps(document, indent=2)
+    if path:
+        path.write_text(output + "\n", encoding="utf-8")
+    else:
+        print(output)
+
+
+def convert(backend: "sigma.backends.azure.AzureBackend", args: argparse.Namespace) -> int:
+    """Run the streaming, incremental or deduplicating conversion selected by the command line arguments."""
+    if args.manifest:
+        diff = backend.convert_incremental(args.paths, args.manifest, args.format)
+        write_json(diff.to_dict(), args.output)
+        print(
+            f"Converted {diff.converted} rules: {len(diff.added)} added, {len(diff.changed)} changed, "
+            f"{len(diff.removed)} removed, {len(diff.errors)} failed",
+            file=sys.stderr,
+        )
+        return 1 if diff.errors else 0
+
+    if args.deduplicate:
+        failed = []
+
+        def queries() -> Iterator[Tuple[str, Any]]:
+            for record in convert_stream(backend, args.paths, args.format):
+                if "error" in record:
+                    failed.append(record)
+                    continue
+                for query in record["queries"]:
+                    yield record["id"] or record["title"], query
+
+        result = deduplicate_queries(queries())
+        write_json(dict(result.to_dict(), errors=failed), args.output)
+        print(
+            f"Deduplicated {result.queries} queries into {result.unique} ({result.ratio:.1%} removed), {len(failed)} rules failed",
+            file=sys.stderr,
+        )
+        return 1 if failed else 0
+
+    records = convert_stream(backend, args.paths, args.format)
+    if args.output:
+        with args.output.open("w", encoding="utf-8") as sink:
+            counts = write_jsonl(records, sink)
+    else:
+        counts = write_jsonl(records, sys.stdout)
+    print(f"Converted {counts['converted']} rules, {counts['failed']} failed", file=sys.stderr)
+    return 1 if counts["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""
+Expression templates of the backend compiled into renderers. The query elements are rendered with str.format of the
+template class attributes, which parses the template on each call. Templates with named placeholders are parsed once
+into their literal text and fields. Templates with up to four fields without format spec or conversion, which are all
+templates of the backend, are rendered by a closure over the parsed parts, the others by joining the parts:
+
+    template = AzureTemplate("{field} {op} ({list})")
+    template.format(field="Image", op="in~", list='"a", "b"')     # compiled renderer
+"""
+from string import Formatter
+from typing import Callable, Sequence
+
+conversions = {None: None, "r": repr, "s": str, "a": ascii}     # conversion functions of the fields by !-conversion
+
+
+def compile_template(template: str) -> Callable[..., str]:
+    """
+    Compile a format string with named placeholders into a function with the placeholders as keyword arguments. Like
+    str.format, a missing placeholder raises a KeyError. Returns str.format of the template for positional, indexed or
+    attribute placeholders and nested format specs.
+    """
+    try:
+        parts = tuple(
+            (literal, name, spec, conversions[conversion])
+            for literal, name, spec, conversion in Formatter().parse(template)
+        )
+    except (ValueError, KeyError):      # invalid template, str.format raises the error when it's rendered
+        return template.format
+    if any(name is not None and (not name.isidentifier() or "{" in spec) for _, name, spec, _ in parts):
+        return template.format
+    if all(not spec and convert is None for _, _, spec, convert in parts):
+        literals, names, text = [], [], ""
+        for literal, name, _, _ in parts:   # escaped braces split the literal text into several parts
+            text += literal
+            if name is not None:
+                literals.append(text)
+                names.append(name)
+                text = ""
+        renderer = plain_renderer(literals + [text], names)
+        if renderer is not None:
+            return renderer
+
+    def render(**values) -> str:
+        return "".join([
+            literal if name is None else literal + format(
+                values[name] if convert is None else convert(values[name]),
+                spec,
+            )
+            for literal, name, spec, convert in parts
+        ])
+
+    return render
+
+
+def plain_renderer(literals: Sequence[str], names: Sequence[str]) -> Callable[..., str]:
+    """
+    Renderer of a template with the given fields without format spec or conversion, each preceded by the literal text
+    with the same index. The last literal text follows the last field. Returns None for more than four fields.
+    """
+    if len(names) == 0:
+        text = "".join(literals)
+        return lambda **values: text
+    elif len(names) == 1:
+        (l0, l1), (n0,) = literals, names
+        return lambda **values: f"{l0}{values[n0]}{l1}"
+    elif len(names) == 2:
+        (l0, l1, l2), (n0, n1) = literals, names
+        return lambda **values: f"{l0}{values[n0]}{l1}{values[n1]}{l2}"
+    elif len(names) == 3:
+        (l0, l1, l2, l3), (n0, n1, n2) = literals, names
+        return lambda **values: f"{l0}{values[n0]}{l1}{values[n1]}{l2}{values[n2]}{l3}"
+    elif len(names) == 4:
+        (l0, l1, l2, l3, l4), (n0, n1, n2, n3) = literals, names
+        return lambda **values: f"{l0}{values[n0]}{l1}{values[n1]}{l2}{values[n2]}{l3}{values[n3]}{l4}"
+    return None
+
+
+class AzureTemplate(str):
+    """Format string whose format method is the compiled renderer of the template."""
+
+    def __new__(cls, template: str) -> "AzureTemplate":
+        self = super().__new__(cls, template)
+        self.format = compile_template(template)
+        return self
+
+    def __reduce__(self):
+        return AzureTemplate, (str(self),)
+
+
+def compile_templates(cls: type, inherited: bool = False) -> None:
+    """
+    Replace the templates (strings with placeholders and dicts of them) defined by a class, including the inherited
+    ones if set, with compiled templates.
+    """
+    names = dir(cls) if inherited else list(vars(cls))
+    for name in names:
+        if name.startswith("_"):
+            continue
+        value = getattr(cls, name)
+        if type(value) is str and "{" in value:
+            setattr(cls, name, AzureTemplate(value))
+        elif type(value) is dict and any(type(item) is str and "{" in item for item in value.values()):
+            setattr(cls, name, {
+                key: AzureTemplate(item) if type(item) is str and "{" in item else item
+                for key, item in value.items()
+            })
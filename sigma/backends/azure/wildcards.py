@@ -0,0 +1,66 @@
+import re
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from sigma.types import SigmaString, SpecialChars
+
+
+@dataclass(frozen=True)
+class AzureWildcardPattern:
+    """
+    Sigma string with wildcards split into its literal segments. Values matching the pattern start with the prefix,
+    end with the suffix, contain all infixes in order and are at least length characters long (exactly length
+    characters if the pattern only contains single-character wildcards).
+    """
+    prefix: str
+    suffix: str
+    infixes: Tuple[str, ...]
+    length: int
+    variable_length: bool
+    regex: str     # Regular expression matching exactly the values matching the pattern
+
+    @property
+    def exact(self) -> bool:
+        """Prefix, suffix and length checks are sufficient, the infixes require a regular expression check."""
+        return not self.infixes
+
+    @property
+    def length_check(self) -> bool:
+        """Length check is required in addition to the prefix and suffix checks."""
+        return not self.variable_length or self.length > len(self.prefix) + len(self.suffix) or bool(self.prefix and self.suffix)
+
+
+def compile_wildcards(value: SigmaString) -> Optional[AzureWildcardPattern]:
+    """Compile a Sigma string into a wildcard pattern. Return None if it contains other special characters."""
+    segments = []       # literals and wildcards with merged consecutive literals
+    for part in value.s:
+        if isinstance(part, str):
+            if segments and isinstance(segments[-1], str):
+                segments[-1] += part
+            else:
+                segments.append(part)
+        elif part in (SpecialChars.WILDCARD_MULTI, SpecialChars.WILDCARD_SINGLE):
+            segments.append(part)
+        else:
+            return None
+
+    prefix = segments.pop(0) if segments and isinstance(segments[0], str) else ""
+    suffix = segments.pop() if segments and isinstance(segments[-1], str) else ""
+    infixes = tuple(segment for segment in segments if isinstance(segment, str))
+    singles = sum(1 for segment in segments if segment == SpecialChars.WILDCARD_SINGLE)
+
+    regex = "^" + re.escape(prefix) + "".join(
+        re.escape(segment) if isinstance(segment, str)
+        else ".*" if segment == SpecialChars.WILDCARD_MULTI
+        else "."
+        for segment in segments
+    ) + re.escape(suffix) + "$"
+
+    return AzureWildcardPattern(
+        prefix=prefix,
+        suffix=suffix,
+        infixes=infixes,
+        length=len(prefix) + len(suffix) + sum(len(infix) for infix in infixes) + singles,
+        variable_length=SpecialChars.WILDCARD_MULTI in segments,
+        regex=regex,
+    )
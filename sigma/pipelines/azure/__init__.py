@@ -1,4 +1,7 @@
 from .azure import azure_windows_pipeline
+from .dispatch import AzureDispatchPipeline
+from .schema import AzureSchema, AzureTableSchema, MapAzureSchemaFields
+from .tables import AzureTableIndex, AzureTableMapping
 # TODO: add all pipelines that should be exposed to the user of your backend in the import statement above.
 
 pipelines = {
@@ -1,10 +1,18 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Optional, Union
 
 from sigma.conditions import SigmaCondition
 from sigma.pipelines.common import logsource_windows_process_creation, logsource_windows
 
 from sigma.processing.pipeline import ProcessingPipeline, ProcessingItem
-from sigma.processing.transformations import AddConditionTransformation, FieldMappingTransformation
+from sigma.processing.transformations import AddConditionTransformation, ConditionTransformation, SetStateTransformation
+from sigma.rule import SigmaDetection, SigmaLogSource, SigmaRule
+
+from .dispatch import AzureDispatchPipeline
+from .schema import AzureSchema, MapAzureSchemaFields
+from .tables import AzureTableIndex, AzureTableMapping, default_tables_path, logsource_value_to_azure_logsource
 
 azure_windows_service_map = {
     'security': 'SecurityEvent',
@@ -16,17 +24,91 @@ azure_windows_service_map = {
 }
 
 
+def azure_table_index(path: Optional[Union[str, Path]] = None) -> AzureTableIndex:
+    """
+    Table index containing the Windows service mappings from azure_windows_service_map and the mappings from a data
+    file (default: the one shipped with this package, which is parsed once).
+    """
+    if path is None:
+        return default_azure_table_index()
+    return build_azure_table_index(path)
+
+
+@lru_cache(maxsize=None)
+def default_azure_table_index() -> AzureTableIndex:
+    return build_azure_table_index(default_tables_path)
+
+
+def build_azure_table_index(path: Union[str, Path]) -> AzureTableIndex:
+    return AzureTableIndex([
+        AzureTableMapping(product="windows", service=service, tables=(source,))
+        for service, source in azure_windows_service_map.items()
+    ]) + AzureTableIndex.from_yaml(path)
+
+
 @dataclass
 class AddAzureLogsource(AddConditionTransformation):
     def apply_condition(self, cond: SigmaCondition) -> None:
         cond.condition = f"{self.name} and ({cond.condition})"
 
 
+@dataclass
+class SetAzureTimeWindow(SetStateTransformation):
+    """
+    Set the time window filter of the queries to a timespan (e.g. "1d") or a (start, end) tuple. Overrides the
+    time_window backend option, the azure_time_window custom attribute of a rule overrides this setting.
+    """
+    key: str = "azure_time_window"
+    val: Any = None
+
+
+@dataclass
+class AddAzureTables(AddAzureLogsource):
+    """
+    Add the tables resolved from the rule log source with the table index, if no table was added to the rule by a
+    previous processing item.
+    """
+    table_index: AzureTableIndex = field(default_factory=azure_table_index)
+
+    def logsource_fingerprint(self, logsource: SigmaLogSource) -> Any:
+        """
+        Part of the transformation that is relevant for rules with the log source. Incremental builds only
+        reconvert rules whose tables changed instead of all rules if any mapping of the table index changes.
+        """
+        return {"class": type(self).__qualname__, "tables": list(self.table_index.resolve(logsource))}
+
+    def apply(self, pipeline: ProcessingPipeline, rule: SigmaRule) -> None:
+        if any(
+            getattr(detection_item, "field", None) == "__azure_logsource"
+            for detection in rule.detection.detections.values()
+            for detection_item in detection.detection_items
+        ):
+            return
+
+        tables = self.table_index.resolve(rule.logsource)
+        if tables:
+            rule.detection.detections[self.name] = SigmaDetection.from_definition({
+                "__azure_logsource": tables[0] if len(tables) == 1 else list(tables),
+            })
+            self.processing_item_applied(rule.detection.detections[self.name])
+            ConditionTransformation.apply(self, pipeline, rule)
+
+
 # TODO: the following code is just an example extend/adapt as required.
 # See https://sigmahq-pysigma.readthedocs.io/en/latest/Processing_Pipelines.html for further documentation.
 
-def azure_windows_pipeline() -> ProcessingPipeline:  # Processing pipelines should be defined as functions that return a ProcessingPipeline object.
-    return ProcessingPipeline(
+def azure_windows_pipeline(table_index: Optional[AzureTableIndex] = None, schema: Optional[AzureSchema] = None) -> ProcessingPipeline:  # Processing pipelines should be defined as functions that return a ProcessingPipeline object.
+    """
+    Pipeline that maps Windows log sources to tables and fields to the columns of these tables. Processing items are
+    dispatched by the log source of the rule, see AzureDispatchPipeline. Every call returns a new pipeline, because
+    pySigma keeps the state of the processed rule in the pipeline. The default table index and schema are only
+    parsed once and shared by all pipelines.
+    """
+    return build_azure_windows_pipeline(table_index or azure_table_index(), schema or AzureSchema.default())
+
+
+def build_azure_windows_pipeline(table_index: AzureTableIndex, schema: AzureSchema) -> AzureDispatchPipeline:
+    return AzureDispatchPipeline(
         name="Azure Windows Pipeline",
         allowed_backends=frozenset(),  # Set of identifiers of backends (from the backends mapping) that are allowed to use this processing pipeline. This can be used by frontends like Sigma CLI to warn the user about inappropriate usage.
         priority=20,  # The priority defines the order pipelines are applied. See documentation for common values.
@@ -38,12 +120,6 @@ def azure_windows_pipeline() -> ProcessingPipeline:  # Processing pipelines shou
                   )
                   for service, source in azure_windows_service_map.items()
               ] + [
-                  ProcessingItem(  # Field mappings
-                      identifier="azure_field_mapping",
-                      transformation=FieldMappingTransformation({
-                          # "EventID": "event_id",
-                      })
-                  ),
                   ProcessingItem(
                       identifier="azure_process_creation_logsource",
                       transformation=AddAzureLogsource({'__azure_logsource': 'SecurityEvent'}),
@@ -55,7 +131,15 @@ def azure_windows_pipeline() -> ProcessingPipeline:  # Processing pipelines shou
                           'EventID': '4688'
                       }),
                       rule_conditions=[logsource_windows_process_creation()]
-                  )
+                  ),
+                  ProcessingItem(  # tables of all log sources that weren't mapped above
+                      identifier="azure_table_index",
+                      transformation=AddAzureTables(table_index=table_index),
+                  ),
+                  ProcessingItem(  # fields mapped to the columns of the tables added above
+                      identifier="azure_field_mapping",
+                      transformation=MapAzureSchemaFields(schema=schema),
+                  ),
               ],
     )
 
@@ -72,16 +156,3 @@ def azure_backend_pipeline() -> ProcessingPipeline:
         ]
     )
 
-
-def logsource_value_to_azure_logsource(logsource_field: str):
-    if "-" in logsource_field:
-        table = "-".join([item.capitalize() for item in logsource_field.split("-")])
-    elif "_" in logsource_field:
-        table = "_".join([item.capitalize() for item in logsource_field.split("_")])
-    else:
-        if logsource_field.islower() or logsource_field.isupper():
-            table = logsource_field.capitalize()
-        else:
-            table = logsource_field
-
-    return table
@@ -0,0 +1,123 @@
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from sigma.processing.conditions import LogsourceCondition
+from sigma.processing.pipeline import ProcessingItem, ProcessingPipeline
+from sigma.processing.tracking import FieldMappingTracking
+from sigma.rule import SigmaLogSource, SigmaRule
+
+LogsourceKey = Tuple[Optional[str], Optional[str], Optional[str]]     # (product, category, service)
+
+
+def logsource_key(logsource: SigmaLogSource) -> LogsourceKey:
+    return logsource.product, logsource.category, logsource.service
+
+
+@dataclass
+class AzureDispatchPipeline(ProcessingPipeline):
+    """
+    Processing pipeline with an index from log sources to the processing items that are restricted to them by a
+    single log source condition. Only these items and the items without such a condition are evaluated for a rule,
+    the processing time per rule therefore doesn't grow with the number of log source mappings. The items are
+    stored as tuple and can't be modified, concatenation with other pipelines creates a new dispatch pipeline.
+    """
+    dispatch: Dict[LogsourceKey, List[int]] = field(init=False, compare=False, repr=False, default_factory=dict)
+    undispatched: List[int] = field(init=False, compare=False, repr=False, default_factory=list)     # Positions of items that are evaluated for every rule
+    candidate_cache: Dict[LogsourceKey, List[int]] = field(init=False, compare=False, repr=False, default_factory=dict)
+    profile: Optional[Any] = field(init=False, compare=False, repr=False, default=None)     # AzureConversionProfile that records the time of each evaluated item
+
+    def __post_init__(self):
+        super().__post_init__()
+        self.items = tuple(self.items)
+        self.dispatch = defaultdict(list)
+        for position, item in enumerate(self.items):
+            key = self.dispatch_key(item)
+            if key is None:
+                self.undispatched.append(position)
+            else:
+                self.dispatch[key].append(position)
+
+    @staticmethod
+    def dispatch_key(item: ProcessingItem) -> Optional[LogsourceKey]:
+        """Log source the item is restricted to or None if the item can apply to rules with any log source."""
+        if (
+            len(item.rule_conditions) == 1
+            and isinstance(item.rule_conditions[0], LogsourceCondition)
+            and not item.rule_condition_negation
+        ):
+            return logsource_key(item.rule_conditions[0].logsource)
+        return None
+
+    def candidates(self, key: LogsourceKey) -> List[int]:
+        """Positions of all items that can apply to a rule with the log source in pipeline order."""
+        if key not in self.candidate_cache:
+            product, category, service = key
+            positions = set(self.undispatched)
+            for candidate in {
+                (p, c, s)
+                for p in (product, None)
+                for c in (category, None)
+                for s in (service, None)
+            }:
+                positions.update(self.dispatch.get(candidate, ()))
+            self.candidate_cache[key] = sorted(positions)
+        return self.candidate_cache[key]
+
+    def apply(self, rule: SigmaRule) -> SigmaRule:
+        """
+        Apply the items that can match the rule log source in pipeline order. If an item changes the log source of
+        the rule, the remaining items are dispatched again with the new log source.
+        """
+        self.applied = [False] * len(self.items)
+        self.applied_ids = set()
+        self.field_name_applied_ids = defaultdict(set)
+        self.field_mappings = FieldMappingTracking()
+        self.state = dict()
+
+        key = logsource_key(rule.logsource)
+        positions = self.candidates(key)
+        i = 0
+        while i < len(positions):
+            position = positions[i]
+            item = self.items[position]
+            if self.profile is None:
+                applied = item.apply(self, rule)
+            else:
+                start = time.perf_counter()
+                applied = item.apply(self, rule)
+                self.profile.record_item(item.identifier or f"#{position}", time.perf_counter() - start)
+            self.applied[position] = applied
+            if applied and (itid := item.identifier):
+                self.applied_ids.add(itid)
+
+            if logsource_key(rule.logsource) != key:
+                key = logsource_key(rule.logsource)
+                positions = positions[:i + 1] + [
+                    candidate for candidate in self.candidates(key) if candidate > position
+                ]
+            i += 1
+        return rule
+
+    @classmethod
+    def concatenate(cls, first: ProcessingPipeline, second: ProcessingPipeline) -> "AzureDispatchPipeline":
+        return cls(
+            items=list(first.items) + list(second.items),
+            postprocessing_items=list(first.postprocessing_items) + list(second.postprocessing_items),
+            finalizers=list(first.finalizers) + list(second.finalizers),
+            vars={**first.vars, **second.vars},
+        )
+
+    def __add__(self, other: Optional[ProcessingPipeline]) -> "AzureDispatchPipeline":
+        if other is None:
+            return self
+        if not isinstance(other, ProcessingPipeline):
+            raise TypeError("Processing pipeline must be merged with another one.")
+        return self.concatenate(self, other)
+
+    def __radd__(self, other) -> "AzureDispatchPipeline":
+        """Concatenation with a plain pipeline on the left side also results in a dispatch pipeline."""
+        if isinstance(other, ProcessingPipeline):
+            return self.concatenate(other, self)
+        return super().__radd__(other)
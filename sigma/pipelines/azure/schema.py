@@ -0,0 +1,224 @@
+from copy import copy
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import yaml
+from sigma.exceptions import SigmaConfigurationError
+from sigma.processing.pipeline import ProcessingPipeline
+from sigma.processing.transformations import FieldMappingTransformationBase
+from sigma.rule import SigmaDetection, SigmaDetectionItem, SigmaRule
+from sigma.types import SigmaBool, SigmaNumber, SigmaString, SigmaType
+
+default_schema_path = Path(__file__).parent / "data" / "schema.yml"
+
+column_types = frozenset({"string", "int", "long", "real", "decimal", "bool", "datetime", "timespan", "guid", "dynamic"})
+numeric_types = frozenset({"int", "long", "real", "decimal"})
+exact_types = numeric_types | {"bool"}     # Column types compared with == instead of case-insensitive string matching
+
+payload_formats = frozenset({"xml", "json"})
+xml_entities = {"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;"}     # Characters escaped in the text of XML payloads
+
+column_types_state_key = "azure_column_types"      # Pipeline state with the types of exact-typed columns of the rule
+unknown_fields_state_key = "azure_unknown_fields"  # Pipeline state with the fields of the rule missing in its tables
+payload_state_key = "azure_payload"                # Pipeline state with the payload column, format and fields of the rule
+tables_state_key = "azure_tables"                  # Pipeline state with the tables of the rule mapped by the schema
+columns_state_key = "azure_columns"                # Pipeline state with the columns contained in all tables of the rule
+
+
+@dataclass
+class AzureTableSchema:
+    """
+    Columns of a table with their types and the mapping of Sigma field names to columns if they differ. Fields of
+    tables with a payload column that aren't columns are extracted from the XML or JSON payload.
+    """
+    name: str
+    columns: Dict[str, str] = field(default_factory=dict)
+    fields: Dict[str, str] = field(default_factory=dict)
+    payload: Optional[Tuple[str, str]] = None       # (column, format) of the payload
+    folded: Dict[str, str] = field(init=False, compare=False, repr=False)     # Lowercase column name to column
+
+    def __post_init__(self):
+        self.folded = {column.lower(): column for column in self.columns}
+
+    def resolve(self, name: str) -> Optional[str]:
+        """Column of a Sigma field: the mapped column, the column with the same name ignoring the case or None."""
+        if name in self.fields:
+            return self.fields[name]
+        return self.folded.get(name.lower())
+
+
+@dataclass
+class AzureSchema:
+    """Column schemas of Azure tables by table name."""
+    tables: Dict[str, AzureTableSchema] = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "AzureSchema":
+        tables = dict()
+        for name, entry in (d.get("tables") or dict()).items():
+            unknown = set(entry) - {"columns", "fields", "payload"}
+            if unknown:
+                raise SigmaConfigurationError(f"Schema of table '{name}' contains unknown keys: {', '.join(sorted(unknown))}")
+            columns = entry.get("columns") or dict()
+            invalid = {column: kind for column, kind in columns.items() if kind not in column_types}
+            if invalid:
+                raise SigmaConfigurationError(
+                    f"Schema of table '{name}' contains columns with unknown types: "
+                    + ", ".join(f"{column} ({kind})" for column, kind in sorted(invalid.items()))
+                )
+            fields = entry.get("fields") or dict()
+            missing = set(fields.values()) - set(columns)
+            if missing:
+                raise SigmaConfigurationError(f"Schema of table '{name}' maps fields to unknown columns: {', '.join(sorted(missing))}")
+            payload = entry.get("payload")
+            if payload is not None:
+                if not isinstance(payload, dict) or payload.get("column") not in columns or payload.get("format") not in payload_formats:
+                    raise SigmaConfigurationError(
+                        f"Payload of table '{name}' must define a column of the table and the format {' or '.join(sorted(payload_formats))}"
+                    )
+                payload = (payload["column"], payload["format"])
+            tables[name] = AzureTableSchema(name, dict(columns), dict(fields), payload)
+        return cls(tables)
+
+    @classmethod
+    def from_yaml(cls, path: Union[str, Path]) -> "AzureSchema":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(yaml.safe_load(f) or dict())
+
+    @classmethod
+    def default(cls) -> "AzureSchema":
+        """Schema defined in the data file shipped with this package, parsed once."""
+        return _default_schema(cls)
+
+
+@lru_cache(maxsize=None)
+def _default_schema(cls: type) -> AzureSchema:
+    return cls.from_yaml(default_schema_path)
+
+
+def rule_tables(rule: SigmaRule) -> Tuple[str, ...]:
+    """Tables added to the rule by the log source processing items."""
+    tables: Dict[str, None] = dict()   # ordered set
+
+    def collect(detection: SigmaDetection) -> None:
+        for item in detection.detection_items:
+            if isinstance(item, SigmaDetection):
+                collect(item)
+            elif item.field == "__azure_logsource":
+                tables.update(dict.fromkeys(str(value) for value in item.value))
+
+    for detection in rule.detection.detections.values():
+        collect(detection)
+    return tuple(tables)
+
+
+@dataclass
+class MapAzureSchemaFields(FieldMappingTransformationBase):
+    """
+    Map the fields of a rule to the columns of its tables with the schema and convert values of numeric and boolean
+    columns into numbers and booleans, which are compared with == by the backend. The types of these columns are
+    stored in the pipeline state (azure_column_types), fields that aren't columns of all tables of the rule in
+    azure_unknown_fields. If all tables of the rule have the same payload, such fields are payload fields and are
+    stored with the payload column and format in azure_payload instead. Must be applied after the tables were added
+    to the rule. Rules with tables that aren't contained in the schema are not changed. The tables of the rule are
+    kept in the pipeline state (azure_tables) like all other per-rule data, the transformation itself is stateless.
+    """
+    schema: AzureSchema = field(default_factory=AzureSchema.default)
+
+    def apply(self, pipeline: ProcessingPipeline, rule: SigmaRule) -> None:
+        tables = rule_tables(rule)
+        if not tables or any(table not in self.schema.tables for table in tables):
+            return
+        self.pipeline = pipeline    # set by the base class after the field list of the rule was mapped
+        pipeline.state[tables_state_key] = list(tables)
+        schemas = self.table_schemas(pipeline)
+        pipeline.state[columns_state_key] = [
+            column for column in schemas[0].columns
+            if all(column in table.columns for table in schemas[1:])
+        ]
+        pipeline.state[column_types_state_key] = dict()
+        pipeline.state[unknown_fields_state_key] = dict()
+        payloads = {table.payload for table in schemas}
+        if len(payloads) == 1 and (payload := payloads.pop()) is not None:
+            column, payload_format = payload
+            pipeline.state[payload_state_key] = {"column": column, "format": payload_format, "fields": list()}
+        super().apply(pipeline, rule)
+
+    def table_schemas(self, pipeline: ProcessingPipeline) -> List[AzureTableSchema]:
+        """Schemas of the tables of the rule processed by the pipeline."""
+        return [self.schema.tables[table] for table in pipeline.state.get(tables_state_key, ())]
+
+    def resolve(self, name: str) -> Optional[str]:
+        """Column of a field in all tables of the rule or None if the field is missing or mapped differently."""
+        columns = {table.resolve(name) for table in self.table_schemas(self.pipeline)}
+        if len(columns) != 1:
+            return None
+        return columns.pop()
+
+    def apply_field_name(self, name: str) -> List[str]:
+        return [self.resolve(name) or name]
+
+    def apply_detection_item(self, detection_item: SigmaDetectionItem) -> None:
+        super().apply_detection_item(detection_item)
+        name = detection_item.field
+        if name is None or name.startswith("__azure"):
+            return
+        payload = self.pipeline.state.get(payload_state_key)
+        if payload is not None and self.resolve(name) is None:
+            if name not in payload["fields"]:
+                payload["fields"].append(name)
+            if payload["format"] == "xml":     # extracted values aren't decoded
+                detection_item.value = [xml_escaped_value(value) for value in detection_item.value]
+            return
+        for table in self.table_schemas(self.pipeline):
+            if table.resolve(name) is None:
+                unknown = self.pipeline.state[unknown_fields_state_key].setdefault(table.name, list())
+                if name not in unknown:
+                    unknown.append(name)
+
+        column = self.resolve(name)
+        if column is None:
+            return
+        if column != name:
+            self.pipeline.field_mappings.add_mapping(name, column)
+            detection_item.field = column
+            self.processing_item_applied(detection_item)
+
+        kinds = {table.columns[column] for table in self.table_schemas(self.pipeline)}
+        if len(kinds) == 1 and (kind := kinds.pop()) in exact_types:
+            self.pipeline.state[column_types_state_key][column] = kind
+            detection_item.value = [typed_value(value, kind) for value in detection_item.value]
+
+
+def typed_value(value: SigmaType, kind: str) -> SigmaType:
+    """Convert plain string values into the type of an exact-typed column, other values are kept."""
+    if not isinstance(value, SigmaString) or value.contains_special():
+        return value
+    plain = str(value)
+    if kind == "bool":
+        if plain.lower() in ("true", "false"):
+            return SigmaBool(plain.lower() == "true")
+        return value
+    try:
+        return SigmaNumber(int(plain) if kind in ("int", "long") else float(plain))
+    except ValueError:
+        return value
+
+
+def xml_escaped_value(value: SigmaType) -> SigmaType:
+    """
+    Escape the literal parts of string values like the text of XML payloads, so they can be compared with the values
+    extracted from the payload without decoding them. Other values are kept.
+    """
+    if not isinstance(value, SigmaString) or not any(
+        isinstance(part, str) and any(character in part for character in xml_entities) for part in value.s
+    ):
+        return value
+    escaped = copy(value)
+    escaped.s = tuple(
+        "".join(xml_entities.get(character, character) for character in part) if isinstance(part, str) else part
+        for part in value.s
+    )
+    return escaped
@@ -0,0 +1,118 @@
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple, Union
+
+import yaml
+from sigma.collection import SigmaCollection
+from sigma.exceptions import SigmaConfigurationError
+from sigma.rule import SigmaLogSource, SigmaRule
+
+default_tables_path = Path(__file__).parent / "data" / "tables.yml"
+
+LogsourceKey = Tuple[Optional[str], Optional[str], Optional[str]]
+
+
+def logsource_value_to_azure_logsource(logsource_field: str):
+    if "-" in logsource_field:
+        table = "-".join([item.capitalize() for item in logsource_field.split("-")])
+    elif "_" in logsource_field:
+        table = "_".join([item.capitalize() for item in logsource_field.split("_")])
+    else:
+        if logsource_field.islower() or logsource_field.isupper():
+            table = logsource_field.capitalize()
+        else:
+            table = logsource_field
+
+    return table
+
+
+@dataclass(frozen=True)
+class AzureTableMapping:
+    """Mapping of a Sigma log source to one or multiple tables. Log source fields set to None match any value."""
+    product: Optional[str] = None
+    category: Optional[str] = None
+    service: Optional[str] = None
+    tables: Tuple[str, ...] = ()
+
+    @property
+    def key(self) -> LogsourceKey:
+        return self.product, self.category, self.service
+
+    @property
+    def specificity(self) -> int:
+        return sum(value is not None for value in self.key)
+
+
+@dataclass
+class AzureTableIndex:
+    """
+    Index that resolves Sigma log sources (product, category, service) into a bounded set of Azure tables. A rule
+    log source is resolved with all mappings whose defined fields match the rule. The most specific mappings (with
+    most defined log source fields) win, tables of equally specific mappings are merged.
+
+    If no mapping matches and the product is contained in derive_products, the service name is converted into a
+    table name with logsource_value_to_azure_logsource.
+    """
+    mappings: List[AzureTableMapping] = field(default_factory=list)
+    derive_products: FrozenSet[str] = frozenset()
+    index: Dict[LogsourceKey, List[Tuple[int, AzureTableMapping]]] = field(init=False, compare=False, repr=False)
+
+    def __post_init__(self):
+        self.index = dict()
+        for position, mapping in enumerate(self.mappings):
+            self.index.setdefault(mapping.key, list()).append((position, mapping))
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "AzureTableIndex":
+        mappings = list()
+        for i, entry in enumerate(d.get("tables", list())):
+            unknown = set(entry) - {"product", "category", "service", "tables"}
+            if unknown:
+                raise SigmaConfigurationError(f"Table mapping {i + 1} contains unknown keys: {', '.join(sorted(unknown))}")
+            tables = entry.get("tables", list())
+            if isinstance(tables, str):
+                tables = [tables]
+            if not tables:
+                raise SigmaConfigurationError(f"Table mapping {i + 1} doesn't define any table")
+            mappings.append(AzureTableMapping(entry.get("product"), entry.get("category"), entry.get("service"), tuple(tables)))
+        return cls(mappings, frozenset(d.get("derive", list())))
+
+    @classmethod
+    def from_yaml(cls, path: Union[str, Path]) -> "AzureTableIndex":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(yaml.safe_load(f) or dict())
+
+    @classmethod
+    def default(cls) -> "AzureTableIndex":
+        """Table index defined in the data file shipped with this package."""
+        return cls.from_yaml(default_tables_path)
+
+    def __add__(self, other: "AzureTableIndex") -> "AzureTableIndex":
+        """Merge two indices, mappings of both indices with the same log source are merged."""
+        return self.__class__(self.mappings + other.mappings, self.derive_products | other.derive_products)
+
+    def resolve(self, logsource: SigmaLogSource) -> Tuple[str, ...]:
+        """Return tables for the given log source or an empty tuple if it can't be resolved."""
+        # Each mapping field matches the rule value or any value (None). Look up all possible combinations instead
+        # of iterating over all mappings.
+        matches: List[Tuple[int, AzureTableMapping]] = list()
+        for product in {logsource.product, None}:
+            for category in {logsource.category, None}:
+                for service in {logsource.service, None}:
+                    matches.extend(self.index.get((product, category, service), ()))
+
+        if matches:
+            specificity = max(mapping.specificity for _, mapping in matches)
+            tables: Dict[str, None] = dict()   # ordered set
+            for _, mapping in sorted(matches, key=lambda match: match[0]):
+                if mapping.specificity == specificity:
+                    tables.update(dict.fromkeys(mapping.tables))
+            return tuple(tables)
+
+        if logsource.product in self.derive_products and logsource.service is not None:
+            return logsource_value_to_azure_logsource(logsource.service),
+        return ()
+
+    def unresolved(self, rules: Union[SigmaCollection, Iterable[SigmaRule]]) -> List[SigmaRule]:
+        """Return all rules whose log source can't be resolved and would be converted into union * queries."""
+        return [rule for rule in rules if not self.resolve(rule.logsource)]
@@ -323,3 +323,64 @@ def test_azure_keyword_plus_or_fieldvalue(azure_backend: AzureBackend):
                 condition: sel or sel2
         """)
     ) == ['union *\n| where (["*"] contains "test_value_one" or ["*"] contains "test_value_two") or value =~ "condition"']
+
+
+def test_azure_term_index_operators():
+    backend = AzureBackend(term_index_operators=True)
+    queries = backend.convert(
+        SigmaCollection.from_yaml("""
+            title: Test
+            status: test
+            logsource:
+                category: test_category
+                product: test_product
+            detection:
+                sel:
+                    fieldA|contains: mimikatz
+                    fieldB|startswith: powershell
+                    fieldC|endswith: exe
+                    fieldD|contains|cased: Invoke
+                sel2:
+                    fieldE|contains: 'sekurlsa::'
+                    fieldF|startswith: ab
+                    fieldG: value
+                condition: sel and sel2
+        """)
+    )
+    assert queries == ['union *\n| where (fieldA contains "mimikatz" and (fieldB hasprefix "powershell" and fieldB startswith "powershell") and '
+          '(fieldC hassuffix "exe" and fieldC endswith "exe") and fieldD casematch_contains "Invoke") and '
+          '(fieldE contains "sekurlsa::" and fieldF startswith "ab" and fieldG =~ "value")']
+    assert backend.query_statistics[0][1] == {"term_index_predicates": 2, "query_size_bytes": len(queries[0])}
+
+
+def test_azure_term_index_operators_negated():
+    assert AzureBackend(term_index_operators=True).convert(
+        SigmaCollection.from_yaml("""
+            title: Test
+            status: test
+            logsource:
+                category: test_category
+                product: test_product
+            detection:
+                sel:
+                    fieldA|startswith: powershell
+                condition: not sel
+        """)
+    ) == ['union *\n| where not (fieldA hasprefix "powershell" and fieldA startswith "powershell")']
+
+
+def test_azure_term_index_operators_min_length():
+    assert AzureBackend(term_index_operators=True, min_term_length=5).convert(
+        SigmaCollection.from_yaml("""
+            title: Test
+            status: test
+            logsource:
+                category: test_category
+                product: test_product
+            detection:
+                sel:
+                    fieldA|endswith: exe
+                    fieldB|endswith: rundll32
+                condition: sel
+        """)
+    ) == ['union *\n| where fieldA endswith "exe" and (fieldB hassuffix "rundll32" and fieldB endswith "rundll32")']
@@ -0,0 +1,99 @@
+import pytest
+from sigma.collection import SigmaCollection
+from sigma.exceptions import SigmaFeatureNotSupportedByBackendError
+
+from sigma.backends.azure import AzureBackend
+from sigma.backends.azure.aggregation import SigmaAggregation, split_aggregation
+from sigma.pipelines.azure import AzureTableIndex, azure_windows_pipeline
+from sigma.pipelines.azure.azure import azure_table_index
+
+
+def rule(condition: str, timeframe: str = "", category: str = "process_creation") -> SigmaCollection:
+    return SigmaCollection.from_yaml(f"""
+        title: Test
+        status: test
+        logsource:
+            category: {category}
+            product: windows
+        detection:
+            sel:
+                CommandLine|contains: whoami
+            sel2:
+                CommandLine|contains: hostname
+            {timeframe}
+            condition: {condition}
+    """)
+
+
+def convert(condition: str, timeframe: str = "", output_format: str = "default", **options):
+    return AzureBackend(azure_windows_pipeline(), **options).convert(rule(condition, timeframe), output_format)
+
+
+def test_split_aggregation():
+    assert split_aggregation("sel and not filter | count(Image) by User, Computer = 3") == (
+        "sel and not filter",
+        SigmaAggregation(function="count", field="Image", group_by=("User", "Computer"), operator="==", value=3),
+    )
+    assert split_aggregation("sel") == ("sel", None)
+
+
+@pytest.mark.parametrize("condition", ["sel | near sel2", "sel | median(Image) > 3", "sel | max() > 3", "sel | count() > x"])
+def test_split_aggregation_unsupported(condition):
+    with pytest.raises(SigmaFeatureNotSupportedByBackendError):
+        split_aggregation(condition)
+
+
+def test_azure_aggregation_count():
+    assert convert("sel | count() by User > 10", "timeframe: 5m") == [
+        'SecurityEvent\n| where EventID == 4688 and (CommandLine contains "whoami")\n'
+        '| summarize count_ = count() by Account, bin(TimeGenerated, 5m)\n'
+        '| where count_ > 10'
+    ]
+
+
+def test_azure_aggregation_field_default_window():
+    assert convert("sel | count(Image) by User, Computer >= 3") == [
+        'SecurityEvent\n| where EventID == 4688 and (CommandLine contains "whoami")\n'
+        '| summarize dcount_NewProcessName = dcount(NewProcessName) by Account, Computer, bin(TimeGenerated, 1h)\n'
+        '| where dcount_NewProcessName >= 3'
+    ]
+    assert convert("sel | max(LogonType) = 3", aggregation_window="1d") == [
+        'SecurityEvent\n| where EventID == 4688 and (CommandLine contains "whoami")\n'
+        '| summarize max_LogonType = max(LogonType) by bin(TimeGenerated, 1d)\n'
+        '| where max_LogonType == 3'
+    ]
+
+
+def test_azure_aggregation_timeframe_not_searched():
+    query = convert("1 of them | count() > 5", "timeframe: 5m")[0]
+    assert '"5m"' not in query
+    assert query.endswith('\n| summarize count_ = count() by bin(TimeGenerated, 5m)\n| where count_ > 5')
+
+
+def test_azure_aggregation_invalid_timeframe():
+    with pytest.raises(SigmaFeatureNotSupportedByBackendError, match="Invalid timeframe"):
+        convert("sel | count() > 5", "timeframe: 5 minutes")
+
+
+def test_azure_aggregation_union():
+    pipeline = azure_windows_pipeline(table_index=azure_table_index() + AzureTableIndex.from_dict({"tables": [
+        {"product": "windows", "category": "multi_table", "tables": ["SecurityEvent", "Event"]},
+    ]}))
+    assert AzureBackend(pipeline).convert(rule("sel | count() > 5", category="multi_table")) == [
+        'union withsource=SourceTable (SecurityEvent\n| where CommandLine contains "whoami"), '
+        '(Event\n| where CommandLine contains "whoami")\n'
+        '| summarize count_ = count() by bin(TimeGenerated, 1h)\n'
+        '| where count_ > 5'
+    ]
+
+
+def test_azure_aggregation_not_projected():
+    assert convert("sel | count() by User > 10", project_fields=True)[0].endswith("| where count_ > 10")
+
+
+def test_azure_aggregation_not_batched():
+    backend = AzureBackend(azure_windows_pipeline())
+    collection = SigmaCollection(rule("sel | count() > 10").rules + rule("sel2").rules)
+    queries = backend.convert(collection, "batch")
+    assert len(queries) == 2
+    assert queries[0].endswith("| where count_ > 10")
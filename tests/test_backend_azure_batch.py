@@ -0,0 +1,97 @@
+import pytest
+from sigma.collection import SigmaCollection
+from sigma.exceptions import SigmaConfigurationError, SigmaFeatureNotSupportedByBackendError
+from sigma.processing.pipeline import ProcessingPipeline, QueryPostprocessingItem
+from sigma.processing.postprocessing import QuerySimpleTemplateTransformation
+
+from sigma.backends.azure import AzureBackend
+from sigma.pipelines.azure import AzureTableIndex, azure_windows_pipeline
+from sigma.pipelines.azure.azure import azure_table_index
+
+
+def rule_collection(*logsources: str) -> SigmaCollection:
+    return SigmaCollection.from_yaml("\n---\n".join(
+        f"""
+title: Test {i}
+id: 00000000-0000-0000-0000-00000000000{i}
+status: test
+logsource:
+    product: windows
+    {logsource}
+detection:
+    sel:
+        fieldA: value{i}
+    condition: sel
+"""
+        for i, logsource in enumerate(logsources)
+    ))
+
+
+def batch_query(prefix: str, *rules: int) -> str:
+    flags = [f"RuleMatch{index}" for index in range(len(rules))]
+    return "\n| ".join([
+        prefix,
+        "extend " + ", ".join(f'{flag} = (fieldA =~ "value{rule}")' for flag, rule in zip(flags, rules)),
+        "where " + " or ".join(flags),
+        "extend RuleId = pack_array(" + ", ".join(
+            f'iff({flag}, "00000000-0000-0000-0000-00000000000{rule}", "")' for flag, rule in zip(flags, rules)
+        ) + ")",
+        "mv-expand RuleId to typeof(string)",
+        "where isnotempty(RuleId)",
+        "project-away " + ", ".join(flags),
+    ])
+
+
+def test_azure_batch_grouped_by_table():
+    rules = rule_collection("service: security", "category: multi_table", "service: security")
+    pipeline = azure_windows_pipeline(table_index=azure_table_index() + AzureTableIndex.from_dict({"tables": [
+        {"product": "windows", "category": "multi_table", "tables": ["SecurityEvent", "Event"]},
+    ]}))
+    assert AzureBackend(processing_pipeline=pipeline).convert(rules, "batch") == [
+        batch_query("SecurityEvent", 0, 2),
+        batch_query("union withsource=SourceTable SecurityEvent, Event", 1),
+    ]
+
+
+def test_azure_batch_size():
+    rules = rule_collection(*["service: security"] * 3)
+    assert AzureBackend(processing_pipeline=azure_windows_pipeline(), batch_size=2).convert(rules, "batch") == [
+        batch_query("SecurityEvent", 0, 1),
+        batch_query("SecurityEvent", 2),
+    ]
+
+
+def test_azure_batch_time_window():
+    rules = rule_collection("service: security", "service: security")
+    assert AzureBackend(processing_pipeline=azure_windows_pipeline(), time_window="1d").convert(rules, "batch") == [
+        batch_query("SecurityEvent\n| where TimeGenerated > ago(1d)", 0, 1),
+    ]
+
+
+def test_azure_batch_invalid_size():
+    with pytest.raises(SigmaConfigurationError, match="Batch size"):
+        AzureBackend(batch_size=0).convert(rule_collection("service: security"), "batch")
+
+
+def test_azure_batch_cost_budget():
+    # the rule without table mapping exceeds the budget like with the default output format
+    backend = AzureBackend(processing_pipeline=azure_windows_pipeline(), cost_budget=40, collect_errors=True)
+    assert backend.convert(rule_collection("service: security", "category: unmapped"), "batch") == [
+        batch_query("SecurityEvent", 0),
+    ]
+    assert [(rule.title, type(error)) for rule, error in backend.errors] == [("Test 1", SigmaFeatureNotSupportedByBackendError)]
+
+
+def test_azure_batch_postprocessing():
+    pipeline = azure_windows_pipeline() + ProcessingPipeline(postprocessing_items=[
+        QueryPostprocessingItem(QuerySimpleTemplateTransformation("{query}\n| take 10")),
+    ])
+    rules = ("service: security", "service: security")
+    assert AzureBackend(processing_pipeline=pipeline).convert(rule_collection(*rules), "batch") == [
+        'SecurityEvent\n| where fieldA =~ "value0"\n| take 10',
+        'SecurityEvent\n| where fieldA =~ "value1"\n| take 10',
+    ]
+    assert AzureBackend(processing_pipeline=pipeline).convert(rule_collection(*rules)) == [
+        'SecurityEvent\n| where fieldA =~ "value0"\n| take 10',
+        'SecurityEvent\n| where fieldA =~ "value1"\n| take 10',
+    ]
@@ -0,0 +1,109 @@
+import pytest
+from sigma.collection import SigmaCollection
+from sigma.exceptions import SigmaConfigurationError
+from sigma.processing.pipeline import ProcessingItem, ProcessingPipeline
+
+from sigma.backends.azure import AzureBackend
+from sigma.backends.azure.cache import AzureConversionCache, pipeline_fingerprint
+from sigma.pipelines.azure import azure_windows_pipeline
+from sigma.pipelines.azure.azure import AddAzureLogsource
+
+
+def rule(value: str = "valueA", service: str = "security", product: str = "windows") -> SigmaCollection:
+    return SigmaCollection.from_yaml(f"""
+        title: Test
+        status: test
+        logsource:
+            product: {product}
+            service: {service}
+        detection:
+            sel:
+                fieldA: {value}
+            condition: sel
+    """)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return AzureConversionCache(tmp_path / "cache")
+
+
+def test_azure_cache_hit(cache: AzureConversionCache):
+    backend = AzureBackend(processing_pipeline=azure_windows_pipeline(), cache=cache)
+    expected = ['SecurityEvent\n| where fieldA =~ "valueA"']
+    assert backend.convert(rule()) == expected
+    assert (cache.hits, cache.misses) == (0, 1)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("cached rule must not be converted")
+
+    backend.convert_condition = fail
+    assert backend.convert(rule()) == expected
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_azure_cache_persistent(cache: AzureConversionCache):
+    AzureBackend(processing_pipeline=azure_windows_pipeline(), cache=cache).convert(rule())
+    reopened = AzureConversionCache(cache.directory)
+    assert AzureBackend(processing_pipeline=azure_windows_pipeline(), cache=reopened).convert(rule()) == [
+        'SecurityEvent\n| where fieldA =~ "valueA"'
+    ]
+    assert reopened.hits == 1
+
+
+def test_azure_cache_rule_changed(cache: AzureConversionCache):
+    backend = AzureBackend(processing_pipeline=azure_windows_pipeline(), cache=cache)
+    backend.convert(rule())
+    assert backend.convert(rule("valueB")) == ['SecurityEvent\n| where fieldA =~ "valueB"']
+    assert (cache.hits, cache.misses) == (0, 2)
+
+
+def test_azure_cache_pipeline_changed(cache: AzureConversionCache):
+    AzureBackend(processing_pipeline=azure_windows_pipeline(), cache=cache).convert(rule())
+    pipeline = ProcessingPipeline(items=[
+        ProcessingItem(identifier="azure_windows_security", transformation=AddAzureLogsource({'__azure_logsource': 'WindowsEvent'})),
+    ])
+    assert AzureBackend(processing_pipeline=pipeline, cache=cache).convert(rule()) == [
+        'WindowsEvent\n| where fieldA =~ "valueA"'
+    ]
+    assert cache.hits == 0
+
+
+def test_azure_cache_eviction(tmp_path):
+    cache = AzureConversionCache(tmp_path, max_entries=2)
+    backend = AzureBackend(cache=cache)
+    for value in ("value1", "value2", "value1", "value3"):
+        backend.convert(rule(value))
+    assert len(cache) == 2
+    assert cache.statistics == {"entries": 2, "hits": 1, "misses": 3, "evictions": 1}
+    backend.convert(rule("value2"))     # least recently used entry was evicted
+    assert cache.misses == 4
+
+
+def test_pipeline_fingerprint_stable():
+    assert pipeline_fingerprint(azure_windows_pipeline()) == pipeline_fingerprint(azure_windows_pipeline())
+
+
+def test_azure_backend_unknown_option():
+    with pytest.raises(SigmaConfigurationError, match="Unknown Azure backend option"):
+        AzureBackend(unknown=True)
+
+
+def test_azure_cache_bookkeeping_replayed(cache: AzureConversionCache):
+    def bookkeeping():
+        backend = AzureBackend(processing_pipeline=azure_windows_pipeline(), cache=cache)
+        collection = SigmaCollection(rule().rules + rule("valueB", product="unmapped").rules)
+        queries = backend.convert(collection)
+        return queries, (
+            [(rule.title, statistics) for rule, statistics in backend.query_statistics],
+            [rule.title for rule in backend.union_fallback_rules],
+            [(rule.title, unknown_fields) for rule, unknown_fields in backend.unknown_field_rules],
+        )
+
+    cold = bookkeeping()
+    assert (cache.hits, cache.misses) == (0, 2)
+    warm = bookkeeping()
+    assert (cache.hits, cache.misses) == (2, 2)
+    assert warm == cold
+    assert cold[1][1] == ["Test"] and cold[1][2] == [("Test", {"SecurityEvent": ["fieldA"]})]
+    assert [statistics["query_size_bytes"] for _, statistics in cold[1][0]] == [len(query) for query in cold[0]]
@@ -0,0 +1,80 @@
+import pytest
+from sigma.collection import SigmaCollection
+from sigma.exceptions import SigmaFeatureNotSupportedByBackendError
+
+from sigma.backends.azure import AzureBackend
+from sigma.backends.azure.cost import AzureCostModel
+from sigma.pipelines.azure import azure_windows_pipeline
+
+
+def test_azure_cost_estimate():
+    cost = AzureCostModel().estimate(
+        'SecurityEvent\n| where (CommandLine contains "a" or CommandLine has "b") and Image in~ ("x", "y", "z") '
+        'and CommandLine matches regex "a.*b" and CommandLine match "a*b" and ipv4_is_in_range(IpAddress, "10.0.0.0/8")'
+    )
+    assert cost.tables == 1 and not cost.all_tables
+    assert cost.predicates == {"substring": 1, "term": 1, "list": 1, "regex": 1, "match": 1, "cidr": 1}
+    assert (cost.list_values, cost.max_list_size, cost.nesting_depth) == (3, 3, 1)
+    assert cost.breakdown["predicates"] == 4 + 1 + 1 + 20 + 15 + 3
+    assert cost.score == pytest.approx(sum(cost.breakdown.values()))
+
+
+@pytest.mark.parametrize("query,tables,all_tables", [
+    ('union *\n| where fieldA =~ "a"', 50, True),
+    ('union withsource=SourceTable (SecurityEvent\n| where fieldA =~ "a"), (Event\n| where fieldA =~ "a")', 2, False),
+    ('SecurityEvent\n| where fieldA =~ "a"', 1, False),
+])
+def test_azure_cost_tables(query, tables, all_tables):
+    cost = AzureCostModel().estimate(query)
+    assert (cost.tables, cost.all_tables) == (tables, all_tables)
+    assert cost.breakdown["tables"] == tables * 10
+
+
+def test_azure_cost_datatable():
+    cost = AzureCostModel().estimate(
+        'SecurityEvent\n| join kind=leftsemi (datatable(Value:string) ["a", "b", "c", "d"]) on $left.fieldA == $right.Value'
+    )
+    assert cost.predicates["join"] == 1
+    assert (cost.list_values, cost.max_list_size) == (4, 4)
+
+
+def test_azure_cost_model_weights():
+    query = 'union *\n| where fieldA matches regex "a"'
+    assert AzureCostModel(all_tables=10, predicate_weights={"regex": 1.0}).estimate(query).breakdown["predicates"] == 10
+
+
+def rule() -> SigmaCollection:
+    return SigmaCollection.from_yaml("""
+        title: Test
+        id: 5013332f-8a70-4e04-bcc1-06a98a2cca2e
+        status: test
+        logsource:
+            product: windows
+            service: security
+        detection:
+            sel:
+                fieldA|re: 'a.*b'
+            condition: sel
+    """)
+
+
+def test_azure_metadata_output():
+    query = 'SecurityEvent\n| where fieldA matches regex "a.*b"'
+    result = AzureBackend(processing_pipeline=azure_windows_pipeline()).convert(rule(), "metadata")
+    assert result == [{
+        "rule_id": "5013332f-8a70-4e04-bcc1-06a98a2cca2e",
+        "title": "Test",
+        "query": query,
+        "cost": AzureCostModel().estimate(query).to_dict(),
+    }]
+    assert result[0]["cost"]["predicates"] == {"regex": 1}
+
+
+def test_azure_cost_budget():
+    backend = AzureBackend(processing_pipeline=azure_windows_pipeline(), cost_budget=40)
+    assert backend.convert(rule()) == ['SecurityEvent\n| where fieldA matches regex "a.*b"']
+    with pytest.raises(SigmaFeatureNotSupportedByBackendError, match="exceeds the cost budget"):
+        AzureBackend(cost_budget=40).convert(rule())      # union * without table mapping
+    backend = AzureBackend(cost_budget=40, collect_errors=True)
+    assert backend.convert(rule(), "metadata") == []
+    assert len(backend.errors) == 1
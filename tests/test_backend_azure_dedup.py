@@ -0,0 +1,121 @@
+import json
+
+import pytest
+from sigma.collection import SigmaCollection
+from sigma.exceptions import SigmaConfigurationError
+
+from sigma.backends.azure import AzureBackend
+from sigma.backends.azure.dedup import canonicalize_query, deduplicate_queries, query_fingerprint
+from sigma.backends.azure.evaluator import AzureEventTable, AzureQueryEvaluator
+from sigma.backends.azure.stream import main
+from sigma.pipelines.azure import azure_windows_pipeline
+
+
+@pytest.mark.parametrize("first,second", [
+    ('T\n| where A =~ "x" and B == 1', 'T | where B == 1   and A =~ "x"'),
+    ('T\n| where A =~ "X" or (B contains "Y" or C in~ ("b", "a"))', 'T\n| where (C in~ ("A", "b", "a") or A =~ "x") or B contains "y"'),
+    ('T\n| where TimeGenerated > ago(1d)\n| where A in ("b", "a")', 'T\n| where A in ("a", "b") and TimeGenerated > ago(1d)'),
+    ('T\n| where not (A == "x" and A == "x")', 'T\n| where not ((A == "x"))'),
+    ('union withsource=SourceTable (T1\n| where A =~ "x"), (T2\n| where A =~ "x")', 'union withsource=SourceTable (T2 | where A =~ "X"), (T1 | where A =~ "X")'),
+])
+def test_canonicalize_equivalent(first, second):
+    assert canonicalize_query(first) == canonicalize_query(second)
+    assert query_fingerprint(first) == query_fingerprint(second)
+
+
+@pytest.mark.parametrize("first,second", [
+    ('T\n| where A == "x"', 'T\n| where A == "X"'),
+    ('T\n| where A contains_cs "x"', 'T\n| where A contains_cs "X"'),
+    ('T\n| where A in ("x")', 'T\n| where A in ("X")'),
+    ('T\n| where A =~ "x" and B =~ "y"', 'T\n| where A =~ "x" or B =~ "y"'),
+    ('T\n| where A =~ "x"\n| summarize count() by B\n| where count_ > 1', 'T\n| where count_ > 1\n| summarize count() by B\n| where A =~ "x"'),
+    ('T1\n| where A =~ "x"', 'T2\n| where A =~ "x"'),
+])
+def test_canonicalize_different(first, second):
+    assert canonicalize_query(first) != canonicalize_query(second)
+
+
+def test_deduplicate_queries():
+    result = deduplicate_queries([
+        ("1", 'T\n| where A =~ "x" and B =~ "y"'),
+        ("2", 'T\n| where B =~ "Y" and A =~ "X"'),
+        ("3", 'T\n| where A =~ "z"'),
+        ("4", {"query": 'T\n| where A =~ "x" and B =~ "y"'}),
+    ])
+    assert [(group.query, group.rule_ids) for group in result.groups] == [
+        ('T\n| where A =~ "x" and B =~ "y"', ["1", "2", "4"]),
+        ('T\n| where A =~ "z"', ["3"]),
+    ]
+    assert (result.queries, result.unique, result.ratio) == (4, 2, 0.5)
+    assert deduplicate_queries([]).ratio == 0.0
+
+
+def rule_yaml(rule_id: str, detection: str) -> str:
+    return f"""
+title: Rule {rule_id}
+id: 00000000-0000-0000-0000-00000000000{rule_id}
+status: test
+logsource:
+    category: process_creation
+    product: windows
+detection:
+{detection}
+"""
+
+
+def rule(rule_id: str, detection: str) -> SigmaCollection:
+    return SigmaCollection.from_yaml(rule_yaml(rule_id, detection))
+
+
+rules = [
+    ("1", """
+            sel:
+                CommandLine|contains: [whoami, hostname]
+                Image|endswith: '\\cmd.exe'
+            condition: sel"""),
+    ("2", """
+            sel:
+                Image|endswith: '\\CMD.EXE'
+            sel2:
+                CommandLine|contains: [hostname, whoami]
+            condition: sel2 and sel"""),
+    ("3", """
+            sel:
+                CommandLine|contains: [whoami, hostname]
+            condition: sel"""),
+]
+
+
+def test_azure_convert_deduplicated():
+    collection = SigmaCollection([r for rule_id, detection in rules for r in rule(rule_id, detection).rules])
+    backend = AzureBackend(azure_windows_pipeline(), value_list_optimization=True)
+    result = backend.convert_deduplicated(collection)
+    assert [group.rule_ids for group in result.groups] == [
+        ["00000000-0000-0000-0000-000000000001", "00000000-0000-0000-0000-000000000002"],
+        ["00000000-0000-0000-0000-000000000003"],
+    ]
+    table = AzureEventTable.from_events("SecurityEvent", [
+        {"EventID": 4688, "CommandLine": "WHOAMI /all", "NewProcessName": "C:\\cmd.exe"},
+        {"EventID": 4688, "CommandLine": "hostname", "NewProcessName": "C:\\Cmd.exe"},
+        {"EventID": 4688, "CommandLine": "whoami", "NewProcessName": "C:\\x.exe"},
+    ])
+    evaluator = AzureQueryEvaluator([table])
+    grouped = backend.convert(rule(*rules[1]))[0]     # differs from the query of the group, but is equivalent
+    assert grouped != result.groups[0].query
+    assert evaluator.evaluate(result.groups[0].query).matches == evaluator.evaluate(grouped).matches == {"SecurityEvent": [0, 1]}
+    assert evaluator.evaluate(result.groups[1].query).matches == {"SecurityEvent": [0, 1, 2]}
+
+
+def test_azure_convert_deduplicated_batch():
+    with pytest.raises(SigmaConfigurationError, match="batch"):
+        AzureBackend().convert_deduplicated(rule(*rules[0]), "batch")
+
+
+def test_azure_convert_deduplicated_main(tmp_path, capsys):
+    for rule_id, detection in rules:
+        (tmp_path / f"rule{rule_id}.yml").write_text(rule_yaml(rule_id, detection))
+    output = tmp_path / "queries.json"
+    assert main(["-p", "azure_windows_pipeline", "--deduplicate", "-o", str(output), str(tmp_path)]) == 0
+    document = json.loads(output.read_text())
+    assert (document["queries"], document["unique"]) == (3, 2)
+    assert "3 queries into 2 (33.3% removed), 0 rules failed" in capsys.readouterr().err
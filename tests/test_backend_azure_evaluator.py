@@ -0,0 +1,107 @@
+from datetime import datetime
+
+import pytest
+from sigma.collection import SigmaCollection
+
+from sigma.backends.azure import AzureBackend
+from sigma.backends.azure.evaluator import AzureEventTable, AzureQueryEvaluationError, AzureQueryEvaluator, parse_query
+from sigma.pipelines.azure import azure_windows_pipeline
+
+
+@pytest.fixture
+def evaluator():
+    return AzureQueryEvaluator([
+        AzureEventTable.from_events("SecurityEvent", [
+            {"EventID": 4688, "CommandLine": "C:\\Windows\\cmd.exe /c whoami", "IpAddress": "10.1.2.3", "TimeGenerated": datetime(2024, 1, 1, 10)},
+            {"EventID": 4624, "CommandLine": "powershell -enc abc", "IpAddress": "8.8.8.8", "TimeGenerated": datetime(2024, 1, 3)},
+            {"EventID": "4688", "CommandLine": None, "IpAddress": "-"},
+        ]),
+        AzureEventTable.from_events("Event", [
+            {"EventID": 7045, "ImagePath": "C:\\Temp\\evil.exe"},
+        ]),
+    ], now=datetime(2024, 1, 3, 12))
+
+
+@pytest.mark.parametrize("predicate,expected", [
+    ('EventID =~ "4688"', [0, 2]),
+    ("EventID =~ 4688", [0, 2]),
+    ('CommandLine contains "CMD"', [0]),
+    ('CommandLine casematch_contains "CMD"', []),
+    ('CommandLine startswith "power" or CommandLine endswith "WHOAMI"', [0, 1]),
+    ('not (CommandLine startswith "power")', [0, 2]),
+    ('CommandLine has "enc"', [1]),
+    ('CommandLine has "en"', []),
+    ('CommandLine hasprefix "who"', [0]),
+    ('CommandLine has_any ("abc", "whoami")', [0, 1]),
+    ('CommandLine in~ ("POWERSHELL -ENC ABC")', [1]),
+    ('CommandLine in ("POWERSHELL -ENC ABC")', []),
+    (r'CommandLine matches regex "(?i)^c:\\\\windows\\\\"', [0]),
+    ('CommandLine match "c:\\\\win*\\\\cmd.exe*"', [0]),
+    ('(CommandLine startswith "C:" and strlen(CommandLine) > 20)', [0]),
+    ('ipv4_is_in_range(IpAddress, "10.0.0.0/8")', [0]),
+    ("CommandLine is null", [2]),
+    ("exists(TimeGenerated) and notexists(ImagePath)", [0, 1]),
+    ('["*"] contains "8.8"', [1]),
+    ("TimeGenerated > ago(1d)", [1]),
+    ("TimeGenerated between (datetime(2024-01-01) .. datetime(2024-01-02T12:00:00))", [0]),
+])
+def test_azure_evaluator_predicates(evaluator, predicate, expected):
+    assert evaluator.evaluate("SecurityEvent\n| where " + predicate).matches == {"SecurityEvent": expected}
+
+
+def test_azure_evaluator_statistics(evaluator):
+    result = evaluator.evaluate('SecurityEvent\n| where EventID =~ 4688\n| where CommandLine contains "cmd" or CommandLine contains "enc"')
+    assert result.matches == {"SecurityEvent": [0]}
+    assert [(statistics.predicate, statistics.evaluated, statistics.matched) for statistics in result.predicates] == [
+        ("EventID =~ 4688", 3, 2),
+        ('CommandLine contains "cmd"', 2, 1),
+        ('CommandLine contains "enc"', 1, 0),
+    ]
+    assert result.predicates[0].selectivity == 2 / 3
+    assert result.rows_scanned == 3 and result.count == 1
+
+
+def test_azure_evaluator_union(evaluator):
+    result = evaluator.evaluate('union *\n| where EventID =~ 7045 or CommandLine has "abc"')
+    assert result.matches == {"SecurityEvent": [1], "Event": [0]}
+    assert result.rows_scanned == 4
+    result = evaluator.evaluate(
+        'union withsource=SourceTable (SecurityEvent\n| where EventID =~ 4624), (Event\n| where ImagePath endswith ".exe")\n| project EventID'
+    )
+    assert list(result.events()) == [
+        {"EventID": 4624, "SourceTable": "SecurityEvent"},
+        {"EventID": 7045, "SourceTable": "Event"},
+    ]
+
+
+@pytest.mark.parametrize("query", [
+    "SecurityEvent\n| summarize count() by Computer",
+    'SecurityEvent\n| where EventID =~',
+    'SecurityEvent\n| where EventID matches regex "("',
+    "Unknown\n| where EventID =~ 1",
+])
+def test_azure_evaluator_errors(evaluator, query):
+    with pytest.raises(AzureQueryEvaluationError):
+        evaluator.evaluate(query)
+
+
+def test_azure_evaluator_backend_queries(evaluator):
+    rule = SigmaCollection.from_yaml(r"""
+        title: Test
+        status: test
+        logsource:
+            product: windows
+            category: process_creation
+        detection:
+            sel:
+                CommandLine|contains|all:
+                    - '\cmd.exe'
+                    - 'who'
+            filter:
+                IpAddress|cidr: 8.8.0.0/16
+            condition: sel and not filter
+    """)
+    query = AzureBackend(processing_pipeline=azure_windows_pipeline()).convert(rule)[0]
+    result = evaluator.evaluate(query)
+    assert result.matches == {"SecurityEvent": [0]}
+    assert len(result.predicates) == len(list(parse_query(query).predicates())) == 4
@@ -0,0 +1,99 @@
+import json
+
+import pytest
+from sigma.exceptions import SigmaConfigurationError
+
+from sigma.backends.azure import AzureBackend
+from sigma.backends.azure.stream import main
+from sigma.pipelines.azure import azure_windows_pipeline
+from sigma.pipelines.azure.azure import azure_table_index, azure_windows_service_map, build_azure_windows_pipeline
+from sigma.pipelines.azure.schema import AzureSchema
+
+
+def write_rule(path, value: str, service: str):
+    path.write_text(f"""
+title: Test
+status: test
+logsource:
+    product: windows
+    service: {service}
+detection:
+    sel:
+        fieldA: {value}
+    condition: sel
+""")
+
+
+@pytest.fixture
+def rules(tmp_path):
+    directory = tmp_path / "rules"
+    directory.mkdir()
+    write_rule(directory / "security.yml", "valueA", "security")
+    write_rule(directory / "sysmon.yml", "valueB", "sysmon")
+    write_rule(directory / "removed.yml", "valueC", "powershell")
+    return directory
+
+
+def key(rules, name: str) -> str:
+    return f"{rules / name}#0"
+
+
+def test_azure_incremental_build(rules, tmp_path):
+    manifest = tmp_path / "manifest.json"
+    backend = AzureBackend(processing_pipeline=azure_windows_pipeline())
+    diff = backend.convert_incremental([rules], manifest)
+    assert sorted(diff.added) == [key(rules, "removed.yml"), key(rules, "security.yml"), key(rules, "sysmon.yml")]
+    assert diff.converted == 3
+
+    diff = backend.convert_incremental([rules], manifest)
+    assert (diff.added, diff.changed, diff.removed, diff.unchanged, diff.converted) == ({}, {}, {}, 3, 0)
+
+    write_rule(rules / "security.yml", "valueD", "security")
+    (rules / "removed.yml").unlink()
+    write_rule(rules / "new.yml", "valueE", "security")
+    diff = backend.convert_incremental([rules], manifest)
+    assert diff.added == {key(rules, "new.yml"): ['SecurityEvent\n| where fieldA =~ "valueE"']}
+    assert diff.changed == {key(rules, "security.yml"): ['SecurityEvent\n| where fieldA =~ "valueD"']}
+    assert diff.removed == {key(rules, "removed.yml"): [
+        'Event\n| where EventData has "valueC"\n| extend fieldA = extract(\'<Data Name="fieldA">([^<]*)<\', 1, EventData)\n'
+        '| where fieldA =~ "valueC"'
+    ]}
+    assert (diff.unchanged, diff.converted) == (1, 2)
+
+
+def test_azure_incremental_build_pipeline_changed(rules, tmp_path, monkeypatch):
+    manifest = tmp_path / "manifest.json"
+    AzureBackend(processing_pipeline=azure_windows_pipeline()).convert_incremental([rules], manifest)
+
+    monkeypatch.setitem(azure_windows_service_map, "security", "WindowsEvent")
+    pipeline = build_azure_windows_pipeline(azure_table_index(), AzureSchema.default())
+    diff = AzureBackend(processing_pipeline=pipeline).convert_incremental([rules], manifest)
+    assert diff.changed == {key(rules, "security.yml"): ['WindowsEvent\n| where fieldA =~ "valueA"']}
+    assert (diff.unchanged, diff.converted) == (2, 1)
+
+
+def test_azure_incremental_build_backend_changed(rules, tmp_path):
+    manifest = tmp_path / "manifest.json"
+    AzureBackend(processing_pipeline=azure_windows_pipeline()).convert_incremental([rules], manifest)
+    diff = AzureBackend(processing_pipeline=azure_windows_pipeline(), time_window="1d").convert_incremental([rules], manifest)
+    assert diff.converted == 3
+    assert len(diff.added) == 3
+
+
+def test_azure_incremental_build_errors(rules, tmp_path):
+    (rules / "broken.yml").write_text("title: [")
+    diff = AzureBackend().convert_incremental([rules], tmp_path / "manifest.json")
+    assert list(diff.errors) == [str(rules / "broken.yml")]
+
+
+def test_azure_incremental_build_batch(rules, tmp_path):
+    with pytest.raises(SigmaConfigurationError, match="batch"):
+        AzureBackend().convert_incremental([rules], tmp_path / "manifest.json", "batch")
+
+
+def test_azure_incremental_build_main(rules, tmp_path):
+    manifest, output = tmp_path / "manifest.json", tmp_path / "diff.json"
+    assert main(["-p", "azure_windows_pipeline", "--manifest", str(manifest), "-o", str(output), str(rules)]) == 0
+    assert len(json.loads(output.read_text())["added"]) == 3
+    assert main(["-p", "azure_windows_pipeline", "--manifest", str(manifest), "-o", str(output), str(rules)]) == 0
+    assert json.loads(output.read_text())["unchanged"] == 3
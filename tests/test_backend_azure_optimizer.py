@@ -0,0 +1,127 @@
+import itertools
+
+import pytest
+from sigma.collection import SigmaCollection
+
+from sigma.backends.azure import AzureBackend
+from sigma.backends.azure.evaluator import AzureEventTable, AzureQueryEvaluator
+from sigma.pipelines.azure import azure_windows_pipeline
+
+
+def rule(condition: str) -> SigmaCollection:
+    return SigmaCollection.from_yaml(f"""
+        title: Test
+        status: test
+        logsource:
+            category: test_category
+            product: test_product
+        detection:
+            sel1:
+                fieldA: valueA
+                fieldB|contains: abc
+            sel2:
+                fieldA: valueA
+                fieldB|contains: abcd
+            sel3:
+                fieldA: valueA
+                fieldC: valueC
+            sel4:
+                fieldC: valueC1
+            sel5:
+                fieldC: valueC2
+            filter:
+                fieldD: valueD
+            condition: {condition}
+    """)
+
+
+def convert(condition: str, optimize: bool = True, **options) -> str:
+    return AzureBackend(condition_optimization=optimize, **options).convert(rule(condition))[0]
+
+
+@pytest.mark.parametrize("condition,expected", [
+    ("sel1 and sel1", 'fieldA =~ "valueA" and fieldB contains "abc"'),
+    ("sel1 and (filter and sel4)", 'fieldA =~ "valueA" and fieldB contains "abc" and fieldD =~ "valueD" and fieldC =~ "valueC1"'),
+    ("not not filter", 'fieldD =~ "valueD"'),
+    ("sel1 or sel3", 'fieldA =~ "valueA" and (fieldB contains "abc" or fieldC =~ "valueC")'),
+    ("sel1 or sel2", 'fieldA =~ "valueA" and fieldB contains "abc"'),
+    ("sel1 and sel2", 'fieldA =~ "valueA" and fieldB contains "abcd"'),
+    ("filter and (filter or sel1)", 'fieldD =~ "valueD"'),
+    ("sel4 or filter or sel5", 'fieldC =~ "valueC1" or fieldD =~ "valueD" or fieldC =~ "valueC2"'),
+])
+def test_azure_condition_optimization(condition, expected):
+    assert convert(condition) == "union *\n| where " + expected
+
+
+def test_azure_condition_optimization_value_lists():
+    backend = AzureBackend(condition_optimization=True, value_list_optimization=True)
+    assert backend.convert(rule("sel4 or filter or sel5")) == [
+        'union *\n| where (fieldC in~ ("valueC1", "valueC2")) or fieldD =~ "valueD"'
+    ]
+
+
+def test_azure_condition_optimization_value_lists_typed():
+    # numbers of typed columns are grouped into in, strings into in~ and case-sensitive strings into in
+    backend = AzureBackend(azure_windows_pipeline(), condition_optimization=True, value_list_optimization=True)
+    assert backend.convert(SigmaCollection.from_yaml("""
+        title: Test
+        status: test
+        logsource:
+            product: windows
+            service: security
+        detection:
+            sel1:
+                LogonType: 2
+            sel2:
+                LogonType: 3
+            sel3:
+                LogonType: 'abc'
+            sel4:
+                LogonTypeName: Interactive
+            sel5:
+                LogonTypeName|cased: Network
+            sel6:
+                LogonTypeName: Batch
+            sel7:
+                LogonTypeName|cased: Service
+            condition: 1 of sel*
+    """)) == [
+        'SecurityEvent\n| where ((LogonType in (2, 3)) or LogonType =~ "abc" or '
+        '(LogonTypeName in~ ("Batch", "Interactive")) or (LogonTypeName in ("Network", "Service")))'
+    ]
+
+
+def test_azure_condition_optimization_disabled():
+    assert convert("sel1 and sel1", optimize=False) == (
+        'union *\n| where (fieldA =~ "valueA" and fieldB contains "abc") and (fieldA =~ "valueA" and fieldB contains "abc")'
+    )
+
+
+def test_azure_condition_optimization_statistics():
+    backend = AzureBackend(condition_optimization=True)
+    backend.convert(rule("sel1 or sel2 or sel3"))
+    statistics = backend.query_statistics[0][1]
+    assert statistics["condition_subsumed"] == 1 and statistics["condition_factored"] == 1
+
+
+@pytest.mark.parametrize("condition", [
+    "1 of sel*",
+    "all of sel*",
+    "(sel1 or sel2) and not (sel3 or not filter)",
+    "(sel1 and filter) or (sel2 and filter) or (sel4 and filter)",
+    "(sel4 or sel5 or filter) and not not sel3",
+    "sel1 and (sel1 or sel4) and not (sel2 and sel2)",
+])
+@pytest.mark.parametrize("value_list_optimization", [False, True])
+def test_azure_condition_optimization_equivalent(condition, value_list_optimization):
+    values = {
+        "fieldA": ("valueA", "other"),
+        "fieldB": ("xabcdx", "xabcx", "x"),
+        "fieldC": ("valueC", "valueC1", "VALUEC2", None),
+        "fieldD": ("valueD", None),
+    }
+    events = [dict(zip(values, combination)) for combination in itertools.product(*values.values())]
+    evaluator = AzureQueryEvaluator([AzureEventTable.from_events("Events", events)])
+    optimized, plain = (convert(condition, optimize, value_list_optimization=value_list_optimization) for optimize in (True, False))
+    assert len(optimized) <= len(plain)
+    assert evaluator.evaluate(optimized).matches == evaluator.evaluate(plain).matches
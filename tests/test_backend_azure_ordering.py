@@ -0,0 +1,120 @@
+import json
+
+import pytest
+from sigma.collection import SigmaCollection
+
+from sigma.backends.azure import AzureBackend
+from sigma.backends.azure.cache import backend_fingerprint
+from sigma.backends.azure.evaluator import AzureEventTable, AzureQueryEvaluator
+from sigma.backends.azure.ordering import AzureFieldSelectivity, main
+from sigma.pipelines.azure import azure_windows_pipeline
+
+
+def rule(condition: str = "sel") -> SigmaCollection:
+    return SigmaCollection.from_yaml(f"""
+        title: Test
+        status: test
+        logsource:
+            category: process_creation
+            product: windows
+        detection:
+            sel:
+                CommandLine|re: 'a.*b'
+                Image|endswith: '\\cmd.exe'
+                ParentImage|startswith: 'C:\\Windows'
+                User: SYSTEM
+            filter:
+                CommandLine|contains: debug
+                LogonId: 999
+            condition: {condition}
+    """)
+
+
+def convert(condition: str = "sel", **options) -> str:
+    return AzureBackend(azure_windows_pipeline(), predicate_ordering=True, **options).convert(rule(condition))[0]
+
+
+def test_azure_predicate_ordering():
+    assert convert() == (
+        'SecurityEvent\n| where EventID == 4688 and ((Account =~ "SYSTEM" and ParentProcessName startswith "C:\\Windows" '
+        'and NewProcessName endswith "\\cmd.exe" and CommandLine matches regex "a.*b"))'
+    )
+
+
+def test_azure_predicate_ordering_flattened():
+    assert convert("sel and not filter", condition_optimization=True) == (
+        'SecurityEvent\n| where EventID == 4688 and Account =~ "SYSTEM" and ParentProcessName startswith "C:\\Windows" '
+        'and NewProcessName endswith "\\cmd.exe" and (not (LogonID =~ 999 and CommandLine contains "debug")) '
+        'and CommandLine matches regex "a.*b"'
+    )
+
+
+def test_azure_predicate_ordering_disabled():
+    assert AzureBackend(azure_windows_pipeline()).convert(rule())[0] == (
+        'SecurityEvent\n| where EventID == 4688 and ((CommandLine matches regex "a.*b" and NewProcessName endswith "\\cmd.exe" '
+        'and ParentProcessName startswith "C:\\Windows" and Account =~ "SYSTEM"))'
+    )
+
+
+def test_azure_predicate_ordering_selectivity(tmp_path):
+    path = tmp_path / "selectivity.yml"
+    path.write_text("fields:\n  LogonID: 0.5\n  Account: 0.01\n")
+    assert convert("filter and sel", condition_optimization=True, field_selectivity=str(path)).startswith(
+        'SecurityEvent\n| where EventID == 4688 and Account =~ "SYSTEM" and LogonID =~ 999 and '
+    )
+
+
+def test_azure_predicate_ordering_statistics():
+    backend = AzureBackend(azure_windows_pipeline(), predicate_ordering=True)
+    backend.convert(rule())
+    assert backend.query_statistics[0][1]["reordered_conditions"] == 1
+
+
+def test_azure_field_selectivity_from_table(tmp_path):
+    table = AzureEventTable.from_events("SecurityEvent", [
+        {"EventID": 4688, "Account": "SYSTEM"},
+        {"EventID": 4688, "Account": "system"},
+        {"EventID": 4624, "Account": "alice"},
+        {"EventID": 4688},
+    ])
+    selectivity = AzureFieldSelectivity.from_table(table)
+    assert selectivity.fields == {"EventID": 10 / 16, "Account": 5 / 16}
+    assert selectivity.get("Image") == 1.0
+
+    path = tmp_path / "selectivity.json"
+    selectivity.to_file(path)
+    assert AzureFieldSelectivity.from_file(path) == selectivity
+
+
+def test_azure_field_selectivity_cli(tmp_path):
+    events = tmp_path / "events.jsonl"
+    events.write_text("\n".join(json.dumps({"User": user}) for user in ("a", "a", "b", "c")))
+    output = tmp_path / "selectivity.json"
+    main([str(events), "-o", str(output)])
+    assert json.loads(output.read_text()) == {"fields": {"User": 6 / 16}}
+
+
+def test_azure_field_selectivity_invalid_file(tmp_path):
+    path = tmp_path / "selectivity.yml"
+    path.write_text("- User\n")
+    with pytest.raises(ValueError, match="fields"):
+        AzureBackend(predicate_ordering=True, field_selectivity=path)
+
+
+def test_azure_field_selectivity_fingerprint():
+    assert backend_fingerprint(AzureBackend(field_selectivity=AzureFieldSelectivity({"User": 0.1}))) != \
+        backend_fingerprint(AzureBackend(field_selectivity=AzureFieldSelectivity({"User": 0.2})))
+
+
+@pytest.mark.parametrize("condition", ["sel", "sel and not filter", "sel or filter", "filter and (sel or filter)"])
+def test_azure_predicate_ordering_equivalent(condition):
+    table = AzureEventTable.from_events("SecurityEvent", [
+        {"EventID": 4688, "Account": "SYSTEM", "NewProcessName": "C:\\Windows\\cmd.exe", "ParentProcessName": "C:\\Windows\\explorer.exe", "CommandLine": "a to b", "LogonID": 999},
+        {"EventID": 4688, "Account": "system", "NewProcessName": "C:\\cmd.exe", "ParentProcessName": "C:\\Windows\\x.exe", "CommandLine": "abc debug", "LogonID": 1},
+        {"EventID": 4624, "Account": "SYSTEM", "NewProcessName": "C:\\Windows\\cmd.exe", "ParentProcessName": "C:\\Windows\\y.exe", "CommandLine": "ab", "LogonID": 999},
+        {"EventID": 4688, "Account": "alice", "CommandLine": "debug", "LogonID": 999},
+    ])
+    evaluator = AzureQueryEvaluator([table])
+    ordered = evaluator.evaluate(convert(condition, condition_optimization=True))
+    plain = evaluator.evaluate(AzureBackend(azure_windows_pipeline()).convert(rule(condition))[0])
+    assert ordered.matches == plain.matches
@@ -0,0 +1,77 @@
+import pytest
+from sigma.collection import SigmaCollection
+from sigma.exceptions import SigmaValueError
+
+from sigma.backends.azure import AzureBackend
+from sigma.backends.azure.cache import AzureConversionCache
+from sigma.backends.azure.parallel import chunk_rules
+from sigma.pipelines.azure import azure_windows_pipeline
+
+
+def rule_collection(count: int, broken=(), unmapped=()) -> SigmaCollection:
+    return SigmaCollection.from_yaml("\n---\n".join(
+        f"""
+title: Test {i}
+status: test
+logsource:
+    product: {'unmapped' if i in unmapped else 'windows'}
+    service: security
+detection:
+    sel:
+        {'- true' if i in broken else f'fieldA: value{i}'}
+    condition: sel
+"""
+        for i in range(count)
+    ))
+
+
+def test_chunk_rules():
+    assert chunk_rules(10, 2) == [(0, 2), (2, 4), (4, 6), (6, 8), (8, 10)]
+    assert chunk_rules(5, 2, chunk_size=3) == [(0, 3), (3, 5)]
+    assert chunk_rules(0, 4) == []
+
+
+def test_chunk_rules_invalid_size():
+    with pytest.raises(ValueError):
+        chunk_rules(10, 2, chunk_size=0)
+
+
+@pytest.mark.parametrize("processes", [1, 3])
+def test_azure_convert_bulk_order(processes):
+    results = AzureBackend(processing_pipeline=azure_windows_pipeline()).convert_bulk(
+        rule_collection(20), processes=processes, chunk_size=3,
+    )
+    assert [result.queries for result in results] == [
+        [f'SecurityEvent\n| where fieldA =~ "value{i}"'] for i in range(20)
+    ]
+    assert all(result.success for result in results)
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_azure_convert_bulk_errors(processes):
+    backend = AzureBackend(collect_errors=True)
+    results = backend.convert_bulk(rule_collection(4, broken={2}), processes=processes)
+    assert [result.rule.title for result in results] == ["Test 0", "Test 1", "Test 2", "Test 3"]
+    assert [result.success for result in results] == [True, True, False, True]
+    assert isinstance(results[2].error, SigmaValueError)
+    assert results[2].queries == []
+    assert backend.errors == [(results[2].rule, results[2].error)]
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_azure_convert_bulk_bookkeeping(tmp_path, processes):
+    collection = rule_collection(4, unmapped={1})
+    backend = AzureBackend(processing_pipeline=azure_windows_pipeline(), cache=AzureConversionCache(tmp_path))
+    results = backend.convert_bulk(collection, processes=processes)
+    assert all(isinstance(result.statistics[0]["query_size_bytes"], int) for result in results)
+    assert [result.union_fallback for result in results] == [False, True, False, False]
+    assert [rule for rule, _ in backend.query_statistics] == collection.rules
+    assert backend.union_fallback_rules == [collection.rules[1]]
+    assert backend.unknown_field_rules == [(collection.rules[i], {"SecurityEvent": ["fieldA"]}) for i in (0, 2, 3)]
+    assert backend.cache.statistics == {"entries": 4, "hits": 0, "misses": 4, "evictions": 0}
+
+    warm = AzureBackend(processing_pipeline=azure_windows_pipeline(), cache=backend.cache)
+    assert [result.queries for result in warm.convert_bulk(rule_collection(4, unmapped={1}), processes=processes)] == [
+        result.queries for result in results
+    ]
+    assert backend.cache.statistics == {"entries": 4, "hits": 4, "misses": 4, "evictions": 0}
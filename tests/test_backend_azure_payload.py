@@ -0,0 +1,137 @@
+import json
+from xml.sax.saxutils import escape
+
+import pytest
+from sigma.collection import SigmaCollection
+
+from sigma.backends.azure import AzureBackend
+from sigma.backends.azure.evaluator import AzureEventTable, AzureQueryEvaluator
+from sigma.pipelines.azure import AzureSchema, azure_windows_pipeline
+
+
+def rule(detection: str, condition: str = "sel", service: str = "powershell") -> SigmaCollection:
+    return SigmaCollection.from_yaml(f"""
+        title: Test
+        status: test
+        logsource:
+            product: windows
+            service: {service}
+        detection:
+{detection}
+            condition: {condition}
+    """)
+
+
+detection = """
+            sel:
+                EventID: 4104
+                ScriptBlockText|contains: Invoke-Mimikatz
+            sel2:
+                Path|endswith: '\\evil.ps1'
+                ScriptBlockText: whoami
+            id:
+                EventID: 4103
+            filter:
+                ScriptBlockText|contains: benign
+"""
+
+extend = 'extend ScriptBlockText = extract(\'<Data Name="ScriptBlockText">([^<]*)<\', 1, EventData)'
+
+
+def test_azure_payload_xml():
+    backend = AzureBackend(azure_windows_pipeline())
+    assert backend.convert(rule(detection, "(sel or sel2) and not filter")) == [
+        'Event\n| where (EventData contains "Invoke-Mimikatz" or EventData contains "\\evil.ps1" and EventData has "whoami")\n'
+        '| ' + extend + ', Path = extract(\'<Data Name="Path">([^<]*)<\', 1, EventData)\n'
+        '| where (((EventID == 4104 and ScriptBlockText contains "Invoke-Mimikatz") or '
+        '(Path endswith "\\evil.ps1" and ScriptBlockText =~ "whoami")) and (not ScriptBlockText contains "benign"))'
+    ]
+    assert backend.query_statistics[0][1]["payload_fields"] == 2
+    assert backend.query_statistics[0][1]["payload_prefilters"] == 3
+
+
+def test_azure_payload_without_prefilter():
+    assert AzureBackend(azure_windows_pipeline()).convert(rule(detection, "sel or id")) == [
+        'Event\n| ' + extend + '\n'
+        '| where ((EventID == 4104 and ScriptBlockText contains "Invoke-Mimikatz") or EventID == 4103)'
+    ]
+
+
+@pytest.mark.parametrize("value", ["'<script>'", "'*a&b*'", "'ab'"])
+def test_azure_payload_prefilter_skipped_literals(value):
+    assert AzureBackend(azure_windows_pipeline()).convert(rule(f"""
+            sel:
+                ScriptBlockText: {value}
+    """))[0].startswith('Event\n| ' + extend + '\n')
+
+
+def test_azure_payload_no_payload_fields():
+    assert AzureBackend(azure_windows_pipeline()).convert(rule(detection, "id")) == ['Event\n| where EventID == 4103']
+
+
+json_schema = AzureSchema.from_dict({"tables": {"Event": {
+    "columns": {"EventID": "int", "EventData": "string"},
+    "payload": {"column": "EventData", "format": "json"},
+}}})
+
+
+def test_azure_payload_json():
+    assert AzureBackend(azure_windows_pipeline(schema=json_schema)).convert(rule(detection, "sel2")) == [
+        'Event\n| where EventData has "whoami"\n'
+        "| extend AzurePayload = parse_json(EventData), ScriptBlockText = tostring(AzurePayload['ScriptBlockText']), "
+        "Path = tostring(AzurePayload['Path'])\n"
+        '| where (Path endswith "\\evil.ps1" and ScriptBlockText =~ "whoami")'
+    ]
+
+
+def xml(**fields) -> str:
+    return "<EventData>" + "".join(f'<Data Name="{name}">{value}</Data>' for name, value in fields.items()) + "</EventData>"
+
+
+events = [
+    {"EventID": 4104, "ScriptBlockText": "Invoke-Mimikatz -DumpCreds", "Path": "C:\\a.ps1"},
+    {"EventID": 4104, "ScriptBlockText": "Invoke-Mimikatz benign", "Path": "C:\\a.ps1"},
+    {"EventID": 4103, "ScriptBlockText": "WHOAMI", "Path": "C:\\evil.ps1"},
+    {"EventID": 4103, "ScriptBlockText": "whoami /all", "Path": "C:\\evil.ps1"},
+    {"EventID": 4103, "ScriptBlockText": "Get-Process"},
+    {"EventID": 4104},
+]
+
+
+@pytest.mark.parametrize("condition,expected", [
+    ("(sel or sel2) and not filter", [0, 2]),
+    ("sel or id", [0, 1, 2, 3, 4]),
+    ("sel2 and id", [2]),
+])
+@pytest.mark.parametrize("payload_format", ["xml", "json"])
+def test_azure_payload_evaluation(condition, expected, payload_format):
+    pipeline = azure_windows_pipeline(schema=json_schema) if payload_format == "json" else azure_windows_pipeline()
+    table = AzureEventTable.from_events("Event", [
+        {
+            "EventID": event["EventID"],
+            "EventData": json.dumps(fields) if payload_format == "json" else xml(**fields),
+        }
+        for event in events
+        for fields in [{name: value for name, value in event.items() if name != "EventID"}]
+    ])
+    query = AzureBackend(pipeline).convert(rule(detection, condition))[0]
+    assert AzureQueryEvaluator([table]).evaluate(query).matches == {"Event": expected}
+
+
+@pytest.mark.parametrize("value,expected", [
+    ("'*a&b*'", [0]),
+    ("'<script>'", [1]),
+    ("'*\"quoted\" <x>'", [2]),
+    ("'a&amp;b'", [3]),
+])
+def test_azure_payload_xml_entities(value, expected):
+    # values are compared with the escaped text of the payload, the extracted values aren't decoded
+    table = AzureEventTable.from_events("Event", [
+        {"EventID": 4104, "EventData": xml(ScriptBlockText=escape(text, {'"': "&quot;"}))}
+        for text in ("x a&b y", "<script>", 'say "quoted" <x>', "a&amp;b")
+    ])
+    query = AzureBackend(azure_windows_pipeline()).convert(rule(f"""
+            sel:
+                ScriptBlockText: {value}
+    """))[0]
+    assert AzureQueryEvaluator([table]).evaluate(query).matches == {"Event": expected}
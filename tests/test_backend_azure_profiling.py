@@ -0,0 +1,85 @@
+import json
+
+import pytest
+from sigma.collection import SigmaCollection
+
+from sigma.backends.azure import AzureBackend
+from sigma.backends.azure.profiling import AzureConversionProfile, AzureRuleTiming
+from sigma.backends.azure.stream import main
+from sigma.pipelines.azure import azure_windows_pipeline
+
+
+def rules(count: int) -> SigmaCollection:
+    return SigmaCollection.from_yaml("\n---\n".join(f"""
+title: Rule {i}
+status: test
+logsource:
+    product: windows
+    service: security
+detection:
+    sel:
+        fieldA: value{i}
+        'field {i}': value
+    condition: sel
+""" for i in range(count)))
+
+
+def test_azure_profile():
+    profile = AzureConversionProfile(slowest_rules_count=2)
+    backend = AzureBackend(processing_pipeline=azure_windows_pipeline(), profile=profile)
+    assert len(backend.convert(rules(3))) == 3
+
+    assert {stage: timing.calls for stage, timing in profile.stages.items()} == {
+        "pipeline": 3,
+        "convert_condition": 3,
+        "escape_and_quote_field": 4,     # fieldA is escaped once, the memoized name is reused
+        "finalize_query": 3,
+        "rule": 3,
+    }
+    assert profile.items["azure_windows_security"].calls == 3
+    assert "azure_windows_sysmon" not in profile.items     # not dispatched for the log source
+    seconds = [rule.seconds for rule in profile.slowest_rules]
+    assert len(seconds) == 2 and seconds == sorted(seconds, reverse=True)
+
+    report = json.loads(profile.to_json())
+    assert set(report) == {"stages", "items", "slowest_rules"}
+    assert report["stages"]["rule"]["calls"] == 3
+
+
+def test_azure_profile_disabled():
+    backend = AzureBackend(processing_pipeline=azure_windows_pipeline())
+    backend.convert(rules(1))
+    assert backend.conversion_pipeline("default").profile is None
+
+
+def test_azure_profile_slowest_rules():
+    profile = AzureConversionProfile(slowest_rules_count=2)
+    other = AzureConversionProfile(slowest_rules_count=2)
+    for seconds in (0.3, 0.1, 0.2):
+        profile.rank_rule(AzureRuleTiming(f"rule{seconds}", seconds))
+    other.rank_rule(AzureRuleTiming("other", 0.25))
+    other.record("rule", 0.25)
+    profile.merge(other)
+    assert [rule.rule for rule in profile.slowest_rules] == ["rule0.3", "other"]
+    assert profile.stages["rule"].calls == 1
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_azure_profile_bulk(processes):
+    profile = AzureConversionProfile()
+    backend = AzureBackend(processing_pipeline=azure_windows_pipeline(), profile=profile)
+    backend.convert_bulk(rules(4), processes=processes)
+    assert profile.stages["rule"].calls == 4
+    assert profile.items["azure_windows_security"].calls == 4
+    assert len(profile.slowest_rules) == 4
+
+
+def test_azure_profile_main(tmp_path):
+    (tmp_path / "rules.yml").write_text("\n---\n".join(
+        f"title: Rule {i}\nstatus: test\nlogsource:\n    product: windows\n    service: security\ndetection:\n    sel:\n        fieldA: value\n    condition: sel\n"
+        for i in range(2)
+    ))
+    assert main(["-p", "azure_windows_pipeline", "--profile", str(tmp_path / "profile.json"), "-o", str(tmp_path / "out.jsonl"), str(tmp_path / "rules.yml")]) == 0
+    report = json.loads((tmp_path / "profile.json").read_text())
+    assert report["stages"]["rule"]["calls"] == 2
+    assert {rule["rule"] for rule in report["slowest_rules"]} == {"Rule 0", "Rule 1"}
@@ -0,0 +1,69 @@
+import pytest
+from sigma.collection import SigmaCollection
+
+from sigma.backends.azure import AzureBackend
+from sigma.backends.azure.regex import AzureRegexLiteral, analyze_regex
+
+
+@pytest.mark.parametrize("regexp,expected", [
+    ("^cmd\\.exe$", AzureRegexLiteral("equals", ("cmd.exe",))),
+    ("^C:\\\\Windows\\\\", AzureRegexLiteral("startswith", ("C:\\Windows\\",))),
+    ("\\.dll$", AzureRegexLiteral("endswith", (".dll",))),
+    ("mimikatz", AzureRegexLiteral("contains", ("mimikatz",))),
+    ("^.*mimikatz.*$", AzureRegexLiteral("contains", ("mimikatz",))),
+    ("^(?:cmd|powershell)\\.exe$", None),
+    ("^(?:cmd|powershell|cmd)$", AzureRegexLiteral("equals", ("cmd", "powershell"))),
+    ("sekurlsa|kerberos", AzureRegexLiteral("contains", ("sekurlsa", "kerberos"))),
+    ("^cmd|powershell$", None),
+    ("^cmd.*exe$", None),
+    ("\\d+", None),
+    ("^$", None),
+    ("price\\$", AzureRegexLiteral("contains", ("price$",))),
+])
+def test_analyze_regex(regexp, expected):
+    assert analyze_regex(regexp) == expected
+
+
+def test_analyze_regex_multiline():
+    assert analyze_regex("^cmd$", multiline=True) is None
+    assert analyze_regex("cmd", multiline=True) == AzureRegexLiteral("contains", ("cmd",))
+
+
+def regex_rule(detection: str) -> SigmaCollection:
+    return SigmaCollection.from_yaml(f"""
+        title: Test
+        status: test
+        logsource:
+            category: test_category
+            product: test_product
+        detection:
+            sel:
+                {detection}
+            condition: sel
+    """)
+
+
+@pytest.mark.parametrize("detection,expected", [
+    ("fieldA|re: '^cmd\\.exe$'", 'fieldA == "cmd.exe"'),
+    ("fieldA|re|i: '\\.dll$'", 'fieldA endswith ".dll"'),
+    ("fieldA|re: '^(cmd|powershell)$'", 'fieldA in ("cmd", "powershell")'),
+    ("fieldA|re|i: '^(cmd|powershell)$'", 'fieldA in~ ("cmd", "powershell")'),
+    ("fieldA|re: 'sekurlsa|kerberos'", '(fieldA contains_cs "sekurlsa" or fieldA contains_cs "kerberos")'),
+    ("fieldA|re: 'a+\"b'", 'fieldA matches regex "a+\\"b"'),
+    ("fieldA|re: 'a+b'", 'fieldA matches regex "a+b"'),
+])
+def test_azure_regex_lowering(detection, expected):
+    assert AzureBackend(regex_lowering=True).convert(regex_rule(detection)) == ["union *\n| where " + expected]
+
+
+def test_azure_regex_lowering_terms():
+    backend = AzureBackend(regex_lowering=True, term_index_operators=True)
+    query = 'union *\n| where (fieldA contains "sekurlsa" or fieldA contains "kerberos")'     # not narrowed to whole terms
+    assert backend.convert(regex_rule("fieldA|re|i: 'sekurlsa|kerberos'")) == [query]
+    assert backend.query_statistics[0][1] == {"regex_lowered": 1, "query_size_bytes": len(query)}
+
+
+def test_azure_regex_lowering_statistics():
+    backend = AzureBackend(regex_lowering=True)
+    queries = backend.convert(regex_rule("fieldA|re:\n                    - '^cmd$'\n                    - '^c.d$'"))
+    assert backend.query_statistics[0][1] == {"regex_lowered": 1, "regex_not_lowered": 1, "query_size_bytes": len(queries[0])}
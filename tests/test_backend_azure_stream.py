@@ -0,0 +1,69 @@
+import json
+
+import pytest
+from sigma.exceptions import SigmaConfigurationError
+
+from sigma.backends.azure import AzureBackend
+from sigma.backends.azure.stream import iter_rule_files, main
+from sigma.pipelines.azure import azure_windows_pipeline
+
+
+def write_rule(path, title: str, detection: str = "fieldA: valueA", product: str = "windows"):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(f"""
+title: {title}
+status: test
+logsource:
+    product: {product}
+    service: security
+detection:
+    sel:
+        {detection}
+    condition: sel
+""")
+
+
+@pytest.fixture
+def rules(tmp_path):
+    write_rule(tmp_path / "b" / "rule2.yml", "Rule 2", product="unknown")
+    write_rule(tmp_path / "a" / "rule1.yml", "Rule 1")
+    write_rule(tmp_path / "a" / "broken.yml", "Broken", "- true")
+    (tmp_path / "a" / "invalid.yaml").write_text("title: [")
+    (tmp_path / "a" / "README.md").write_text("no rule")
+    return tmp_path
+
+
+def test_iter_rule_files(rules):
+    assert [path.relative_to(rules).as_posix() for path in iter_rule_files([rules])] == [
+        "a/broken.yml", "a/invalid.yaml", "a/rule1.yml", "b/rule2.yml",
+    ]
+
+
+def test_azure_convert_stream(rules):
+    backend = AzureBackend(processing_pipeline=azure_windows_pipeline(), collect_errors=True)
+    records = list(backend.convert_stream([rules]))
+    assert [(record["title"], "error" in record) for record in records] == [
+        ("Broken", True), (None, True), ("Rule 1", False), ("Rule 2", False),
+    ]
+    assert records[0]["error_type"] == "SigmaValueError"
+    assert records[2]["queries"] == ['SecurityEvent\n| where fieldA =~ "valueA"']
+    assert records[2]["union_fallback"] is False
+    assert records[3]["union_fallback"] is True
+    assert records[3]["statistics"] == [{"query_size_bytes": len(records[3]["queries"][0])}]
+    assert backend.errors == []
+    assert backend.query_statistics == []
+
+
+def test_azure_convert_stream_batch(rules):
+    with pytest.raises(SigmaConfigurationError, match="batch"):
+        next(AzureBackend().convert_stream([rules], "batch"))
+
+
+def test_azure_convert_stream_main(rules, capsys):
+    output = rules / "queries.jsonl"
+    assert main(["-p", "azure_windows_pipeline", "-O", "time_window=1d", "-o", str(output), str(rules / "a" / "rule1.yml")]) == 0
+    assert [json.loads(line)["queries"] for line in output.read_text().splitlines()] == [
+        ['SecurityEvent\n| where TimeGenerated > ago(1d)\n| where fieldA =~ "valueA"'],
+    ]
+    assert main([str(rules / "a")]) == 1
+    assert "Converted 1 rules, 2 failed" in capsys.readouterr().err
@@ -0,0 +1,75 @@
+import pickle
+
+import pytest
+from sigma.collection import SigmaCollection
+
+from sigma.backends.azure import AzureBackend
+from sigma.backends.azure.templates import AzureTemplate, compile_template
+from sigma.pipelines.azure import azure_windows_pipeline
+
+
+@pytest.mark.parametrize("template,values", [
+    ("{field} {op} ({list})", {"field": "Image", "op": "in~", "list": '"a", "b"'}),
+    ('{field} matches regex "{regex}"', {"field": "Image", "regex": "a.*", "flag_x": ""}),
+    ("{{{value}}} {value!r} {value:>5}", {"value": "x"}),
+    ("strlen({field}) > {length}", {"field": "Image", "length": 3}),
+    ("no placeholders\n", {}),
+    ("{{{{{field}}}}} {{", {"field": "Image"}),
+    ("{a} {b} {c} {d} {e}", {"a": 1, "b": 2, "c": 3, "d": 4, "e": 5}),
+    ("{class}", {"class": "x"}),
+])
+def test_compile_template(template, values):
+    assert compile_template(template)(**values) == template.format(**values)
+    assert compile_template(template) != template.format
+
+
+@pytest.mark.parametrize("template", ["{} {}", "{0}", "{value.attr}", "{value[0]}", "{value:{width}}", "{"])
+def test_compile_template_fallback(template):
+    assert compile_template(template) == template.format
+
+
+@pytest.mark.parametrize("template", ["{field} has {value}", "{value!r:>5} {field}"])
+def test_compile_template_missing_placeholder(template):
+    with pytest.raises(KeyError, match="field"):
+        template.format(value="x")
+    with pytest.raises(KeyError, match="field"):
+        compile_template(template)(value="x")
+
+
+def test_azure_template():
+    template = AzureTemplate("{field} has {value}")
+    assert template == "{field} has {value}" and isinstance(template, str)
+    assert template.format(field="Image", value='"x"') == 'Image has "x"'
+    assert pickle.loads(pickle.dumps(template)).format(field="a", value="b") == "a has b"
+
+
+def test_azure_backend_templates_compiled():
+    class CustomBackend(AzureBackend):
+        contains_expression = "{field} contains_cs {value}"
+
+    assert isinstance(AzureBackend.field_in_list_expression, AzureTemplate)
+    assert isinstance(AzureBackend.lowered_re_expressions["contains", True], AzureTemplate)
+    assert isinstance(AzureBackend.group_expression, AzureTemplate)     # inherited from the base backend
+    assert isinstance(CustomBackend.contains_expression, AzureTemplate)
+    assert not isinstance(AzureBackend.or_token, AzureTemplate)
+
+
+def test_azure_field_name_memo(monkeypatch):
+    monkeypatch.setattr(AzureBackend, "field_name_cache_size", 2)
+    backend = AzureBackend(azure_windows_pipeline())
+    assert [backend.escape_and_quote_field(name) for name in ("a", "field b", "a")] == ["a", "['field b']", "a"]
+    assert backend.field_names == {"a": "a", "field b": "['field b']"}
+    backend.escape_and_quote_field("c")
+    assert backend.field_names == {"c": "c"}
+    assert backend.convert(SigmaCollection.from_yaml("""
+        title: Test
+        status: test
+        logsource:
+            category: process_creation
+            product: windows
+        detection:
+            sel:
+                'field b': x
+                c: y
+            condition: sel
+    """)) == ["SecurityEvent\n| where EventID == 4688 and ((['field b'] =~ \"x\" and c =~ \"y\"))"]
@@ -0,0 +1,115 @@
+import pytest
+from sigma.collection import SigmaCollection
+from sigma.exceptions import SigmaConfigurationError
+
+from sigma.backends.azure import AzureBackend
+from sigma.pipelines.azure import azure_windows_pipeline
+
+
+def value_list_rule(condition: str = "sel", values=("BBB", "aaa", "AAA", "ccc", "ddd")) -> SigmaCollection:
+    value_list = "\n".join(f"                    - '{value}'" for value in values)
+    return SigmaCollection.from_yaml(f"""
+        title: Test
+        status: test
+        logsource:
+            category: test_category
+            product: test_product
+        detection:
+            sel:
+                fieldA:
+{value_list}
+            filter:
+                fieldB: valueB
+            condition: {condition}
+    """)
+
+
+def test_azure_value_list_dedup_sort():
+    backend = AzureBackend(value_list_optimization=True)
+    queries = backend.convert(value_list_rule())
+    assert queries == ['union *\n| where fieldA in~ ("aaa", "BBB", "ccc", "ddd")']
+    assert backend.query_statistics[0][1] == {"value_list_duplicates": 1, "query_size_bytes": len(queries[0])}
+
+
+def test_azure_value_list_disabled():
+    assert AzureBackend().convert(value_list_rule(values=("b", "a", "a"))) == ['union *\n| where fieldA in ("b", "a", "a")']
+
+
+def test_azure_value_list_chunks():
+    assert AzureBackend(value_list_optimization=True, value_list_chunk_size=2).convert(value_list_rule()) == [
+        'union *\n| where (fieldA in~ ("aaa", "BBB") or fieldA in~ ("ccc", "ddd"))'
+    ]
+
+
+def test_azure_value_list_invalid_chunk_size():
+    with pytest.raises(SigmaConfigurationError, match="chunk size"):
+        AzureBackend(value_list_optimization=True, value_list_chunk_size=0).convert(value_list_rule())
+
+
+def test_azure_value_list_wildcards():
+    assert AzureBackend(value_list_optimization=True).convert(value_list_rule(values=("a*", "b"))) == [
+        'union *\n| where fieldA startswith "a" or fieldA =~ "b"'
+    ]
+
+
+def test_azure_value_list_contains_terms():
+    # has_any only matches whole terms, lists of contained values are kept as contains matches
+    assert AzureBackend(value_list_optimization=True, term_index_operators=True).convert(
+        value_list_rule(values=("*mimikatz*", "*kerberos*"))
+    ) == ['union *\n| where fieldA contains "mimikatz" or fieldA contains "kerberos"']
+
+
+def test_azure_value_list_datatable():
+    backend = AzureBackend(value_list_optimization=True, value_list_datatable_threshold=3)
+    assert backend.convert(value_list_rule("sel and not filter")) == [
+        'union *\n| where (not fieldB =~ "valueB")'
+        '\n| extend ValueListKey0 = tolower(fieldA)'
+        '\n| join kind=leftsemi (datatable(Value:string) ["aaa", "bbb", "ccc", "ddd"]) on $left.ValueListKey0 == $right.Value'
+        '\n| project-away ValueListKey0'
+    ]
+    assert backend.query_statistics[0][1]["value_list_joins"] == 1
+
+
+def test_azure_value_list_datatable_in_or():
+    assert AzureBackend(value_list_optimization=True, value_list_datatable_threshold=3).convert(
+        value_list_rule("sel or filter")
+    ) == ['union *\n| where (fieldA in~ ("aaa", "BBB", "ccc", "ddd")) or fieldB =~ "valueB"']
+
+
+def security_rule(detection: str) -> SigmaCollection:
+    return SigmaCollection.from_yaml(f"""
+        title: Test
+        status: test
+        logsource:
+            product: windows
+            service: security
+        detection:
+            sel:
+{detection}
+            condition: sel
+    """)
+
+
+def test_azure_value_list_typed_columns():
+    backend = AzureBackend(azure_windows_pipeline(), value_list_optimization=True)
+    assert backend.convert(security_rule("""
+                LogonType: [2, 3, 10, 3]
+                EventID: [4624, 4625]
+    """)) == ['SecurityEvent\n| where ((LogonType in (2, 3, 10)) and (EventID in (4624, 4625)))']
+    assert backend.query_statistics[0][1]["value_list_duplicates"] == 1
+
+
+def test_azure_value_list_typed_columns_strings():
+    # values of exact-typed columns that aren't numbers keep their own operator instead of a string list
+    assert AzureBackend(azure_windows_pipeline(), value_list_optimization=True).convert(security_rule("""
+                LogonType: ['10', '2', 'abc']
+    """)) == ['SecurityEvent\n| where (LogonType == 10 or LogonType == 2 or LogonType =~ "abc")']
+
+
+def test_azure_value_list_numbers_and_strings():
+    assert AzureBackend(value_list_optimization=True).convert(value_list_rule(values=("10", "2", "b", "A"))) == [
+        'union *\n| where fieldA in~ ("10", "2", "A", "b")'
+    ]
+    assert AzureBackend(azure_windows_pipeline(), value_list_optimization=True).convert(security_rule("""
+                fieldA: [10, 2, 'b', 'A']
+    """)) == ['SecurityEvent\n| where (fieldA in~ (2, 10, "A", "b"))']
@@ -0,0 +1,71 @@
+import pytest
+from sigma.collection import SigmaCollection
+from sigma.types import SigmaString
+
+from sigma.backends.azure import AzureBackend
+from sigma.backends.azure.evaluator import AzureEventTable, AzureQueryEvaluator
+from sigma.backends.azure.wildcards import AzureWildcardPattern, compile_wildcards
+
+
+def test_compile_wildcards():
+    assert compile_wildcards(SigmaString("C:\\Win*\\cmd.exe")) == AzureWildcardPattern(
+        prefix="C:\\Win",
+        suffix="\\cmd.exe",
+        infixes=(),
+        length=14,
+        variable_length=True,
+        regex="^C:\\\\Win.*\\\\cmd\\.exe$",
+    )
+
+
+def test_compile_wildcards_infixes():
+    pattern = compile_wildcards(SigmaString("*evil*tool?"))
+    assert (pattern.prefix, pattern.infixes, pattern.suffix) == ("", ("evil", "tool"), "")
+    assert pattern.regex == "^.*evil.*tool.$"
+    assert not pattern.exact
+
+
+def wildcard_rule(detection: str) -> SigmaCollection:
+    return SigmaCollection.from_yaml(f"""
+        title: Test
+        status: test
+        logsource:
+            category: test_category
+            product: test_product
+        detection:
+            sel:
+                {detection}
+            condition: sel
+    """)
+
+
+@pytest.mark.parametrize("detection,expected", [
+    ("fieldA: 'cmd?exe'", '(fieldA startswith "cmd" and fieldA endswith "exe" and strlen(fieldA) == 7)'),
+    ("fieldA: 'cmd*exe'", '(fieldA startswith "cmd" and fieldA endswith "exe" and strlen(fieldA) >= 6)'),
+    ("fieldA: 'value?'", '(fieldA startswith "value" and strlen(fieldA) == 6)'),
+    ("fieldA: '*evil*tool*'", '(fieldA contains "evil" and fieldA contains "tool" and fieldA matches regex "(?is)^.*evil.*tool.*$")'),
+    ("fieldA|cased: 'cmd*exe'", '(fieldA casematch_startswith "cmd" and fieldA casematch_endswith "exe" and strlen(fieldA) >= 6)'),
+    ("fieldA: '*value*'", 'fieldA contains "value"'),
+    ("fieldA: '*a\"b.c*d*'", '(fieldA contains "a\\"b.c" and fieldA contains "d" and fieldA matches regex "(?is)^.*a\\"b\\\\.c.*d.*$")'),
+])
+def test_azure_wildcard_compilation(detection, expected):
+    assert AzureBackend().convert(wildcard_rule(detection)) == ["union *\n| where " + expected]
+
+
+
+def test_azure_wildcard_compilation_quote():
+    query = AzureBackend().convert(wildcard_rule("fieldA: '*a\"b.c*d*'"))[0]
+    table = AzureEventTable.from_events("T", [{"fieldA": 'xa"b.cxd'}, {"fieldA": 'xa"bxcxd'}, {"fieldA": "ab.cd"}])
+    assert AzureQueryEvaluator([table]).evaluate(query.replace("union *", "T")).matches == {"T": [0]}
+
+def test_azure_wildcard_compilation_terms():
+    backend = AzureBackend(term_index_operators=True)
+    query = 'union *\n| where (fieldA startswith "a" and fieldA contains "evil" and fieldA endswith "b" and fieldA matches regex "(?is)^a.*evil.*b$")'
+    assert backend.convert(wildcard_rule("fieldA: 'a*evil*b'")) == [query]
+    assert backend.query_statistics[0][1] == {"wildcards_compiled": 1, "wildcard_regex_checks": 1, "query_size_bytes": len(query)}
+
+
+def test_azure_wildcard_compilation_disabled():
+    assert AzureBackend(wildcard_compilation=False).convert(wildcard_rule("fieldA: 'cmd*exe'")) == [
+        'union *\n| where fieldA match "cmd*exe"'
+    ]
@@ -0,0 +1,46 @@
+import pytest
+
+from benchmarks.benchmark_conversion import GENERATORS, compare, generate_collection, measure
+from benchmarks.benchmark_evaluation import generate_security_events, measure as measure_evaluation
+
+
+@pytest.mark.parametrize("shape", GENERATORS)
+def test_generate_collection_deterministic(shape):
+    first = generate_collection(shape, 3)
+    assert [rule.to_dict() for rule in first] == [rule.to_dict() for rule in generate_collection(shape, 3)]
+    assert [rule.to_dict() for rule in first] != [rule.to_dict() for rule in generate_collection(shape, 3, seed=1)]
+
+
+def test_measure():
+    result = measure("windows", 3, True)
+    assert result["shape"] == "windows" and result["size"] == 3 and result["pipeline"] is True
+    assert result["rules_per_second"] > 0
+    assert 0 < result["p50_ms"] <= result["p99_ms"]
+    assert result["peak_memory_bytes"] > 0
+
+
+def test_compare():
+    baseline = {"results": [
+        {"shape": "regex", "size": 10, "pipeline": False, "rules_per_second": 100.0, "p50_ms": 1.0, "p99_ms": 2.0, "peak_memory_bytes": 1000},
+    ]}
+    same = {"results": [dict(baseline["results"][0], rules_per_second=90.0)]}
+    slower = {"results": [dict(baseline["results"][0], rules_per_second=40.0, p99_ms=4.0)]}
+    assert compare(same, baseline) == []
+    assert compare(slower, baseline) == [
+        "regex/10/plain: throughput 40.0 rules/s, baseline 100.0 rules/s",
+        "regex/10/plain: p99_ms 4.000, baseline 2.000",
+    ]
+
+
+def test_generate_security_events_deterministic():
+    first = generate_security_events(20)
+    assert len(first) == 20
+    assert first.columns == generate_security_events(20).columns
+    assert first.columns != generate_security_events(20, seed=1).columns
+
+
+def test_measure_evaluation():
+    result = measure_evaluation(2000, 3)
+    assert result["rows"] == 2000 and result["rules"] == 3
+    assert result["rows_per_second"] > 0
+    assert result["predicates"] and all(predicate["selectivity"] is None or 0 <= predicate["selectivity"] <= 1 for predicate in result["predicates"])
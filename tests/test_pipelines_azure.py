@@ -1,9 +1,16 @@
 import pytest
 from sigma.collection import SigmaCollection
+from sigma.exceptions import SigmaConfigurationError, SigmaFeatureNotSupportedByBackendError
+from sigma.processing.conditions import LogsourceCondition
+from sigma.processing.pipeline import ProcessingItem, ProcessingPipeline
+from sigma.processing.transformations import ChangeLogsourceTransformation, SetStateTransformation
+from sigma.rule import SigmaLogSource
 
 from sigma.backends.azure import AzureBackend
-from sigma.pipelines.azure import azure_windows_pipeline
-from sigma.pipelines.azure.azure import azure_windows_service_map
+from sigma.backends.azure.evaluator import AzureEventTable, AzureQueryEvaluator
+from sigma.pipelines.azure import AzureDispatchPipeline, AzureSchema, AzureTableIndex, azure_windows_pipeline
+from sigma.pipelines.azure.azure import SetAzureTimeWindow, azure_table_index, azure_windows_service_map
+from sigma.pipelines.azure.schema import tables_state_key
 
 
 @pytest.mark.parametrize(
@@ -24,7 +31,12 @@ def test_splunk_windows_pipeline_simple(service, source):
                     field: value
                 condition: sel
         """)
-    ) == [f'{source}\n| where (EventID =~ 123 and field =~ "value")']
+    ) == [
+        f'{source}\n| where EventData has "value"\n| extend field = extract(\'<Data Name="field">([^<]*)<\', 1, EventData)\n'
+        '| where (EventID == 123 and field =~ "value")'
+        if source in ("Event", "SysmonEvent") else
+        f'{source}\n| where (EventID {"==" if source == "SecurityEvent" else "=~"} 123 and field =~ "value")'
+    ]
 
 
 def test_azure_process_creation():
@@ -50,4 +62,451 @@ def test_azure_process_creation():
                     User: test
                 condition: sel
         """)
-    ) == ['SecurityEvent\n| where EventID =~ "4688" and ((CommandLine =~ "test" and CurrentDirectory =~ "test" and Image =~ "test" and IntegrityLevel =~ "test" and ParentCommandLine =~ "test" and ParentImage =~ "test" and ParentProcessGuid =~ "test" and ParentProcessId =~ "test" and ProcessGuid =~ "test" and ProcessId =~ "test" and User =~ "test"))']
+    ) == ['SecurityEvent\n| where EventID == 4688 and ((CommandLine =~ "test" and CurrentDirectory =~ "test" and NewProcessName =~ "test" and IntegrityLevel =~ "test" and ParentCommandLine =~ "test" and ParentProcessName =~ "test" and ParentProcessGuid =~ "test" and ProcessId =~ "test" and ProcessGuid =~ "test" and NewProcessId =~ "test" and Account =~ "test"))']
+
+
+def test_azure_table_index_resolve():
+    index = azure_table_index()
+    assert index.resolve(SigmaLogSource(product="windows", service="security")) == ("SecurityEvent",)
+    assert index.resolve(SigmaLogSource(product="windows", category="ps_script")) == ("Event",)
+    assert index.resolve(SigmaLogSource(product="windows", category="image_load")) == ("SysmonEvent",)
+    assert index.resolve(SigmaLogSource(product="windows", category="registry_set")) == ("SysmonEvent",)
+    assert index.resolve(SigmaLogSource(product="windows", category="antivirus")) == ()     # not guessed, reported as unresolved
+    assert index.resolve(SigmaLogSource(product="m365", service="exchange")) == ("OfficeActivity",)
+    assert index.resolve(SigmaLogSource(product="test_product", category="test_category")) == ()
+
+
+def test_azure_table_index_derive():
+    index = AzureTableIndex.from_dict({"derive": ["azure"], "tables": []})
+    assert index.resolve(SigmaLogSource(product="azure", service="sign_in_logs")) == ("Sign_In_Logs",)
+    assert index.resolve(SigmaLogSource(product="aws", service="cloudtrail")) == ()
+
+
+def test_azure_table_index_invalid():
+    with pytest.raises(SigmaConfigurationError, match="doesn't define any table"):
+        AzureTableIndex.from_dict({"tables": [{"product": "windows"}]})
+    with pytest.raises(SigmaConfigurationError, match="unknown keys: table"):
+        AzureTableIndex.from_dict({"tables": [{"product": "windows", "table": "Event"}]})
+
+
+def test_azure_table_index_unresolved():
+    collection = SigmaCollection.from_yaml("""
+title: Mapped
+logsource:
+    product: linux
+detection:
+    sel:
+        field: value
+    condition: sel
+---
+title: Unmapped
+logsource:
+    product: aws
+detection:
+    sel:
+        field: value
+    condition: sel
+""")
+    assert [rule.title for rule in azure_table_index().unresolved(collection)] == ["Unmapped"]
+
+
+def test_azure_table_index_pipeline():
+    assert AzureBackend(processing_pipeline=azure_windows_pipeline()).convert(
+        SigmaCollection.from_yaml("""
+            title: Test
+            status: test
+            logsource:
+                product: azure
+                service: signinlogs
+            detection:
+                sel:
+                    ResultType: 50126
+                condition: sel
+        """)
+    ) == ['SigninLogs\n| where ResultType =~ 50126']
+
+
+def test_azure_table_index_custom(tmp_path):
+    path = tmp_path / "tables.yml"
+    path.write_text("tables:\n  - product: aws\n    service: cloudtrail\n    tables: [AWSCloudTrail]\n")
+    assert AzureBackend(processing_pipeline=azure_windows_pipeline(table_index=AzureTableIndex.from_yaml(path))).convert(
+        SigmaCollection.from_yaml("""
+            title: Test
+            status: test
+            logsource:
+                product: aws
+                service: cloudtrail
+            detection:
+                sel:
+                    eventName: ConsoleLogin
+                condition: sel
+        """)
+    ) == ['AWSCloudTrail\n| where eventName =~ "ConsoleLogin"']
+
+
+unmapped_rule = """
+    title: Test
+    status: test
+    logsource:
+        product: test_product
+    detection:
+        sel:
+            field: value
+        condition: sel
+"""
+
+
+def test_azure_union_fallback_report():
+    backend = AzureBackend(processing_pipeline=azure_windows_pipeline())
+    assert backend.convert(SigmaCollection.from_yaml(unmapped_rule)) == ['union *\n| where field =~ "value"']
+    assert [rule.title for rule in backend.union_fallback_rules] == ["Test"]
+
+
+def test_azure_union_fallback_strict():
+    with pytest.raises(SigmaFeatureNotSupportedByBackendError, match="No Azure table"):
+        AzureBackend(processing_pipeline=azure_windows_pipeline(), strict_logsource=True).convert(
+            SigmaCollection.from_yaml(unmapped_rule)
+        )
+
+
+def multi_table_pipeline():
+    return azure_windows_pipeline(table_index=azure_table_index() + AzureTableIndex.from_dict({"tables": [
+        {"product": "windows", "category": "multi_table", "tables": ["SecurityEvent", "Event"]},
+    ]}))
+
+
+multi_table_rule = """
+    title: Test
+    status: test
+    logsource:
+        product: windows
+        category: multi_table
+    detection:
+        sel:
+            ImageLoaded|endswith: 'evil.dll'
+        condition: sel
+"""
+
+
+def test_azure_multi_table_union():
+    assert AzureBackend(processing_pipeline=multi_table_pipeline()).convert(
+        SigmaCollection.from_yaml(multi_table_rule)
+    ) == [
+        'union withsource=SourceTable (SecurityEvent\n| where ImageLoaded endswith "evil.dll"), '
+        '(Event\n| where ImageLoaded endswith "evil.dll")'
+    ]
+
+
+def test_azure_multi_table_split():
+    assert AzureBackend(processing_pipeline=multi_table_pipeline(), multi_table_output="split").convert(
+        SigmaCollection.from_yaml(multi_table_rule)
+    ) == [
+        'SecurityEvent\n| where ImageLoaded endswith "evil.dll"',
+        'Event\n| where ImageLoaded endswith "evil.dll"',
+    ]
+
+
+def test_azure_multi_table_invalid_output():
+    with pytest.raises(SigmaConfigurationError, match="Unknown multi-table output"):
+        AzureBackend(processing_pipeline=multi_table_pipeline(), multi_table_output="join").convert(
+            SigmaCollection.from_yaml(multi_table_rule)
+        )
+
+
+def time_window_rule(custom: str = "") -> SigmaCollection:
+    return SigmaCollection.from_yaml(f"""
+        title: Test
+        status: test
+        logsource:
+            product: windows
+            service: security
+        detection:
+            sel:
+                fieldA: valueA
+            condition: sel
+        {custom}
+    """)
+
+
+def test_azure_time_window_option():
+    assert AzureBackend(processing_pipeline=azure_windows_pipeline(), time_window="1d").convert(time_window_rule()) == [
+        'SecurityEvent\n| where TimeGenerated > ago(1d)\n| where fieldA =~ "valueA"'
+    ]
+
+
+def test_azure_time_window_pipeline():
+    pipeline = azure_windows_pipeline() + ProcessingPipeline(items=[ProcessingItem(SetAzureTimeWindow(val="7d"))])
+    assert AzureBackend(processing_pipeline=pipeline, time_window="1d").convert(time_window_rule()) == [
+        'SecurityEvent\n| where TimeGenerated > ago(7d)\n| where fieldA =~ "valueA"'
+    ]
+
+
+def test_azure_time_window_rule_attribute():
+    rules = time_window_rule("azure_time_window: {start: '2024-01-01', end: '2024-01-02T12:00:00'}")
+    assert AzureBackend(processing_pipeline=azure_windows_pipeline(), time_window="1d").convert(rules) == [
+        'SecurityEvent\n| where TimeGenerated between (datetime(2024-01-01) .. datetime(2024-01-02T12:00:00))\n| where fieldA =~ "valueA"'
+    ]
+
+
+def test_azure_time_window_multi_table():
+    assert AzureBackend(processing_pipeline=multi_table_pipeline(), time_window="1h").convert(
+        SigmaCollection.from_yaml(multi_table_rule)
+    ) == [
+        'union withsource=SourceTable '
+        '(SecurityEvent\n| where TimeGenerated > ago(1h)\n| where ImageLoaded endswith "evil.dll"), '
+        '(Event\n| where TimeGenerated > ago(1h)\n| where ImageLoaded endswith "evil.dll")'
+    ]
+
+
+def test_azure_time_window_invalid():
+    with pytest.raises(SigmaConfigurationError, match="Invalid time window"):
+        AzureBackend(time_window="yesterday").convert(time_window_rule())
+
+
+projection_rule = """
+    title: Test
+    status: test
+    logsource:
+        product: windows
+        service: security
+    detection:
+        sel:
+            fieldA: valueA
+            fieldB|contains: valueB
+        filter:
+            fieldA: valueC
+        condition: sel and not filter
+    fields:
+        - fieldC
+        - fieldA
+        - Account
+"""
+
+
+def test_azure_project_fields():
+    assert AzureBackend(processing_pipeline=azure_windows_pipeline(), project_fields=True).convert(
+        SigmaCollection.from_yaml(projection_rule)
+    ) == [
+        'SecurityEvent\n| where ((fieldA =~ "valueA" and fieldB contains "valueB") and (not fieldA =~ "valueC"))'
+        '\n| project TimeGenerated, Computer, fieldA, fieldB, Account'
+    ]
+
+
+def test_azure_project_fields_keep_columns():
+    assert AzureBackend(
+        processing_pipeline=azure_windows_pipeline(),
+        project_fields=True,
+        project_keep_columns=("TimeGenerated", "EventData"),
+        time_window="1d",
+    ).convert(SigmaCollection.from_yaml(projection_rule)) == [
+        'SecurityEvent\n| where TimeGenerated > ago(1d)'
+        '\n| where ((fieldA =~ "valueA" and fieldB contains "valueB") and (not fieldA =~ "valueC"))'
+        '\n| project TimeGenerated, EventData, fieldA, fieldB, Account'
+    ]
+
+
+def test_azure_project_fields_schema_columns():
+    # AuditLogs has no Computer column, fields of the rule that aren't columns are left out
+    backend = AzureBackend(processing_pipeline=azure_windows_pipeline(), project_fields=True)
+    assert backend.convert(SigmaCollection.from_yaml("""
+        title: Test
+        status: test
+        logsource:
+            product: azure
+            service: auditlogs
+        detection:
+            sel:
+                OperationName: x
+            condition: sel
+        fields:
+            - InitiatedBy
+            - NotAColumn
+    """)) == ['AuditLogs\n| where OperationName =~ "x"\n| project TimeGenerated, OperationName, InitiatedBy']
+    assert backend.query_statistics[0][1]["projection_skipped_columns"] == 2
+
+
+def test_azure_project_fields_payload():
+    query = AzureBackend(processing_pipeline=azure_windows_pipeline(), project_fields=True).convert(SigmaCollection.from_yaml("""
+        title: Test
+        status: test
+        logsource:
+            product: windows
+            category: driver_load
+        detection:
+            sel:
+                ImageLoaded|endswith: x.sys
+            condition: sel
+        fields:
+            - Hashes
+            - ImageLoaded
+    """))[0]
+    assert query == (
+        'SysmonEvent\n| where EventData contains "x.sys"'
+        '\n| extend ImageLoaded = extract(\'<Data Name="ImageLoaded">([^<]*)<\', 1, EventData)'
+        '\n| where ImageLoaded endswith "x.sys"'
+        '\n| extend Hashes = extract(\'<Data Name="Hashes">([^<]*)<\', 1, EventData)'
+        '\n| project TimeGenerated, Computer, ImageLoaded, Hashes'
+    )
+    evaluator = AzureQueryEvaluator([AzureEventTable.from_events("SysmonEvent", [{
+        "TimeGenerated": "2024-01-01", "Computer": "host",
+        "EventData": '<Data Name="ImageLoaded">C:\\x.sys</Data><Data Name="Hashes">SHA1=AB</Data>',
+    }])])
+    assert list(evaluator.evaluate(query).events()) == [
+        {"TimeGenerated": "2024-01-01", "Computer": "host", "ImageLoaded": "C:\\x.sys", "Hashes": "SHA1=AB"}
+    ]
+
+
+def test_azure_windows_pipeline_fresh():
+    first, second = azure_windows_pipeline(), azure_windows_pipeline()
+    assert first is not second and first == second
+    assert isinstance(first.items, tuple)
+    mappings = [item.transformation for item in first.items + second.items if item.identifier == "azure_field_mapping"]
+    assert mappings[0] is not mappings[1] and mappings[0].schema is mappings[1].schema      # schema is only parsed once
+    tables = [item.transformation for item in first.items + second.items if item.identifier == "azure_table_index"]
+    assert tables[0].table_index is tables[1].table_index is azure_table_index()
+
+    first.apply(time_window_rule().rules[0])
+    assert first.state[tables_state_key] == ["SecurityEvent"]
+    assert second.state == {}       # state of the processed rule isn't shared
+
+
+def dispatch_items(count: int):
+    return [
+        ProcessingItem(
+            identifier=f"service_{i}",
+            transformation=SetStateTransformation(f"service_{i}", True),
+            rule_conditions=[LogsourceCondition(product="windows", service=f"service{i}")],
+        )
+        for i in range(count)
+    ] + [
+        ProcessingItem(identifier="all", transformation=SetStateTransformation("all", True)),
+        ProcessingItem(
+            identifier="product",
+            transformation=SetStateTransformation("product", True),
+            rule_conditions=[LogsourceCondition(product="windows")],
+        ),
+    ]
+
+
+def dispatch_rule(service: str):
+    return SigmaCollection.from_yaml(f"""
+        title: Test
+        status: test
+        logsource:
+            product: windows
+            service: {service}
+        detection:
+            sel:
+                fieldA: valueA
+            condition: sel
+    """).rules[0]
+
+
+def test_azure_dispatch_pipeline():
+    pipeline = AzureDispatchPipeline(items=dispatch_items(500))
+    key = ("windows", None, "service42")
+    assert [pipeline.items[position].identifier for position in pipeline.candidates(key)] == ["service_42", "all", "product"]
+
+    reference = ProcessingPipeline(items=dispatch_items(500))
+    pipeline.apply(dispatch_rule("service42"))
+    reference.apply(dispatch_rule("service42"))
+    assert pipeline.applied == reference.applied
+    assert pipeline.applied_ids == reference.applied_ids == {"service_42", "all", "product"}
+    assert pipeline.state == reference.state
+
+
+def test_azure_dispatch_pipeline_logsource_changed():
+    pipeline = AzureDispatchPipeline(items=[
+        ProcessingItem(
+            identifier="change",
+            transformation=ChangeLogsourceTransformation(product="windows", service="service1"),
+            rule_conditions=[LogsourceCondition(service="service0")],
+        ),
+    ] + dispatch_items(2))
+    pipeline.apply(dispatch_rule("service0"))
+    assert pipeline.applied_ids == {"change", "service_1", "all", "product"}
+
+
+def test_azure_dispatch_pipeline_concatenation():
+    plain = ProcessingPipeline(items=[ProcessingItem(identifier="plain", transformation=SetStateTransformation("plain", True))])
+    for pipeline in (plain + azure_windows_pipeline(), azure_windows_pipeline() + plain):
+        assert isinstance(pipeline, AzureDispatchPipeline)
+        assert len(pipeline.items) == len(azure_windows_pipeline().items) + 1
+    assert (plain + azure_windows_pipeline()).items[0].identifier == "plain"
+
+
+def test_azure_backend_conversion_pipeline():
+    backend = AzureBackend(processing_pipeline=azure_windows_pipeline())
+    assert backend.conversion_pipeline("default") is backend.conversion_pipeline("default")
+    assert isinstance(backend.conversion_pipeline("default"), AzureDispatchPipeline)
+
+
+def schema_rule(service: str = "security", **fields) -> SigmaCollection:
+    detection = "\n".join(f"                {name}: {value}" for name, value in fields.items())
+    return SigmaCollection.from_yaml(f"""
+        title: Test
+        status: test
+        logsource:
+            product: windows
+            service: {service}
+        detection:
+            sel:
+{detection}
+            condition: sel
+    """)
+
+
+def test_azure_schema_typed_columns():
+    assert AzureBackend(processing_pipeline=azure_windows_pipeline()).convert(
+        schema_rule(eventid="'4624'", LogonType="'3'", keylength=128, Image="'x'")
+    ) == ['SecurityEvent\n| where (EventID == 4624 and LogonType == 3 and KeyLength == 128 and NewProcessName =~ "x")']
+
+
+def test_azure_schema_typed_columns_wildcards():
+    assert AzureBackend(processing_pipeline=azure_windows_pipeline()).convert(
+        schema_rule(**{"EventID|startswith": "'46'", "LogonType": "'abc'"})
+    ) == ['SecurityEvent\n| where (EventID startswith "46" and LogonType =~ "abc")']
+
+
+def test_azure_schema_unknown_fields():
+    backend = AzureBackend(processing_pipeline=azure_windows_pipeline())
+    assert backend.convert(schema_rule(EventID=4625, ScriptBlockText="'x'", Status="'y'")) == [
+        'SecurityEvent\n| where (EventID == 4625 and ScriptBlockText =~ "x" and Status =~ "y")'
+    ]
+    assert [(rule.title, fields) for rule, fields in backend.unknown_field_rules] == [("Test", {"SecurityEvent": ["ScriptBlockText"]})]
+
+
+def test_azure_schema_unknown_fields_strict():
+    backend = AzureBackend(processing_pipeline=azure_windows_pipeline(), strict_schema=True)
+    with pytest.raises(SigmaFeatureNotSupportedByBackendError, match="ScriptBlockText \\(SecurityEvent\\)"):
+        backend.convert(schema_rule(ScriptBlockText="'x'"))
+
+
+def test_azure_schema_unmapped_tables():
+    backend = AzureBackend(processing_pipeline=azure_windows_pipeline(AzureTableIndex.from_dict({"tables": [
+        {"product": "windows", "service": "dns-server", "tables": ["DnsEvents"]},
+    ]})), strict_schema=True)
+    assert backend.convert(schema_rule("dns-server", EventID="'1'", QName="'x'")) == [
+        'DnsEvents\n| where (EventID =~ "1" and QName =~ "x")'
+    ]
+    assert backend.unknown_field_rules == []
+
+
+def test_azure_schema_custom():
+    schema = AzureSchema.from_dict({"tables": {"SecurityEvent": {
+        "columns": {"EventID": "int", "Elevated": "bool", "Image": "string"},
+        "fields": {"ProcessName": "Image"},
+    }}})
+    assert AzureBackend(processing_pipeline=azure_windows_pipeline(schema=schema)).convert(
+        schema_rule(ProcessName="'x'", elevated="'true'")
+    ) == ['SecurityEvent\n| where (Image =~ "x" and Elevated == true)']
+
+
+@pytest.mark.parametrize("definition,message", [
+    ({"SecurityEvent": {"columns": {"EventID": "integer"}}}, "unknown types: EventID \\(integer\\)"),
+    ({"SecurityEvent": {"columns": {"EventID": "int"}, "fields": {"Image": "NewProcessName"}}}, "unknown columns: NewProcessName"),
+    ({"SecurityEvent": {"column": {}}}, "unknown keys: column"),
+])
+def test_azure_schema_invalid(definition, message):
+    with pytest.raises(SigmaConfigurationError, match=message):
+        AzureSchema.from_dict({"tables": definition})